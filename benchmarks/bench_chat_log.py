@@ -0,0 +1,66 @@
+"""
+Renders long days the way a day with exported intermediate steps is rendered: the chunked chat log for the map
+step, then the whole chat log twice (linear summary and TxtWriter). Each consumer formatting every message again, as
+before, is compared against joining the lines cached by the message store.
+
+    python -m benchmarks.bench_chat_log [days] [messages-per-day]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.synthetic_data import random_text
+from src.service.parser.message_store import MessageStore
+from src.service.parser.parser import get_chat_log, get_chat_log_chunked, get_chunk_content
+
+TOKENS_PER_CHUNK = 2000
+
+
+def format_messages(messages) -> list[str]:
+    return [f"[{m['timestamp'].hour:02}:{m['timestamp'].minute:02}] {m['sender_name']}: {m['content']}\n"
+            for m in messages]
+
+
+def chunk_messages(messages) -> list[str]:
+    lines = format_messages(messages)
+    return ["".join(lines[chunk["start_index"]:chunk["end_index"]])
+            for chunk in get_chat_log_chunked(messages, TOKENS_PER_CHUNK)]
+
+
+def main():
+    days_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    messages_per_day = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    rng = random.Random(0)
+    store = MessageStore()
+    for day in range(days_count):
+        start = datetime(2024, 1, 1) + timedelta(days=day)
+        for i in range(messages_per_day):
+            content = random_text(rng).replace("\n", ". ")
+            store.append({'sender_name': rng.choice(["Alice", "Bob"]), 'timestamp': start + timedelta(seconds=i * 4),
+                          'content': content, 'token_count': len(content) // 4, 'day': start.date().isoformat()})
+    days = {day: list(store.get_view(day)) for day in store.days}
+
+    start = time.perf_counter()
+    reformatted = {}
+    for day, messages in days.items():
+        chunks = chunk_messages(messages)
+        reformatted[day] = (chunks, "".join(format_messages(messages)), "".join(format_messages(messages)))
+    elapsed_reformat = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cached = {}
+    for day in store.days:
+        chunks = [get_chunk_content(chunk) for chunk in get_chat_log_chunked(store.get_view(day), TOKENS_PER_CHUNK)]
+        cached[day] = (chunks, get_chat_log(store.get_view(day)), get_chat_log(store.get_view(day)))
+    elapsed_cached = time.perf_counter() - start
+
+    assert cached == reformatted, "the cached lines changed the chat logs"
+    print(f"{days_count} days of {messages_per_day} messages")
+    print(f"format per consumer  {elapsed_reformat:7.3f} s")
+    print(f"cached lines         {elapsed_cached:7.3f} s  ({elapsed_reformat / elapsed_cached:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
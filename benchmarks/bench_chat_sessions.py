@@ -0,0 +1,49 @@
+"""
+Measures the chat session split of sort_bucket over the whole timeline, scanning the first messages of every day in
+Python against the numpy pass over the int64 timestamps.
+
+    python -m benchmarks.bench_chat_sessions [messages]
+"""
+import sys
+import time
+from unittest.mock import patch
+
+from benchmarks.synthetic_data import instagram_messages
+from src.dto.enums.message_order import MessageOrder
+from src.service.parser import chat_sessions
+from src.service.parser.instagram_export import InstagramExport
+from src.service.reader.timestamp_converter import TimestampConverter
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    raw_messages = instagram_messages(count)
+    timestamps, days = TimestampConverter().convert_many([raw_message["timestamp_ms"] for raw_message in raw_messages])
+    parser = InstagramExport(chat_sessions_enabled=True)
+    # nobody writes between 02:00 and 06:00, every night is a sleep gap
+    parser.add_messages(({'sender_name': raw_message["sender_name"], 'timestamp': timestamp, 'content': "",
+                          'token_count': 1, 'day': day}
+                         for raw_message, timestamp, day in zip(raw_messages, timestamps, days)
+                         if not 2 <= timestamp.hour < 6),
+                        MessageOrder.DESCENDING)
+    day_rows = {day: parser.message_store.get_sorted_rows(day) for day in parser.get_available_days()}
+
+    start = time.perf_counter()
+    with patch.object(chat_sessions, "np", None):
+        scanned = parser.extract_chat_sessions(day_rows)
+    elapsed_scan = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = parser.extract_chat_sessions(day_rows)
+    elapsed_vectorized = time.perf_counter() - start
+
+    assert {day: list(rows) for day, rows in vectorized.items()} == \
+           {day: list(rows) for day, rows in scanned.items()}, "the numpy pass changed the sessions"
+    moved = sum(1 for day, rows in scanned.items() if len(rows) != len(day_rows.get(day, [])))
+    print(f"{len(parser.message_store)} messages, {len(day_rows)} days, {moved} days changed by a session split")
+    print(f"python scan  {elapsed_scan:7.3f} s")
+    print(f"numpy pass   {elapsed_vectorized:7.3f} s  ({elapsed_scan / elapsed_vectorized:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compares the message counting chunker (a chunk closes once it holds more than 6 messages and more than
+token-per-chunk tokens, the next one repeating its last 3 messages) against the prefix sum chunker, on days mixing
+short messages with a few very long ones. Reports the map calls, the tokens sent to the map agent and the largest
+chunk, then the time spent chunking.
+
+    python -m benchmarks.bench_chunker [days] [messages-per-day]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.synthetic_data import random_text
+from src.service.parser.message_store import MessageStore
+from src.service.parser.parser import get_chat_log_chunked, get_chunk_content
+
+TOKENS_PER_CHUNK = 4000
+OVERLAP_TOKENS = 100
+
+
+def chunk_by_count(lines, token_counts) -> list[tuple[str, int]]:
+    """
+    :return: the content of every chunk, with the tokens sent, repeated messages included
+    """
+    chunks = []
+    content = []
+    tokens = count = 0
+    for line, message_tokens in zip(lines, token_counts):
+        content.append((line, message_tokens))
+        tokens += message_tokens
+        count += 1
+        if count > 6 and tokens > TOKENS_PER_CHUNK:
+            chunks.append(("".join(line for line, _ in content), sum(tokens for _, tokens in content)))
+            content = content[-3:]
+            tokens = count = 0
+    if count > 0:
+        chunks.append(("".join(line for line, _ in content), sum(tokens for _, tokens in content)))
+    return chunks
+
+
+def main():
+    days_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    messages_per_day = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    rng = random.Random(0)
+    store = MessageStore()
+    for day in range(days_count):
+        start = datetime(2024, 1, 1) + timedelta(days=day)
+        for i in range(messages_per_day):
+            content = random_text(rng).replace("\n", ". ")
+            # now and then a pasted article
+            if rng.random() < 0.002:
+                content = content * 200
+            store.append({'sender_name': rng.choice(["Alice", "Bob"]), 'timestamp': start + timedelta(seconds=i * 4),
+                          'content': content, 'token_count': len(content) // 4, 'day': start.date().isoformat()})
+    views = [store.get_view(day) for day in store.days]
+    for view in views:
+        view.get_lines()
+
+    start = time.perf_counter()
+    by_count = [chunk_by_count(view.get_lines(), view.get_token_counts()) for view in views]
+    elapsed_by_count = time.perf_counter() - start
+
+    start = time.perf_counter()
+    prefix_sum = [get_chat_log_chunked(view, TOKENS_PER_CHUNK, overlap_tokens=OVERLAP_TOKENS) for view in views]
+    elapsed_prefix_sum = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for chunks in prefix_sum:
+        for chunk in chunks:
+            get_chunk_content(chunk)
+    elapsed_render = time.perf_counter() - start
+
+    count_tokens = [sum(tokens for _, tokens in chunks) for chunks in by_count]
+    count_largest = max(tokens for chunks in by_count for _, tokens in chunks)
+    prefix_tokens = [sum(chunk["token_count"] for chunk in chunks) for chunks in prefix_sum]
+    prefix_largest = max(chunk["token_count"] for chunks in prefix_sum for chunk in chunks
+                         if chunk["messages_count"] > 1)  # a longer message alone is not the chunker's doing
+
+    print(f"{days_count} days of {messages_per_day} messages, {TOKENS_PER_CHUNK} tokens per chunk")
+    print(f"message count  {sum(map(len, by_count)):7} map calls  {sum(count_tokens):10} tokens  "
+          f"largest {count_largest:6} tokens  {elapsed_by_count:7.3f} s")
+    print(f"prefix sums    {sum(map(len, prefix_sum)):7} map calls  {sum(prefix_tokens):10} tokens  "
+          f"largest {prefix_largest:6} tokens  {elapsed_prefix_sum:7.3f} s  (+{elapsed_render:.3f} s to render)")
+
+
+if __name__ == "__main__":
+    main()
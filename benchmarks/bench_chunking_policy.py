@@ -0,0 +1,67 @@
+"""
+Compares the map calls and the map prompt tokens of the TOKENS and GAPS chunking policies, on every day of an export.
+Without paths, a synthetic WhatsApp export made of conversations separated by silences is used.
+
+    python -m benchmarks.bench_chunking_policy [token-per-chunk] [messages]
+    python -m benchmarks.bench_chunking_policy [token-per-chunk] INSTAGRAM_EXPORT|WHATSAPP_EXPORT path [path ...]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+from benchmarks.synthetic_data import write_whatsapp_export
+from src.dto.enums.chunking_policy import ChunkingPolicy
+from src.dto.enums.input_file_type import InputFileType
+from src.service.parser.parser import get_chat_log_chunked
+from src.service.parser.parser_factory import parser_factory
+from src.service.reader.reader_factory import reader_factory
+
+CONFIG = {'logs': {'level': 'WARNING'}, 'parsing': {'messages': {}, 'chars-per-token': 4.0}}
+OVERLAP_TOKENS = 100
+GAP_TOLERANCE = 0.25
+MIN_GAP = timedelta(minutes=30)
+
+
+def parse_export(input_type: InputFileType, paths: list[str]):
+    reader = reader_factory(input_type, CONFIG)
+    parser = parser_factory(input_type, CONFIG)
+    for path in paths:
+        parser.parse(reader.stream_messages(path), reader.message_order)
+    parser.sort_bucket()
+    return [parser.get_messages(day) for day in parser.get_available_days()]
+
+
+def measure(days, token_per_chunk: int, policy: ChunkingPolicy) -> tuple[int, int, float]:
+    start = time.perf_counter()
+    chunks = [chunk for messages in days for chunk in
+              get_chat_log_chunked(messages, token_per_chunk, overlap_tokens=OVERLAP_TOKENS, policy=policy,
+                                   gap_tolerance=GAP_TOLERANCE, min_gap=MIN_GAP)]
+    elapsed = time.perf_counter() - start
+    return len(chunks), sum(chunk["token_count"] for chunk in chunks), elapsed
+
+
+def main():
+    token_per_chunk = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    if len(sys.argv) > 3:
+        days = parse_export(InputFileType(sys.argv[2]), sys.argv[3:])
+    else:
+        messages = int(sys.argv[2]) if len(sys.argv) > 2 else 500000
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = write_whatsapp_export(os.path.join(tmpdir, "chat.txt"), messages, conversations=True)
+            days = parse_export(InputFileType.WHATSAPP_EXPORT, [path])
+    for messages in days:
+        messages.get_lines()
+
+    total_tokens = sum(token_count or 0 for messages in days for token_count in messages.get_token_counts())
+    print(f"{len(days)} days, {total_tokens} tokens, {token_per_chunk} tokens per chunk")
+    calls_by_tokens, tokens_by_tokens, elapsed = measure(days, token_per_chunk, ChunkingPolicy.TOKENS)
+    print(f"TOKENS  {calls_by_tokens:7} map calls  {tokens_by_tokens:10} prompt tokens  {elapsed:7.3f} s")
+    calls_by_gaps, tokens_by_gaps, elapsed = measure(days, token_per_chunk, ChunkingPolicy.GAPS)
+    print(f"GAPS    {calls_by_gaps:7} map calls  {tokens_by_gaps:10} prompt tokens  {elapsed:7.3f} s  "
+          f"({(tokens_by_tokens - tokens_by_gaps) / tokens_by_tokens:.1%} fewer prompt tokens)")
+
+
+if __name__ == "__main__":
+    main()
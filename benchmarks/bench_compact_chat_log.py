@@ -0,0 +1,66 @@
+"""
+Compares the map prompt tokens of the FULL and COMPACT chat log formats, every day of an export being chunked as the
+map-reduce strategy does. Without paths, a synthetic WhatsApp export made of conversations and a synthetic Instagram
+thread are used.
+
+    python -m benchmarks.bench_compact_chat_log [token-per-chunk] [messages]
+    python -m benchmarks.bench_compact_chat_log [token-per-chunk] INSTAGRAM_EXPORT|WHATSAPP_EXPORT path [path ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_data import write_instagram_export, write_whatsapp_export
+from src.dto.enums.chat_log_format import ChatLogFormat
+from src.dto.enums.input_file_type import InputFileType
+from src.service.parser.parser import get_chat_log_chunked, get_chunk_content
+from src.service.parser.parser_factory import parser_factory
+from src.service.reader.reader_factory import reader_factory
+from src.service.token_estimator.length_token_estimator import LengthTokenEstimator
+
+CONFIG = {'logs': {'level': 'WARNING'}, 'parsing': {'messages': {}, 'chars-per-token': 4.0}}
+
+
+def parse_export(input_type: InputFileType, paths: list[str]):
+    reader = reader_factory(input_type, CONFIG)
+    parser = parser_factory(input_type, CONFIG)
+    for path in paths:
+        parser.parse(reader.stream_messages(path), reader.message_order)
+    parser.sort_bucket()
+    return [parser.get_messages(day) for day in parser.get_available_days()]
+
+
+def measure(days, token_per_chunk: int, chat_log_format: ChatLogFormat) -> tuple[int, float]:
+    estimator = LengthTokenEstimator()
+    chunks = [chunk for messages in days for chunk in get_chat_log_chunked(messages, token_per_chunk)]
+    start = time.perf_counter()
+    contents = [get_chunk_content(chunk, chat_log_format) for chunk in chunks]
+    elapsed = time.perf_counter() - start
+    return sum(estimator.estimate(content) for content in contents), elapsed
+
+
+def report(name: str, days, token_per_chunk: int):
+    messages = sum(len(day) for day in days)
+    full, full_elapsed = measure(days, token_per_chunk, ChatLogFormat.FULL)
+    compact, compact_elapsed = measure(days, token_per_chunk, ChatLogFormat.COMPACT)
+    print(f"{name}: {len(days)} days, {messages} messages")
+    print(f"  FULL     {full:10} prompt tokens  {full_elapsed:7.3f} s")
+    print(f"  COMPACT  {compact:10} prompt tokens  {compact_elapsed:7.3f} s  ({(full - compact) / full:.1%} fewer)")
+
+
+def main():
+    token_per_chunk = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    if len(sys.argv) > 3:
+        report(sys.argv[2], parse_export(InputFileType(sys.argv[2]), sys.argv[3:]), token_per_chunk)
+        return
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = write_whatsapp_export(os.path.join(tmpdir, "chat.txt"), messages, conversations=True)
+        report("WhatsApp", parse_export(InputFileType.WHATSAPP_EXPORT, [path]), token_per_chunk)
+        paths = write_instagram_export(os.path.join(tmpdir, "inbox"), 4, messages // 4)
+        report("Instagram", parse_export(InputFileType.INSTAGRAM_EXPORT, paths), token_per_chunk)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Parses monthly WhatsApp exports, each one overlapping the previous one by half, without deduplication and with the
+EXACT and BLOOM deduplicators. Reports the messages kept, the parsing time and the memory taken by the deduplicator.
+
+    python -m benchmarks.bench_deduplication [exports] [messages-per-export]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic_data import whatsapp_lines
+from src.dto.enums.input_file_type import InputFileType
+from src.service.deduplicator.bloom_deduplicator import BloomDeduplicator
+from src.service.deduplicator.deduplicator import fingerprint
+from src.service.deduplicator.exact_deduplicator import ExactDeduplicator
+from src.service.parser.whatsapp_export import WhatsappExport
+from src.service.reader.reader_factory import reader_factory
+
+CONFIG = {'logs': {'level': 'WARNING'}, 'parsing': {'messages': {}, 'chars-per-token': 4.0}}
+
+
+def main():
+    exports_count = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    messages_per_export = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    step = messages_per_export // 2
+    lines = whatsapp_lines(step * (exports_count + 1))
+    unique = len(lines)
+
+    reader = reader_factory(InputFileType.WHATSAPP_EXPORT, CONFIG)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = []
+        for i in range(exports_count):
+            paths.append(os.path.join(tmpdir, f"chat_{i}.txt"))
+            with open(paths[-1], "w", encoding="utf-8") as f:
+                f.writelines(lines[i * step:i * step + messages_per_export])
+        raw_exports = [reader.read(path) for path in paths]
+
+    print(f"{exports_count} exports of {messages_per_export} messages, {unique} distinct")
+    deduplicators = {"none": None, "EXACT": ExactDeduplicator(), "BLOOM": BloomDeduplicator(unique)}
+    for name, deduplicator in deduplicators.items():
+        exports = [reader.standardize_messages(raw_messages) for raw_messages in raw_exports]
+        parser = WhatsappExport(deduplicator=deduplicator)
+        start = time.perf_counter()
+        dropped = sum(parser.parse(messages, reader.message_order) for messages in exports)
+        elapsed = time.perf_counter() - start
+        kept = len(parser.message_store.timestamps)
+
+        # memory of a deduplicator holding the fingerprints of the kept messages
+        size = 0
+        if deduplicator is not None:
+            fingerprints = [fingerprint(message["timestamp"], message["sender_name"], message["content"])
+                            for day in parser.get_available_days() for message in parser.get_messages(day)]
+            tracemalloc.start()
+            deduplicator = type(deduplicator)() if name == "EXACT" else BloomDeduplicator(unique)
+            for message_fingerprint in fingerprints:
+                deduplicator.add(message_fingerprint)
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+        print(f"{name:6} {kept:9} kept  {dropped:9} dropped  {elapsed:7.3f} s  {size / 2 ** 20:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Compares the per-message repair of double encoded Instagram texts (an encode/decode of every content and a regex on
+every sender name, as the parser used to do) against the batch repair and the sender cache of the reader.
+
+    python -m benchmarks.bench_instagram_unicode [messages]
+"""
+import re
+import sys
+import time
+
+from benchmarks.synthetic_data import instagram_messages
+from src.service.reader.instagram_export_json_reader import fix_double_encoding, _NON_ASCII_REGEX
+
+
+def fix_per_message(text: str) -> str:
+    try:
+        return text.encode('latin1').decode('utf8')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return text
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    messages = instagram_messages(count)
+    contents = [message["content"] for message in messages]
+    senders = [message["sender_name"] for message in messages]
+
+    start = time.perf_counter()
+    per_message = [fix_per_message(content) for content in contents]
+    per_message_senders = [re.sub(r'[^\x00-\x7F]+', '', sender) for sender in senders]
+    elapsed_per_message = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = fix_double_encoding(contents)
+    sender_names = {}
+    batch_senders = []
+    for sender in senders:
+        name = sender_names.get(sender)
+        if name is None:
+            name = sender_names[sender] = _NON_ASCII_REGEX.sub('', sender)
+        batch_senders.append(name)
+    elapsed_batch = time.perf_counter() - start
+
+    assert batch == per_message and batch_senders == per_message_senders, "the batch repair changed the texts"
+    print(f"per message  {elapsed_per_message:8.3f} s  {elapsed_per_message / count * 1e9:6.0f} ns/message")
+    print(f"batch        {elapsed_batch:8.3f} s  {elapsed_batch / count * 1e9:6.0f} ns/message  "
+          f"({elapsed_per_message / elapsed_batch:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Compares a cold read + standardize + parse of an Instagram export against a warm load from the message cache.
+
+    python -m benchmarks.bench_message_cache [files] [messages-per-file]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_data import write_instagram_export
+from src.dto.enums.input_file_type import InputFileType
+from src.service.logging_service import LoggingService
+from src.service.message_cache import MessageCache
+from src.service.parser.parser_factory import parser_factory
+from src.service.reader.reader_factory import reader_factory
+
+CONFIG = {'logs': {'level': 'WARNING'}, 'parsing': {'messages': {}, 'chars-per-token': 4.0}}
+
+
+def main():
+    files_count = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    messages_per_file = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        write_instagram_export(os.path.join(tmpdir, "input"), files_count, messages_per_file)
+        reader = reader_factory(InputFileType.INSTAGRAM_EXPORT, CONFIG)
+        input_files = reader.scan_input(os.fsencode(os.path.join(tmpdir, "input")))
+        cache = MessageCache(os.path.join(tmpdir, "cache"), InputFileType.INSTAGRAM_EXPORT, CONFIG,
+                             LoggingService(CONFIG))
+
+        start = time.perf_counter()
+        cold = parser_factory(InputFileType.INSTAGRAM_EXPORT, CONFIG)
+        normalized_files = []
+        for input_file in input_files:
+            normalized_files.append(list(cold.normalize(reader.standardize_messages(reader.read(input_file['path'])))))
+            cold.add_messages(normalized_files[-1])
+        elapsed_cold = time.perf_counter() - start
+
+        for input_file, normalized_messages in zip(input_files, normalized_files):
+            cache.store(input_file, normalized_messages)
+
+        start = time.perf_counter()
+        warm = parser_factory(InputFileType.INSTAGRAM_EXPORT, CONFIG)
+        for input_file in input_files:
+            warm.add_messages(cache.load(input_file))
+        elapsed_warm = time.perf_counter() - start
+
+        assert warm.get_messages_grouped() == cold.get_messages_grouped(), "the cache changed the messages"
+        cache_size = sum(os.path.getsize(os.path.join(cache.directory, name)) for name in os.listdir(cache.directory))
+        print(f"cold parse  {elapsed_cold:8.3f} s")
+        print(f"warm cache  {elapsed_warm:8.3f} s  ({elapsed_cold / elapsed_warm:.1f}x)  {cache_size / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
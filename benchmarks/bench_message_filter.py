@@ -0,0 +1,70 @@
+"""
+Filters a synthetic day mixing real messages with the usual low-information traffic (short replies, laughter, emojis,
+bursts of photos), read from the message store as the summarization does. Reports the throughput of the filter and
+the share of prompt tokens it saves.
+
+    python -m benchmarks.bench_message_filter [messages]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.synthetic_data import random_text
+from src.dto.enums.message_order import MessageOrder
+from src.service.message_filter.message_filter_factory import message_filter_factory
+from src.service.parser.whatsapp_export import WhatsappExport
+from src.service.token_estimator.length_token_estimator import LengthTokenEstimator
+
+_TRIVIAL = ["ok", "Ok!", "lol", "LOL", "ahahah", "hahaha", "😂", "😂😂", "👍", "kk", "?"]
+_PHOTO = "[Sent a photo of himself]"
+
+
+def day_messages(count: int) -> list[dict]:
+    rng = random.Random(0)
+    estimator = LengthTokenEstimator()
+    timestamp = datetime(2024, 1, 15)
+    step = timedelta(days=1) / (count + 1)
+    messages = []
+    sender = "Alice"
+    burst = 0
+    for _ in range(count):
+        timestamp += step
+        if burst > 0:
+            burst -= 1
+            content = _PHOTO
+        else:
+            sender = rng.choice(["Alice", "Bob", "Carla"])
+            draw = rng.random()
+            if draw < 0.2:
+                content = rng.choice(_TRIVIAL)
+            elif draw < 0.25:
+                content = _PHOTO
+                burst = rng.randint(0, 6)
+            else:
+                content = random_text(rng).replace("\n", ". ")
+        messages.append({'sender_name': sender, 'content': content, 'timestamp': timestamp,
+                         'token_count': estimator.estimate_message(sender, content)})
+    return messages
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    parser = WhatsappExport()
+    parser.parse(day_messages(count), MessageOrder.ASCENDING)
+    parser.sort_bucket()
+    messages = parser.get_messages("2024-01-15")
+    total_tokens = sum(messages.get_token_counts())
+
+    message_filter = message_filter_factory({})
+    start = time.perf_counter()
+    filtered, saved = message_filter.filter(messages)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(messages)} messages, {total_tokens} tokens")
+    print(f"filtered to {len(filtered)} messages in {elapsed:.3f} s ({elapsed / len(messages) * 1e9:.0f} ns/message)")
+    print(f"saved {saved} tokens ({saved / total_tokens:.1%} of the prompt)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Compares the memory held by a dict per message bucket against the columnar message store, and the time to render the
+chat logs of every day from each.
+
+    python -m benchmarks.bench_message_store [messages]
+"""
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+from benchmarks.synthetic_data import instagram_messages
+from src.dto.enums.input_file_type import InputFileType
+from src.service.parser.instagram_export import InstagramExport
+from src.service.parser.message_store import MessageStore
+from src.service.parser.parser import get_chat_log
+from src.service.reader.reader_factory import reader_factory
+
+CONFIG = {'logs': {'level': 'WARNING'}, 'parsing': {'messages': {}, 'chars-per-token': 4.0}}
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    reader = reader_factory(InputFileType.INSTAGRAM_EXPORT, CONFIG)
+    messages = list(InstagramExport().normalize(reader.standardize_messages({'messages': instagram_messages(count)})))
+
+    tracemalloc.start()
+    # copies, the normalized dicts are shared by both layouts otherwise
+    bucket = defaultdict(list)
+    for message in messages:
+        bucket[message["day"]].append(dict(message, content=message["content"].encode("utf-8").decode("utf-8")))
+    bucket_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    store = MessageStore()
+    for message in messages:
+        store.append(message)
+    store_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    bucket_logs = [get_chat_log(day_messages) for day_messages in bucket.values()]
+    elapsed_bucket = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store_logs = [get_chat_log(store.get_view(day)) for day in store.days]
+    elapsed_store = time.perf_counter() - start
+
+    assert bucket_logs == store_logs, "the message store changed the chat logs"
+    print(f"{count} messages, {len(store.days)} days")
+    print(f"dict bucket    {bucket_bytes / 1024 / 1024:8.1f} MB  chat logs {elapsed_bucket:6.3f} s")
+    print(f"message store  {store_bytes / 1024 / 1024:8.1f} MB  chat logs {elapsed_store:6.3f} s  "
+          f"({bucket_bytes / store_bytes:.1f}x less memory)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Measures files/s of the input ingestion with an increasing number of worker processes.
+
+    python -m benchmarks.bench_parallel_ingestion [files] [messages-per-file]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_data import write_instagram_export
+from src.dto.enums.input_file_type import InputFileType
+from src.service.ingestion_service import read_files_parallel
+from src.service.reader.reader_factory import reader_factory
+
+CONFIG = {'logs': {'level': 'WARNING'}, 'parsing': {'messages': {}, 'chars-per-token': 4.0}}
+
+
+def main():
+    files_count = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    messages_per_file = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        files = write_instagram_export(tmpdir, files_count, messages_per_file)
+
+        reader = reader_factory(InputFileType.INSTAGRAM_EXPORT, CONFIG)
+        start = time.perf_counter()
+        for file in files:
+            reader.standardize_messages(reader.read(file))
+        serial = time.perf_counter() - start
+        print(f"serial      {files_count / serial:8.2f} files/s")
+
+        workers = 2
+        while workers <= (os.cpu_count() or 1):
+            start = time.perf_counter()
+            for _ in read_files_parallel(files, InputFileType.INSTAGRAM_EXPORT, CONFIG, workers):
+                pass
+            elapsed = time.perf_counter() - start
+            print(f"{workers:2} workers  {files_count / elapsed:8.2f} files/s  ({serial / elapsed:.2f}x)")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Compares sorting every day of an Instagram inbox (files newest message first) with a full sort, as sort_bucket used to
+do, against merging the runs of the files in their reported order.
+
+    python -m benchmarks.bench_sort_bucket [files] [messages-per-file]
+"""
+import sys
+import time
+
+from benchmarks.synthetic_data import instagram_messages
+from src.dto.enums.message_order import MessageOrder
+from src.service.parser.message_store import MessageStore
+from src.service.reader.timestamp_converter import TimestampConverter
+
+
+def main():
+    files_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    messages_per_file = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+
+    converter = TimestampConverter()
+    store = MessageStore()
+    newest = 1700000000000
+    for i in range(files_count):
+        raw_messages = instagram_messages(messages_per_file, newest, seed=i)
+        newest = raw_messages[-1]["timestamp_ms"]
+        timestamps, days = converter.convert_many([raw_message["timestamp_ms"] for raw_message in raw_messages])
+        store.start_run(MessageOrder.DESCENDING)
+        for raw_message, timestamp, day in zip(raw_messages, timestamps, days):
+            store.append({'sender_name': raw_message["sender_name"], 'timestamp': timestamp,
+                          'content': raw_message["content"], 'token_count': 1, 'day': day})
+
+    get_timestamp = store.timestamps.__getitem__
+    start = time.perf_counter()
+    sorted_days = {day: sorted(rows, key=get_timestamp) for day, rows in store.days.items()}
+    elapsed_sort = time.perf_counter() - start
+
+    start = time.perf_counter()
+    merged_days = {day: store.get_sorted_rows(day) for day in store.days}
+    elapsed_merge = time.perf_counter() - start
+
+    assert {day: list(rows) for day, rows in merged_days.items()} == sorted_days, "merging the runs changed the order"
+    print(f"{len(store)} messages, {len(store.days)} days, {files_count} files")
+    print(f"full sort    {elapsed_sort:7.3f} s")
+    print(f"run merge    {elapsed_merge:7.3f} s  ({elapsed_sort / elapsed_merge:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
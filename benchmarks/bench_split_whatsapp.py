@@ -0,0 +1,45 @@
+"""
+Measures MB/s of a single large WhatsApp export read serially and split into byte ranges over worker processes.
+
+    python -m benchmarks.bench_split_whatsapp [messages] [split-size-mb]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_data import write_whatsapp_export
+from src.dto.enums.input_file_type import InputFileType
+from src.service.ingestion_service import read_files_parallel
+from src.service.reader.reader_factory import reader_factory
+
+CONFIG = {'logs': {'level': 'WARNING'}, 'parsing': {'messages': {}, 'chars-per-token': 4.0}}
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    split_size = int(float(sys.argv[2]) * 1024 * 1024) if len(sys.argv) > 2 else 16 * 1024 * 1024
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = write_whatsapp_export(os.path.join(tmpdir, "chat.txt"), messages)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+
+        reader = reader_factory(InputFileType.WHATSAPP_EXPORT, CONFIG)
+        start = time.perf_counter()
+        expected = reader.standardize_messages(reader.read(path))
+        serial = time.perf_counter() - start
+        print(f"serial      {size_mb / serial:8.2f} MB/s  ({size_mb:.0f} MB)")
+
+        workers = 2
+        while workers <= (os.cpu_count() or 1):
+            start = time.perf_counter()
+            [(_, parsed, _)] = read_files_parallel([path], InputFileType.WHATSAPP_EXPORT, CONFIG, workers,
+                                                   split_size=split_size)
+            elapsed = time.perf_counter() - start
+            assert parsed == expected, "the split read differs from the serial read"
+            print(f"{workers:2} workers  {size_mb / elapsed:8.2f} MB/s  ({serial / elapsed:.2f}x)")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
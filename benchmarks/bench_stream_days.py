@@ -0,0 +1,85 @@
+"""
+Runs the batch pipeline on a synthetic WhatsApp export against an LLM taking a fixed time per day, with a limited
+number of calls at once. Compares summarizing the days once the whole export is parsed with summarizing every day as
+soon as it is sealed, while the rest of the export is still being parsed.
+
+    python -m benchmarks.bench_stream_days [messages] [seconds-per-day] [concurrency-limit]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+from benchmarks.synthetic_data import write_whatsapp_export
+from src.batch_processor import process_all
+
+
+class FakeAiProcessor:
+    def __init__(self, seconds_per_day: float, concurrency_limit: int):
+        self.seconds_per_day = seconds_per_day
+        self.concurrency_limit = concurrency_limit
+        self.semaphore = None
+        self.first_summary = None
+
+    async def get_summary_async(self, messages):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.concurrency_limit)
+        async with self.semaphore:
+            await asyncio.sleep(self.seconds_per_day)
+        if self.first_summary is None:
+            self.first_summary = time.perf_counter()
+        return {"summary": f"{len(messages)} messages", "ai_chat": []}
+
+
+class NullWriter:
+    single_file = True
+
+    def __init__(self):
+        self.days = 0
+
+    def write(self, day, summary):
+        self.days += 1
+
+    def close(self):
+        pass
+
+
+def run(input_dir: str, stream_days: bool, seconds_per_day: float, concurrency_limit: int) -> tuple[int, float, float]:
+    config = {
+        'logs': {'level': 'WARNING'},
+        'batch': {
+            'input': {'type': 'WHATSAPP_EXPORT', 'path': input_dir, 'stream-days': stream_days},
+            'cache': {'enabled': False},
+        },
+        'parsing': {'chat-sessions': {'enabled': True}},
+        'inference-service': {'concurrency-limit': concurrency_limit},
+    }
+    ai_processor = FakeAiProcessor(seconds_per_day, concurrency_limit)
+    writer = NullWriter()
+    with patch('src.batch_processor.ai_processor_factory', return_value=ai_processor), \
+            patch('src.batch_processor.writer_factory', return_value=writer):
+        start = time.perf_counter()
+        process_all(config)
+        elapsed = time.perf_counter() - start
+    return writer.days, ai_processor.first_summary - start, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    seconds_per_day = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    concurrency_limit = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    with tempfile.TemporaryDirectory() as input_dir:
+        write_whatsapp_export(os.path.join(input_dir, "chat.txt"), count)
+        print(f"{count} messages, {seconds_per_day * 1000:.0f} ms per day, {concurrency_limit} calls at once")
+        days, first, batch = run(input_dir, False, seconds_per_day, concurrency_limit)
+        print(f"parse, then summarize  {days:5} days  first summary {first:6.2f} s  total {batch:6.2f} s")
+        days, first, streamed = run(input_dir, True, seconds_per_day, concurrency_limit)
+        print(f"summarize sealed days  {days:5} days  first summary {first:6.2f} s  total {streamed:6.2f} s  "
+              f"({batch / streamed:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
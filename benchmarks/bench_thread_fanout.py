@@ -0,0 +1,68 @@
+"""
+Simulates the map-reduce summary of a day mixing a busy group chat with a few quieter threads, against an LLM
+answering in a time proportional to the prompt length. Compares chunking the whole day and mapping its chunks one
+after the other, as before, with chunking thread by thread and mapping every chunk concurrently.
+
+    python -m benchmarks.bench_thread_fanout [concurrency-limit] [seconds-per-1000-tokens]
+"""
+import asyncio
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.synthetic_data import random_text
+from src.service.ai_processor.map_reduce_ai_processor import MapReduceAiProcessor
+from src.service.logging_service import LoggingService
+
+THREADS = {"group": 3000, "alice": 600, "bob": 400, "carl": 300, "dana": 200}
+TOKENS_PER_CHUNK = 4000
+
+
+class FakeClient:
+    def __init__(self, seconds_per_token: float):
+        self.seconds_per_token = seconds_per_token
+
+    async def ainvoke(self, messages):
+        prompt = messages[-1].content
+        await asyncio.sleep(0.05 + len(prompt) / 4 * self.seconds_per_token)
+        return type("Response", (), {"content": "summary"})()
+
+
+def day_messages() -> list[dict]:
+    rng = random.Random(0)
+    messages = []
+    for thread, count in THREADS.items():
+        for _ in range(count):
+            content = random_text(rng).replace("\n", ". ")
+            messages.append({'sender_name': rng.choice(["Alice", "Bob"]), 'content': content,
+                             'timestamp': datetime(2024, 1, 15) + timedelta(seconds=rng.randrange(86400)),
+                             'token_count': len(content) // 4 + 4, 'thread': thread})
+    messages.sort(key=lambda message: message["timestamp"])
+    return messages
+
+
+def run(messages: list[dict], concurrency_limit: int, per_thread: bool, seconds_per_token: float) -> tuple[int, float]:
+    processor = MapReduceAiProcessor(LoggingService({'logs': {'level': 'WARNING'}}), map_user_prompt="{messages}",
+                                     reduce_user_prompt="{summaries}", token_per_chunk=TOKENS_PER_CHUNK,
+                                     api_key="unused", concurrency_limit=concurrency_limit, per_thread=per_thread)
+    processor.map_client = processor.reduce_client = FakeClient(seconds_per_token)
+    start = time.perf_counter()
+    state = asyncio.run(processor.get_summary_async(messages))
+    return len(state["chunks"]), time.perf_counter() - start
+
+
+def main():
+    concurrency_limit = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds_per_token = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.0001
+    messages = day_messages()
+
+    chunks, sequential = run(messages, 1, False, seconds_per_token)
+    print(f"{len(messages)} messages in {len(THREADS)} threads, concurrency limit {concurrency_limit}")
+    print(f"whole day, sequential   {chunks:3} map calls  {sequential:6.2f} s")
+    chunks, fanned_out = run(messages, concurrency_limit, True, seconds_per_token)
+    print(f"per thread, concurrent  {chunks:3} map calls  {fanned_out:6.2f} s  ({sequential / fanned_out:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Compares the per-message cost of the token estimators against langchain's count_tokens_approximately.
+
+    python -m benchmarks.bench_token_estimators [messages] [vocabulary.tiktoken]
+"""
+import random
+import sys
+import time
+
+from langchain_core.messages.utils import count_tokens_approximately
+
+from benchmarks.synthetic_data import random_text
+from src.service.token_estimator.length_token_estimator import LengthTokenEstimator
+from src.service.token_estimator.script_token_estimator import ScriptTokenEstimator
+from src.service.token_estimator.vocabulary_token_estimator import VocabularyTokenEstimator
+
+
+def _measure(name: str, estimate, messages: list[tuple[str, str]]):
+    start = time.perf_counter()
+    total = 0
+    for sender, content in messages:
+        total += estimate(sender, content)
+    elapsed = time.perf_counter() - start
+    print(f"{name:28} {elapsed * 1e9 / len(messages):8.0f} ns/message  {total:>10} tokens")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rng = random.Random(0)
+    messages = [(rng.choice(["Alice", "Bob"]), random_text(rng)) for _ in range(count)]
+
+    _measure("count_tokens_approximately",
+             lambda sender, content: count_tokens_approximately([sender, content], chars_per_token=4.0), messages)
+    _measure("LENGTH", LengthTokenEstimator(4.0).estimate_message, messages)
+    _measure("SCRIPT", ScriptTokenEstimator(4.0).estimate_message, messages)
+    if len(sys.argv) > 2:
+        _measure("VOCABULARY", VocabularyTokenEstimator(sys.argv[2]).estimate_message, messages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Compares the WhatsApp header parser against the regex + strptime implementation it replaced.
+
+    python -m benchmarks.bench_whatsapp_parser [messages]
+"""
+import re
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.synthetic_data import whatsapp_lines
+from src.service.reader.whatsapp_header_parser import WhatsappHeaderParser
+
+_MESSAGE_REGEX = re.compile(r'^(\d{2}/\d{2}/\d{4}), (\d{2}:\d{2}) - ([^:]+): (.*)', re.DOTALL)
+
+
+def _regex_parse(lines: list[str]) -> list:
+    parsed = []
+    for line in lines:
+        match = _MESSAGE_REGEX.match(line)
+        if match:
+            date_str, time_str, sender, content = match.groups()
+            timestamp = datetime.strptime(f"{date_str} {time_str}", "%d/%m/%Y %H:%M")
+            parsed.append((timestamp, sender, content.strip()))
+    return parsed
+
+
+def _header_parse(lines: list[str]) -> list:
+    parser = WhatsappHeaderParser.sniff(lines)
+    parsed = []
+    for line in lines:
+        header = parser.parse(line)
+        if header:
+            parsed.append((header[0], header[2], header[3]))
+    return parsed
+
+
+def _measure(name: str, parse, lines: list[str]) -> list:
+    start = time.perf_counter()
+    parsed = parse(lines)
+    elapsed = time.perf_counter() - start
+    print(f"{name:20} {elapsed * 1e9 / len(lines):8.0f} ns/line  {len(lines) / elapsed:12.0f} lines/s")
+    return parsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    lines = whatsapp_lines(count)
+
+    expected = _measure("regex + strptime", _regex_parse, lines)
+    parsed = _measure("header parser", _header_parse, lines)
+    assert parsed == expected, "the parsers disagree"
+
+
+if __name__ == "__main__":
+    main()
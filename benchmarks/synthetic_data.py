@@ -0,0 +1,76 @@
+import json
+import os
+import random
+
+_SENDERS = ["Alice Johnson", "Bob Smith", "Carla Rossi", "Dmitri Ivanov"]
+_WORDS = ["hey", "ok", "lol", "what", "are", "you", "doing", "tonight", "dinner", "movie", "tomorrow", "work",
+          "great", "sounds", "good", "see", "you", "later", "à", "perché", "città"]
+
+
+def random_text(rng: random.Random, max_words: int = 20) -> str:
+    text = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(1, max_words)))
+    if rng.random() < 0.1:
+        text += "\n" + " ".join(rng.choice(_WORDS) for _ in range(rng.randint(1, max_words)))
+    return text
+
+
+def instagram_messages(count: int, newest_timestamp_ms: int = 1700000000000, seed: int = 0) -> list[dict]:
+    """
+    Generates Instagram export messages, newest first like the real exports.
+    """
+    rng = random.Random(seed)
+    timestamp = newest_timestamp_ms
+    messages = []
+    for _ in range(count):
+        timestamp -= rng.randint(1000, 900000)
+        # instagram double encodes non ascii characters
+        content = random_text(rng).encode("utf-8").decode("latin1")
+        messages.append({"sender_name": rng.choice(_SENDERS), "timestamp_ms": timestamp, "content": content})
+    return messages
+
+
+def write_instagram_export(directory: str, files: int, messages_per_file: int) -> list[str]:
+    """
+    Writes an inbox thread made of message_1..N.json files and returns their paths.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    newest = 1700000000000
+    for i in range(files):
+        messages = instagram_messages(messages_per_file, newest, seed=i)
+        newest = messages[-1]["timestamp_ms"]
+        path = os.path.join(directory, f"message_{i + 1}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"participants": [{"name": s} for s in _SENDERS], "messages": messages}, f, indent=2)
+        paths.append(path)
+    return paths
+
+
+def whatsapp_lines(count: int, seed: int = 0, conversations: bool = False) -> list[str]:
+    """
+    Generates the lines of an Android WhatsApp export, oldest first like the real exports.
+    With conversations, messages come in bursts a few minutes apart, separated by silences of half an hour or more.
+    """
+    rng = random.Random(seed)
+    minutes = 0
+    lines = []
+    for _ in range(count):
+        if not conversations:
+            minutes += rng.randint(0, 30)
+        elif rng.random() < 0.03:
+            minutes += rng.randint(30, 300)
+        else:
+            minutes += rng.randint(0, 3)
+        day, minute_of_day = divmod(minutes, 1440)
+        year = 2020 + day // 336
+        month = day // 28 % 12 + 1
+        date = f"{day % 28 + 1:02}/{month:02}/{year}"
+        text = random_text(rng)
+        lines.append(f"{date}, {minute_of_day // 60:02}:{minute_of_day % 60:02} - {rng.choice(_SENDERS)}: {text}\n")
+    return lines
+
+
+def write_whatsapp_export(path: str, messages: int, conversations: bool = False) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(whatsapp_lines(messages, conversations=conversations))
+    return path
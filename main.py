@@ -1,5 +1,5 @@
 import sys
-from src.batch_processor import process_all
+from src.batch_processor import plan_all, process_all
 from src.api_server import start_server
 from src.dto.enums.run_mode import RunMode
 from src.service.config_service import get_configs
@@ -18,6 +18,8 @@ if __name__ == "__main__":
         process_all(config)
     elif mode == RunMode.API:
         start_server(config)
+    elif mode == RunMode.PLAN:
+        plan_all(config)
     else:
         message = f"Application run mode not supported, please choose one of the following: {[e for e in RunMode]}"
         raise ValueError(message)
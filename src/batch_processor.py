@@ -1,14 +1,30 @@
 import asyncio
+import json
 import os
+import time
+from contextlib import nullcontext
+from typing import Awaitable, Iterable, Iterator, Sequence
 
+from src.dto.day_plan import DayPlan
 from src.dto.enums.input_file_type import InputFileType
-from src.service.ai_processor.ai_processor import AiProcessor
+from src.dto.enums.message_order import MessageOrder
+from src.dto.enums.summarization_strategy import SummarizationStrategy
+from src.dto.input_file import InputFile
+from src.dto.message import Message
+from src.service.ai_processor.ai_processor import AiProcessor, count_prompt_tokens
 from src.service.ai_processor.ai_processor_factory import ai_processor_factory
 from src.service.config_service import get_nested
+from src.service.ingestion_service import get_worker_count, read_files_parallel
 from src.service.logging_service import LoggingService
+from src.service.message_cache import message_cache_factory
+from src.service.parser.day_sealer import DaySealer
+from src.service.parser.message_store import MessageView
 from src.service.parser.parser import Parser
 from src.service.parser.parser_factory import parser_factory
+from src.service.reader.reader import Reader
 from src.service.reader.reader_factory import reader_factory
+from src.service.token_estimator.token_estimator import TokenEstimator
+from src.service.token_estimator.token_estimator_factory import token_estimator_factory
 from src.service.writer.writer import Writer
 from src.service.writer.writer_factory import writer_factory
 
@@ -29,65 +45,339 @@ def process_all(config: dict):
 
     # generate files list
     logger.debug(f'Listing files with {reader.get_extension()} extension...')
-    files = reader.get_file_list(input_directory)
+    files = reader.scan_input(input_directory)
 
     # initialize parser
     logger.debug('Initializing parser...')
     parser = parser_factory(input_file_type, config)
 
+    first_day, last_day = _get_date_window(config)
+    if _can_stream_days(files, reader, config):
+        # days are summarized as soon as they are sealed, while the next ones are still being parsed
+        writer = writer_factory(config)
+        ai_processor = ai_processor_factory(config)
+        existing_files = _get_existing_files(config)
+        asyncio.run(_stream_days(files, input_file_type, reader, parser, ai_processor, writer, config, first_day,
+                                 last_day, existing_files, logger))
+        return
+
     # read and parse files
-    for file in files:
-        # validate input file is not empty
-        if os.path.getsize(file) == 0:
-            logger.warning(f'Skipping empty file: {file}')
-            continue
-        try:
-            logger.debug(f'Reading {file}...')
-            raw_messages = reader.read(file)
-        except Exception as e:
-            logger.error(f'Failed to read {file}: {e}')
-            continue
-        logger.debug(f'Standardizing {file}...')
-        standardized_messages = reader.standardize_messages(raw_messages)
-        if not standardized_messages:
-            logger.warning(f'No messages found in {file}, skipping')
-            continue
-        logger.debug(f'Parsing {file}...')
-        parser.parse(standardized_messages)
+    _parse_files(files, input_file_type, reader, parser, config, logger)
 
     # sort bucket
     logger.debug('Sorting parser bucket...')
     parser.sort_bucket()
 
-    day_list = parser.get_available_days()
-    logger.info(f'Found {len(day_list)} days of messages...')
-
     # instantiate writer
     writer = writer_factory(config)
 
     # create AI processor
     ai_processor = ai_processor_factory(config)
 
+    day_list = _select_days(parser, first_day, last_day, _get_existing_files(config), logger)
+
+    # get summary and write each day diary
+    concurrency_limit = get_nested(config, 'inference-service.concurrency-limit', 1)
+    asyncio.run(_batch_process_days(day_list, parser, ai_processor, writer, logger, concurrency_limit))
+
+
+def plan_all(config: dict) -> dict:
+    """
+    Plans a batch run without summarizing anything: the input is parsed and every day to summarize is chunked as the
+    configured strategy does, counting its LLM calls and prompt tokens. The wall time is projected from the
+    concurrency limit and a tokens per second rate, configured or, only when asked to, measured with a single LLM
+    call. Nothing is written but the plan, as JSON to plan.output-path.
+    :param config: Dictionary containing the configuration of the application.
+    :return: the plan
+    """
+    logging_service = LoggingService(config)
+    logger = logging_service.get_logger(__name__)
+
+    input_file_type = get_nested(config, 'batch.input.type', InputFileType.INSTAGRAM_EXPORT)
+    input_directory = os.fsencode(get_nested(config, 'batch.input.path', './'))
+    reader = reader_factory(input_file_type, config)
+    files = reader.scan_input(input_directory)
+    parser = parser_factory(input_file_type, config)
+    _parse_files(files, input_file_type, reader, parser, config, logger)
+    parser.sort_bucket()
+
+    ai_processor = ai_processor_factory(config)
+    first_day, last_day = _get_date_window(config)
+    day_list = _select_days(parser, first_day, last_day, _get_existing_files(config), logger)
+
+    token_estimator = token_estimator_factory(config)
+    output_tokens = get_nested(config, 'plan.output-tokens-per-call', 300)
+    day_plans = [ai_processor.plan_day(day, parser.get_messages(day), token_estimator, output_tokens)
+                 for day in day_list]
+
+    tokens_per_second = get_nested(config, 'plan.tokens-per-second', 100)
+    tokens_per_second_source = "configured" if tokens_per_second else None
+    if get_nested(config, 'plan.measure-tokens-per-second', False) and day_plans:
+        # a day of median size is summarized by a typical call
+        sample_day = sorted(day_plans, key=lambda day_plan: day_plan["messages"])[len(day_plans) // 2]["day"]
+        logger.info(f'Measuring the tokens per second rate with a call summarizing {sample_day}...')
+        tokens_per_second = asyncio.run(_measure_tokens_per_second(ai_processor, parser.get_messages(sample_day),
+                                                                   token_estimator))
+        tokens_per_second_source = "measured"
+
+    concurrency_limit = get_nested(config, 'inference-service.concurrency-limit', 1)
+    plan = {
+        "strategy": get_nested(config, 'summarization.strategy', SummarizationStrategy.MAP_REDUCE),
+        "token_per_chunk": get_nested(config, 'summarization.map-reduce-strategy.token-per-chunk', 4000),
+        "concurrency_limit": concurrency_limit,
+        "tokens_per_second": tokens_per_second or None,
+        "tokens_per_second_source": tokens_per_second_source,
+        "output_tokens_per_call": output_tokens,
+        "total": _get_plan_total(day_plans, tokens_per_second, concurrency_limit, output_tokens),
+        "days": day_plans,
+    }
+
+    output_path = get_nested(config, 'plan.output-path', './plan.json')
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, indent=2)
+    total = plan["total"]
+    wall_time = f'about {total["projected_wall_seconds"]:.0f} s' if tokens_per_second else 'no tokens per second rate'
+    logger.info(f'Planned {total["days"]} days: {total["map_calls"] + total["reduce_calls"]} LLM calls, '
+                f'{total["prompt_tokens"]} prompt tokens, {wall_time}. Plan written to {output_path}')
+    return plan
+
+
+async def _measure_tokens_per_second(ai_processor: AiProcessor, messages: Sequence[Message],
+                                     token_estimator: TokenEstimator) -> float:
+    """
+    Times a single call summarizing the messages, the rate counts the tokens of the prompt and of the answer.
+    """
+    client, prompt = ai_processor.get_sample_call(messages)
+    start = time.perf_counter()
+    response = await ai_processor.invoke(client, prompt)
+    elapsed = time.perf_counter() - start
+    return count_prompt_tokens(prompt + [response], token_estimator) / elapsed
+
+
+def _get_plan_total(day_plans: list[DayPlan], tokens_per_second: float, concurrency_limit: int,
+                    output_tokens: int) -> dict:
+    """
+    Sums the day plans, and sets the time of every day from the tokens per second rate.
+    The wall time is the time of all the calls shared by the concurrent calls, or the time of the longest day when
+    longer: its map calls run concurrently, then its reduce call.
+    """
+    total = {key: sum(day_plan[key] for day_plan in day_plans) for key in
+             ("messages", "filtered_messages", "tokens_saved", "map_calls", "map_prompt_tokens", "reduce_calls",
+              "reduce_prompt_tokens", "output_tokens")}
+    total = {"days": len(day_plans)} | total
+    total["prompt_tokens"] = total["map_prompt_tokens"] + total["reduce_prompt_tokens"]
+    if not tokens_per_second:
+        total["llm_seconds"] = total["projected_wall_seconds"] = None
+        return total
+
+    longest_day = 0.0
+    for day_plan in day_plans:
+        map_tokens = day_plan["map_prompt_tokens"] + day_plan["map_calls"] * output_tokens
+        reduce_tokens = day_plan["reduce_prompt_tokens"] + day_plan["reduce_calls"] * output_tokens
+        map_seconds = map_tokens / tokens_per_second
+        reduce_seconds = reduce_tokens / tokens_per_second
+        day_plan["seconds"] = map_seconds + reduce_seconds
+        longest_day = max(longest_day,
+                          map_seconds / max(1, min(concurrency_limit, day_plan["map_calls"])) + reduce_seconds)
+    total["llm_seconds"] = sum(day_plan["seconds"] for day_plan in day_plans)
+    total["projected_wall_seconds"] = max(total["llm_seconds"] / concurrency_limit, longest_day)
+    return total
+
+
+def _can_stream_days(files: list[InputFile], reader: Reader, config: dict) -> bool:
+    """
+    Tells whether days can be summarized while parsing: the input must be a single conversation thread, read in time
+    order (a WhatsApp chat, or an Instagram thread read from the newest message to the oldest one).
+    :param files:
+    :param reader:
+    :param config: Dictionary containing the configuration of the application.
+    :return:
+    """
+    return (get_nested(config, 'batch.input.stream-days', True)
+            and reader.message_order in (MessageOrder.ASCENDING, MessageOrder.DESCENDING)
+            and len({input_file['thread'] for input_file in files}) == 1)
+
+
+def _get_existing_files(config: dict) -> set[str] | None:
+    """
+    Lists the files already written in the output folder, None when writing to a single file.
+    The folder is read from the configuration, building a writer would already create its output files.
+    :param config: Dictionary containing the configuration of the application.
+    :return:
+    """
+    if get_nested(config, 'batch.output.merge-to-one-file', True):
+        return None
+    folder = get_nested(config, 'batch.output.path', './')
+    return set(os.listdir(folder)) if os.path.isdir(folder) else set()
+
+
+def _is_selected(day: str, first_day: str | None, last_day: str | None, existing_files: set[str] | None) -> bool:
+    """
+    Tells whether a day is in the date window and not written yet.
+    """
+    if (first_day and day < first_day) or (last_day and day > last_day):
+        return False
+    return existing_files is None or not any(f.startswith(day) for f in existing_files)
+
+
+def _select_days(parser: Parser, first_day: str | None, last_day: str | None, existing_files: set[str] | None,
+                 logger) -> list[str]:
+    """
+    Returns the sorted days to summarize: the ones in the date window, if any, not already processed.
+    """
+    day_list = parser.get_available_days()
+    logger.info(f'Found {len(day_list)} days of messages...')
+
+    # restrict to the date window, if any
+    if first_day or last_day:
+        day_list = parser.get_days_between(first_day, last_day)
+        logger.info(f'Summarizing {len(day_list)} days between {first_day or "the start"} and {last_day or "the end"}')
+
     # filter out already-processed days when not writing to a single file
-    if not writer.single_file:
-        existing_files = set(os.listdir(writer.folder)) if os.path.isdir(writer.folder) else set()
+    if existing_files is not None:
         skipped = [day for day in day_list if any(f.startswith(day) for f in existing_files)]
         if skipped:
             logger.info(f'Skipping {len(skipped)} already-processed days')
             day_list = [day for day in day_list if day not in skipped]
+    return day_list
 
-    # get summary and write each day diary
-    asyncio.run(_batch_process_days(day_list, parser, ai_processor, writer, logger))
 
+def _get_date_window(config: dict) -> tuple[str | None, str | None]:
+    """
+    Reads the first and last day to summarize, yaml parses unquoted dates as date objects.
+    :param config: Dictionary containing the configuration of the application.
+    :return: the ISO dates of the window bounds, None for an open bound
+    """
+    first_day = get_nested(config, 'batch.date-window.start', None)
+    last_day = get_nested(config, 'batch.date-window.end', None)
+    return (str(first_day) if first_day else None), (str(last_day) if last_day else None)
+
+
+def _parse_files(files: list[InputFile], input_file_type: InputFileType, reader: Reader, parser: Parser, config: dict,
+                 logger):
+    """
+    Reads, standardizes and parses the provided files into the parser bucket.
+    Files found in the message cache are loaded already normalized, the others are read and stored in the cache.
+    Files are always added to the bucket in their original order, whether they come from the cache or not.
+    """
+    streaming = get_nested(config, 'batch.input.streaming', False)
+    workers = get_worker_count(get_nested(config, 'batch.input.workers', 1))
+    split_size = int(get_nested(config, 'batch.input.split-file-size-mb', 64) * 1024 * 1024)
+    cache = message_cache_factory(input_file_type, config)
+
+    # validate input files are not empty, sizes come from the directory scan
+    non_empty_files: list[InputFile] = []
+    for input_file in files:
+        if input_file['size'] == 0:
+            logger.warning(f'Skipping empty file: {input_file["path"]}')
+            continue
+        non_empty_files.append(input_file)
+
+    # only the keys are checked up front, cached messages are loaded one file at a time when their turn comes
+    cached_files: set[str] = set()
+    if cache is not None:
+        cached_files = {input_file['path'] for input_file in non_empty_files if cache.contains(input_file)}
+        logger.info(f'Found {len(cached_files)} of {len(non_empty_files)} files in the message cache')
+
+    files_to_read = [input_file for input_file in non_empty_files if input_file['path'] not in cached_files]
+    messages_per_file = _read_files(files_to_read, input_file_type, reader, config, workers, streaming, split_size,
+                                    logger)
 
-async def _batch_process_days(day_list: list[str], parser: Parser, ai_processor: AiProcessor, writer: Writer, logger):
+    for input_file in non_empty_files:
+        file = input_file['path']
+        if file in cached_files:
+            cached_messages = cache.load(input_file)
+            if cached_messages is not None:
+                logger.debug(f'Loading {file} from the message cache...')
+                duplicates = parser.add_messages(cached_messages, reader.message_order, input_file['thread'])
+                _log_duplicates(file, duplicates, logger)
+                continue
+            # the entry became unreadable since it was checked, the file is read instead
+            standardized_messages = next(_read_files([input_file], input_file_type, reader, config, 1, streaming,
+                                                     split_size, logger))
+        else:
+            standardized_messages = next(messages_per_file)
+        if standardized_messages is None:
+            continue
+        try:
+            logger.debug(f'Parsing {file}...')
+            if cache is None:
+                duplicates = parser.parse(standardized_messages, reader.message_order, input_file['thread'])
+            else:
+                normalized_messages = list(parser.normalize(standardized_messages))
+                duplicates = parser.add_messages(normalized_messages, reader.message_order, input_file['thread'])
+                cache.store(input_file, normalized_messages)
+            _log_duplicates(file, duplicates, logger)
+        except Exception as e:
+            # streamed files are decoded while parsing
+            logger.error(f'Failed to read {file}: {e}')
+
+
+def _log_duplicates(file: str, duplicates: int, logger):
+    if duplicates > 0:
+        logger.info(f'Dropped {duplicates} messages of {file} already found in a previous file')
+
+
+def _read_files(files: list[InputFile], input_file_type: InputFileType, reader: Reader, config: dict, workers: int,
+                streaming: bool, split_size: int, logger) -> Iterator[Iterable[Message] | None]:
+    """
+    Reads and standardizes the provided files, yielding their messages in the original file order.
+    With more than one worker, files are read on a process pool.
+    Yields None for the files that can not be read or have no messages, so results stay aligned with the files.
+    """
+    paths = [input_file['path'] for input_file in files]
+    splittable = any(0 < split_size < input_file['size'] for input_file in files)
+
+    if workers > 1 and (len(paths) > 1 or splittable):
+        logger.debug(f'Reading {len(paths)} files with {workers} worker processes...')
+        for file, standardized_messages, error in read_files_parallel(paths, input_file_type, config, workers,
+                                                                      streaming, split_size):
+            if error is not None:
+                logger.error(f'Failed to read {file}: {error}')
+                yield None
+            elif not standardized_messages:
+                logger.warning(f'No messages found in {file}, skipping')
+                yield None
+            else:
+                yield standardized_messages
+        return
+
+    for file in paths:
+        if streaming:
+            # messages are standardized and parsed one at a time, the file is never fully loaded in memory
+            logger.debug(f'Streaming {file}...')
+            yield reader.stream_messages(file)
+            continue
+        try:
+            logger.debug(f'Reading {file}...')
+            raw_messages = reader.read(file)
+            logger.debug(f'Standardizing {file}...')
+            standardized_messages = reader.standardize_messages(raw_messages)
+        except Exception as e:
+            # a file that is not a chat export of the configured type, skip it and keep going
+            logger.error(f'Failed to read {file}: {e}')
+            yield None
+            continue
+        if not standardized_messages:
+            logger.warning(f'No messages found in {file}, skipping')
+            yield None
+            continue
+        yield standardized_messages
+
+
+async def _batch_process_days(day_list: list[str], parser: Parser, ai_processor: AiProcessor, writer: Writer, logger,
+                              concurrency_limit: int = 1):
     """
     Processes the diary entry of  multiple days with concurrent processing.
+    At most concurrency_limit days are summarized at the same time, so only their chat logs are held in memory and
+    every day is written as soon as its own calls are done.
     """
     total = len(day_list)
     counter = {"done": 0}
+    day_slots = asyncio.Semaphore(concurrency_limit)
     # Create a task for every day
-    tasks = [_process_single_day(day, parser, ai_processor, writer, logger, counter, total) for day in day_list]
+    tasks = [_process_single_day(day, parser, ai_processor, writer, logger, counter, total, day_slots=day_slots)
+             for day in day_list]
 
     # Execute tasks with parallel processing
     completed_days = await asyncio.gather(*tasks, return_exceptions=True)
@@ -102,8 +392,75 @@ async def _batch_process_days(day_list: list[str], parser: Parser, ai_processor:
     return completed_days
 
 
+async def _stream_days(files: list[InputFile], input_file_type: InputFileType, reader: Reader, parser: Parser,
+                       ai_processor: AiProcessor, writer: Writer, config: dict, first_day: str | None,
+                       last_day: str | None, existing_files: set[str] | None, logger):
+    """
+    Parses the files on a worker thread and summarizes every day as soon as it is sealed (see DaySealer), overlapping
+    the parsing with the LLM calls. Summaries are only written once parsing is done: a later file, or an input not
+    actually time ordered, may still add messages to a sealed day, whose early summary is then dropped and the day
+    summarized again, so every day is written once. The days never sealed (the last ones, or the ones only made of a
+    chat session carried back) are summarized once parsing is done too.
+    """
+    loop = asyncio.get_running_loop()
+    sealed_days: asyncio.Queue[tuple[str, Sequence[int]] | None] = asyncio.Queue()
+    DaySealer(parser, reader.message_order,
+              lambda day, rows: loop.call_soon_threadsafe(sealed_days.put_nowait, (day, rows)))
+    parsing = asyncio.create_task(asyncio.to_thread(_parse_files, files, input_file_type, reader, parser, config,
+                                                    logger))
+    parsing.add_done_callback(lambda _: sealed_days.put_nowait(None))
+
+    day_slots = asyncio.Semaphore(get_nested(config, 'inference-service.concurrency-limit', 1))
+    sealed_rows: dict[str, Sequence[int]] = {}
+    early_summaries: dict[str, asyncio.Task] = {}
+    while (sealed := await sealed_days.get()) is not None:
+        day, rows = sealed
+        if not _is_selected(day, first_day, last_day, existing_files):
+            continue
+        logger.debug(f'{day} is sealed, summarizing it while parsing...')
+        sealed_rows[day] = rows
+        early_summaries[day] = asyncio.create_task(
+            _summarize_day(ai_processor, MessageView(parser.message_store, rows), day_slots))
+    await parsing
+    parser.day_sealer = None
+    logger.info(f'Started summarizing {len(early_summaries)} days while parsing')
+
+    logger.debug('Sorting parser bucket...')
+    await asyncio.to_thread(parser.sort_bucket)
+    day_list = _select_days(parser, first_day, last_day, existing_files, logger)
+    changed = {day for day, rows in sealed_rows.items() if list(rows) != list(parser.get_messages(day).rows)}
+    if changed:
+        logger.warning(f'{len(changed)} days changed after being sealed, the input is not time ordered: '
+                       f'summarizing them again')
+        for day in changed:
+            early_summaries.pop(day).cancel()
+
+    counter = {"done": 0}
+    # early summaries are popped, so a written day releases its summary state and its chat log lines
+    tasks = [_process_single_day(day, parser, ai_processor, writer, logger, counter, len(day_list),
+                                 day_slots=day_slots, summary=early_summaries.pop(day, None))
+             for day in day_list]
+    completed_days = await asyncio.gather(*tasks, return_exceptions=True)
+    for day, result in zip(day_list, completed_days):
+        if isinstance(result, Exception):
+            logger.error(f'Failed to process {day}: {result}')
+
+    writer.close()
+
+    return completed_days
+
+
+async def _summarize_day(ai_processor: AiProcessor, messages: MessageView, day_slots: asyncio.Semaphore) -> dict:
+    """
+    Summarizes the messages of a day in one of the day slots.
+    """
+    async with day_slots:
+        return await ai_processor.get_summary_async(messages)
+
+
 async def _process_single_day(day: str, parser: Parser, ai_processor: AiProcessor, writer: Writer, logger,
-                              counter: dict, total: int):
+                              counter: dict, total: int, day_slots: asyncio.Semaphore = None,
+                              summary: Awaitable[dict] = None):
     """
     Processes the diary entry of a single day.
     :param day:
@@ -111,16 +468,25 @@ async def _process_single_day(day: str, parser: Parser, ai_processor: AiProcesso
     :param ai_processor:
     :param writer:
     :param logger:
+    :param total: how many days are processed
+    :param day_slots: bounds the days summarized at the same time, None for no bound
+    :param summary: summary of the day already being generated, awaited instead of summarizing the day again
     :return:
     """
     try:
-        # get chat log
-        logger.debug(f'Getting chat log for {day}...')
-        messages = parser.get_messages(day)
+        if summary is not None:
+            summary = await summary
+        else:
+            async with day_slots or nullcontext():
+                # get chat log
+                logger.debug(f'Getting chat log for {day}...')
+                messages = parser.get_messages(day)
 
-        # compute summary
-        logger.debug(f'Generating summary for {day}...')
-        summary = await ai_processor.get_summary_async(messages)
+                # compute summary
+                logger.debug(f'Generating summary for {day}...')
+                summary = await ai_processor.get_summary_async(messages)
+        if summary.get("tokens_saved"):
+            logger.info(f'The message filter saved {summary["tokens_saved"]} tokens of {day}')
 
         # write to file
         logger.debug(f'Writing file for {day}...')
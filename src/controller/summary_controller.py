@@ -1,9 +1,14 @@
+import os
+import tempfile
+from datetime import date
+
 from flask import jsonify
 from flask.views import MethodView
 from flask_smorest import Blueprint
 from threading import Semaphore
 
 from src.dto.enums.input_file_type import InputFileType
+from src.dto.schemas.archive_upload_request_schema import ArchiveUploadFilesSchema, ArchiveUploadRequestSchema
 from src.dto.schemas.instagram_export_request_schema import InstagramExportRequestSchema
 from src.dto.schemas.summary_response_schema import SummaryResponseSchema
 from src.dto.schemas.whatsapp_export_request_schema import WhatsappExportRequestSchema
@@ -11,8 +16,10 @@ from src.service.ai_processor.ai_processor import AiProcessor
 from src.service.ai_processor.ai_processor_factory import ai_processor_factory
 from src.service.config_service import get_nested
 from src.service.logging_service import LoggingService
+from src.service.parser.parser import Parser
 from src.service.parser.parser_factory import parser_factory
 from src.service.reader.reader_factory import reader_factory
+from src.service.writer.writer import get_intermediate_steps
 
 _ALLOWED_CONFIG_KEYS = {'parsing', 'summarization'}
 
@@ -46,19 +53,42 @@ def set_config(config: dict):
     ai_semaphore = Semaphore(ai_processor.concurrency_limit)
 
 
-def execute_summary_request(input_type: InputFileType, current_config: dict, raw_messages) -> dict:
-    export_intermediate_steps = get_nested(current_config, 'output.export-intermediate-steps', False)
-
+def execute_summary_request(input_type: InputFileType, current_config: dict, raw_messages, start_date: date = None,
+                            end_date: date = None) -> dict:
     # instantiate services
     reader = reader_factory(input_type, current_config)
     parser = parser_factory(input_type, current_config)
 
-    # standardize, parse, and sort messages
+    # standardize and parse messages
     standardized_messages = reader.standardize_messages(raw_messages)
-    parser.parse(standardized_messages)
+    parser.parse(standardized_messages, reader.message_order)
+
+    return _summarize_parsed_messages(parser, current_config, start_date, end_date)
+
+
+def execute_archive_summary_request(input_type: InputFileType, current_config: dict, archive_path: str,
+                                    start_date: date = None, end_date: date = None) -> dict:
+    # instantiate services
+    reader = reader_factory(input_type, current_config)
+    parser = parser_factory(input_type, current_config)
+
+    # stream every chat file of the archive, without extracting it
+    for input_file in reader.scan_input(os.fsencode(archive_path)):
+        parser.parse(reader.stream_messages(input_file['path']), reader.message_order, input_file['thread'])
+
+    return _summarize_parsed_messages(parser, current_config, start_date, end_date)
+
+
+def _summarize_parsed_messages(parser: Parser, current_config: dict, start_date: date = None,
+                               end_date: date = None) -> dict:
+    export_intermediate_steps = get_nested(current_config, 'output.export-intermediate-steps', False)
+
     parser.sort_bucket()
 
     day_list = parser.get_available_days()
+    # restrict to the date window, if any
+    if start_date or end_date:
+        day_list = parser.get_days_between(start_date and start_date.isoformat(), end_date and end_date.isoformat())
 
     diary_entries = []
 
@@ -70,8 +100,7 @@ def execute_summary_request(input_type: InputFileType, current_config: dict, raw
             "summary": str(summary_state.get('summary', '')),
         }
         if export_intermediate_steps:
-            intermediate = {k: v for k, v in summary_state.items() if k not in ("summary", "ai_chat")}
-            entry["intermediate_steps"] = intermediate
+            entry["intermediate_steps"] = get_intermediate_steps(summary_state, ai_processor.chat_log_format)
         diary_entries.append(entry)
 
     return {
@@ -90,7 +119,8 @@ class IEMessageResource(MethodView):
             return jsonify({"error": "AI service busy, try again later"}), 503
         current_config = _safe_config_merge(app_config, payload.get("configs", {}))
         try:
-            response = execute_summary_request(InputFileType.INSTAGRAM_EXPORT, current_config, payload)
+            response = execute_summary_request(InputFileType.INSTAGRAM_EXPORT, current_config, payload,
+                                               payload.get("start_date"), payload.get("end_date"))
             return jsonify(response)
         finally:
             ai_semaphore.release()
@@ -107,6 +137,34 @@ class WEMessageResource(MethodView):
             return jsonify({"error": "AI service busy, try again later"}), 503
         current_config = _safe_config_merge(app_config, payload.get("configs", {}))
         try:
-            return jsonify(execute_summary_request(InputFileType.WHATSAPP_EXPORT, current_config, payload["messages"]))
+            return jsonify(execute_summary_request(InputFileType.WHATSAPP_EXPORT, current_config, payload["messages"],
+                                                   payload.get("start_date"), payload.get("end_date")))
+        finally:
+            ai_semaphore.release()
+
+
+@blp.route("/archive")
+class ArchiveResource(MethodView):
+    @blp.arguments(ArchiveUploadRequestSchema, location="form")
+    @blp.arguments(ArchiveUploadFilesSchema, location="files")
+    @blp.response(200, SummaryResponseSchema)
+    def post(self, payload, files):
+        """Creates a diary page from an Instagram or Whatsapp export zip archive, as downloaded from the platform"""
+        acquired = ai_semaphore.acquire(blocking=False)
+        if not acquired:
+            return jsonify({"error": "AI service busy, try again later"}), 503
+        current_config = _safe_config_merge(app_config, payload["configs"])
+        archive_path = None
+        try:
+            # zip archives need random access, the upload is spooled to a temporary file and read from there
+            with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as archive:
+                archive_path = archive.name
+                files["archive"].save(archive)
+            return jsonify(execute_archive_summary_request(payload["type"], current_config, archive_path,
+                                                           payload.get("start_date"), payload.get("end_date")))
+        except FileNotFoundError:
+            return jsonify({"error": "No chat files found in the archive"}), 400
         finally:
+            if archive_path is not None:
+                os.unlink(archive_path)
             ai_semaphore.release()
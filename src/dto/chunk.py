@@ -1,10 +1,20 @@
 from datetime import datetime
-from typing import TypedDict
+from typing import NotRequired, Sequence, TypedDict
+
+from src.dto.message import Message
 
 
 class Chunk(TypedDict):
-    content: str
+    # the chat log lines of the whole day, shared by all of its chunks: never exported, see writer.export_chunk
+    lines: Sequence[str]
+    # the messages of the lines, for the renderings other than the lines
+    messages: Sequence[Message]
+    # range of the chunk in the lines, the content is only joined when the prompt is built
+    start_index: int
+    end_index: int
     messages_count: int
     start_timestamp: datetime
     end_timestamp: datetime
     token_count: int
+    # conversation of the messages, set when chunking thread by thread
+    thread: NotRequired[str]
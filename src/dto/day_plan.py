@@ -0,0 +1,19 @@
+from typing import NotRequired, TypedDict
+
+
+class DayPlan(TypedDict):
+    day: str
+    # messages of the day, before and after the message filter
+    messages: int
+    filtered_messages: int
+    tokens_saved: int
+    # a call per chunk, none for the linear strategy
+    map_calls: int
+    map_prompt_tokens: int
+    # the call writing the diary entry, the only one of the linear strategy
+    reduce_calls: int
+    reduce_prompt_tokens: int
+    # tokens written by the LLM, as planned
+    output_tokens: int
+    # time of the calls of the day, one after the other, set with the tokens per second rate
+    seconds: NotRequired[float]
@@ -0,0 +1,6 @@
+from enum import StrEnum
+
+
+class ChatLogFormat(StrEnum):
+    FULL = "FULL"
+    COMPACT = "COMPACT"
@@ -0,0 +1,6 @@
+from enum import StrEnum
+
+
+class ChunkingPolicy(StrEnum):
+    TOKENS = "TOKENS"
+    GAPS = "GAPS"
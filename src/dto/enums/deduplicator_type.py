@@ -0,0 +1,6 @@
+from enum import StrEnum
+
+
+class DeduplicatorType(StrEnum):
+    EXACT = "EXACT"
+    BLOOM = "BLOOM"
@@ -0,0 +1,7 @@
+from enum import StrEnum
+
+
+class MessageOrder(StrEnum):
+    ASCENDING = "ASCENDING"
+    DESCENDING = "DESCENDING"
+    UNORDERED = "UNORDERED"
@@ -4,3 +4,4 @@ from enum import StrEnum
 class RunMode(StrEnum):
     BATCH = "batch"
     API = "api"
+    PLAN = "plan"
@@ -0,0 +1,7 @@
+from enum import StrEnum
+
+
+class TokenEstimatorType(StrEnum):
+    LENGTH = "LENGTH"
+    SCRIPT = "SCRIPT"
+    VOCABULARY = "VOCABULARY"
@@ -0,0 +1,8 @@
+from typing import TypedDict
+
+
+class InputFile(TypedDict):
+    path: str
+    thread: str
+    size: int
+    mtime_ns: int
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import TypedDict
+from typing import TypedDict, NotRequired
 
 
 class Message(TypedDict):
@@ -7,3 +7,6 @@ class Message(TypedDict):
     timestamp: datetime
     token_count: int
     content: str
+    day: NotRequired[str]
+    # conversation the message belongs to, the empty string when unknown
+    thread: NotRequired[str]
@@ -0,0 +1,30 @@
+import json
+
+from flask_smorest.fields import Upload
+from marshmallow import fields, post_load, Schema, ValidationError
+
+from src.dto.enums.input_file_type import InputFileType
+
+
+class ArchiveUploadRequestSchema(Schema):
+    type = fields.Enum(InputFileType, required=True)
+    # multipart forms can not nest objects, overrides are sent as a json string
+    configs = fields.Str()
+    # only summarize the days in this window, both included
+    start_date = fields.Date()
+    end_date = fields.Date()
+
+    @post_load
+    def decode_configs(self, data, **kwargs):
+        try:
+            configs = json.loads(data.get("configs") or "{}")
+        except json.JSONDecodeError as e:
+            raise ValidationError(f"Invalid json: {e}", "configs")
+        if not isinstance(configs, dict):
+            raise ValidationError("Must be a json object", "configs")
+        data["configs"] = configs
+        return data
+
+
+class ArchiveUploadFilesSchema(Schema):
+    archive = Upload(required=True)
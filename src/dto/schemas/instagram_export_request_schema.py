@@ -6,3 +6,6 @@ from src.dto.schemas.instagram_export_message_schema import InstagramExportMessa
 class InstagramExportRequestSchema(Schema):
     configs = fields.Dict(keys=fields.Str())
     messages = fields.List(fields.Nested(InstagramExportMessageSchema), required=True)
+    # only summarize the days in this window, both included
+    start_date = fields.Date()
+    end_date = fields.Date()
@@ -4,3 +4,6 @@ from marshmallow import fields, Schema
 class WhatsappExportRequestSchema(Schema):
     configs = fields.Dict(keys=fields.Str())
     messages = fields.List(fields.Str(), required=True)
+    # only summarize the days in this window, both included
+    start_date = fields.Date()
+    end_date = fields.Date()
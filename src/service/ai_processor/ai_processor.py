@@ -2,11 +2,19 @@ import asyncio
 import logging
 import threading
 from abc import ABC, abstractmethod
+from typing import Sequence
 
 from langchain_core.globals import set_verbose
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langgraph.constants import START
+from langgraph.graph import StateGraph
 
+from src.dto.day_plan import DayPlan
 from src.dto.message import Message
 from src.service.logging_service import LoggingService
+from src.service.message_filter.message_filter import MessageFilter
+from src.service.token_estimator.token_estimator import TokenEstimator
 
 # Shared event loop for sync calls (avoids creating a new loop per request)
 _loop = asyncio.new_event_loop()
@@ -14,14 +22,27 @@ _loop_thread = threading.Thread(target=_loop.run_forever, daemon=True)
 _loop_thread.start()
 
 
+def count_prompt_tokens(prompt: list[BaseMessage], token_estimator: TokenEstimator) -> int:
+    """
+    Estimates how many tokens the messages sent to the LLM take.
+    :param prompt:
+    :param token_estimator:
+    :return:
+    """
+    return sum(token_estimator.estimate(message.content) for message in prompt)
+
+
 class AiProcessor(ABC):
 
-    def __init__(self, logging_service: LoggingService, concurrency_limit: int, initial_state: dict):
+    def __init__(self, logging_service: LoggingService, concurrency_limit: int, initial_state: dict,
+                 message_filter: MessageFilter = None):
         self.logger = logging_service.get_logger(__name__)
         set_verbose(self.logger.isEnabledFor(logging.DEBUG))
         self.concurrency_limit = concurrency_limit
         self.semaphore = asyncio.Semaphore(self.concurrency_limit)
-        self.initial_state = initial_state
+        # drops the trivial messages before summarizing, None to keep every message
+        self.message_filter = message_filter
+        self.initial_state = initial_state | {"tokens_saved": 0}
 
         # Create LangGraph
         self.graph = self.build_graph()
@@ -31,6 +52,60 @@ class AiProcessor(ABC):
         """Build and compile the LangGraph"""
         pass
 
+    def add_start(self, graph_builder: StateGraph, node: str) -> None:
+        """
+        Starts the graph at the given node, through the message filter when there is one.
+        :param graph_builder:
+        :param node: first node summarizing the messages
+        :return:
+        """
+        if self.message_filter is None:
+            graph_builder.add_edge(START, node)
+            return
+        graph_builder.add_node("filter-messages", self._filter_messages)
+        graph_builder.add_edge(START, "filter-messages")
+        graph_builder.add_edge("filter-messages", node)
+
+    async def _filter_messages(self, state: dict) -> dict:
+        """Node function that drops the trivial messages and collapses the runs of placeholders"""
+        messages, tokens_saved = self.filter_messages(state["messages"])
+        self.logger.debug(f'Filtered {len(state["messages"])} messages down to {len(messages)}, '
+                          f'saving {tokens_saved} tokens')
+        return {
+            "messages": messages,
+            "tokens_saved": tokens_saved
+        }
+
+    def filter_messages(self, messages: Sequence[Message]) -> tuple[Sequence[Message], int]:
+        """
+        Applies the message filter, if any.
+        :param messages:
+        :return: the remaining messages and the tokens saved
+        """
+        if self.message_filter is None:
+            return messages, 0
+        return self.message_filter.filter(messages)
+
+    @abstractmethod
+    def plan_day(self, day: str, messages: Sequence[Message], token_estimator: TokenEstimator,
+                 output_tokens: int) -> DayPlan:
+        """
+        Plans the LLM calls summarizing a day would make, building their prompts without calling the LLM.
+        :param day:
+        :param messages: messages of the day
+        :param token_estimator: counts the tokens of the prompts
+        :param output_tokens: tokens the LLM is expected to write per call
+        :return:
+        """
+
+    @abstractmethod
+    def get_sample_call(self, messages: Sequence[Message]) -> tuple[BaseChatModel, list[BaseMessage]]:
+        """
+        Returns the client and the prompt of a call summarizing the messages would make, to time the LLM.
+        :param messages:
+        :return:
+        """
+
     def save_graph(self):
         """Draws a mermaid representation of the built graph"""
         png_data = self.graph.get_graph().draw_mermaid_png()
@@ -44,11 +119,20 @@ class AiProcessor(ABC):
         return future.result()
 
     async def get_summary_async(self, messages: list[Message]) -> dict:
-        """Asynchronous method to get AI summary with concurrency control"""
+        """Asynchronous method to get AI summary, LLM calls are limited by the concurrency limit"""
 
         state = self.initial_state.copy()
         state["messages"] = messages
 
+        # Invoke the graph, setting a high recursion limit, because iterations are programmatically decided
+        return await self.graph.ainvoke(state, {"recursion_limit": 1000})
+
+    async def invoke(self, client: BaseChatModel, messages: list[BaseMessage]) -> BaseMessage:
+        """
+        Calls the LLM, at most concurrency_limit calls run at the same time, whatever day or chunk they belong to.
+        :param client:
+        :param messages:
+        :return:
+        """
         async with self.semaphore:
-            # Invoke the graph, setting a high recursion limit, because iterations are programmatically decided
-            return await self.graph.ainvoke(state, {"recursion_limit": 1000})
+            return await client.ainvoke(messages)
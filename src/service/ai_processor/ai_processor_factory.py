@@ -1,9 +1,15 @@
+from datetime import timedelta
+
+from src.dto.enums.chat_log_format import ChatLogFormat
+from src.dto.enums.chunking_policy import ChunkingPolicy
 from src.dto.enums.summarization_strategy import SummarizationStrategy
 from src.service.ai_processor.ai_processor import AiProcessor
 from src.service.ai_processor.linear_ai_processor import LinearAiProcessor
 from src.service.ai_processor.map_reduce_ai_processor import MapReduceAiProcessor
 from src.service.config_service import get_nested
 from src.service.logging_service import LoggingService
+from src.service.message_filter.message_filter_factory import message_filter_factory
+from src.service.token_estimator.token_estimator_factory import token_estimator_factory
 
 
 def ai_processor_factory(config: dict) -> AiProcessor:
@@ -41,14 +47,24 @@ def _get_linear_processor(config: dict, logging_service, api_key, base_url, time
     top_p = linear_configs.get('top-p', 0.7)
     system_prompt = linear_configs.get('system-prompt', '')
     user_prompt = linear_configs.get('user-prompt', '')
+    chat_log_format = _get_chat_log_format(linear_configs)
     return LinearAiProcessor(logging_service, system_prompt, user_prompt, model_name, temperature, max_tokens, top_p,
                              api_key,
-                             base_url, timeout, concurrency_limit)
+                             base_url, timeout, concurrency_limit, message_filter_factory(config), chat_log_format)
 
 
 def _get_map_reduce_processor(config: dict, logging_service, api_key, base_url, timeout,
                               concurrency_limit) -> MapReduceAiProcessor:
     token_per_chunk = get_nested(config, 'summarization.map-reduce-strategy.token-per-chunk', 4000)
+    overlap_tokens = get_nested(config, 'summarization.map-reduce-strategy.overlap-tokens', 100)
+    chunking_policy = get_nested(config, 'summarization.map-reduce-strategy.chunking-policy', ChunkingPolicy.TOKENS)
+    if chunking_policy not in [e for e in ChunkingPolicy]:
+        message = f"Chunking policy not supported, please choose one of the following: {[e for e in ChunkingPolicy]}"
+        raise ValueError(message)
+    gap_tolerance = get_nested(config, 'summarization.map-reduce-strategy.gap-tolerance', 0.25)
+    min_gap = timedelta(minutes=get_nested(config, 'summarization.map-reduce-strategy.min-gap-minutes', 30))
+    per_thread = get_nested(config, 'summarization.map-reduce-strategy.per-thread', True)
+    chat_log_format = _get_chat_log_format(get_nested(config, 'summarization.map-reduce-strategy', {}))
     # Map agent settings
     map_configs = get_nested(config, 'summarization.map-reduce-strategy.map-agent', {})
     map_max_tokens = map_configs.get('max-tokens', 2000)
@@ -72,4 +88,14 @@ def _get_map_reduce_processor(config: dict, logging_service, api_key, base_url,
                                 map_model_name, map_temperature, map_max_tokens,
                                 map_top_p, reduce_system_prompt, reduce_user_prompt, reduce_model_name,
                                 reduce_temperature, reduce_max_tokens, reduce_top_p, token_per_chunk, api_key, base_url,
-                                timeout, concurrency_limit)
+                                timeout, concurrency_limit, token_estimator_factory(config), overlap_tokens,
+                                ChunkingPolicy(chunking_policy), gap_tolerance, min_gap, per_thread,
+                                message_filter_factory(config), chat_log_format)
+
+
+def _get_chat_log_format(strategy_configs: dict) -> ChatLogFormat:
+    chat_log_format = strategy_configs.get('chat-log-format', ChatLogFormat.FULL)
+    if chat_log_format not in [e for e in ChatLogFormat]:
+        message = f"Chat log format not supported, please choose one of the following: {[e for e in ChatLogFormat]}"
+        raise ValueError(message)
+    return ChatLogFormat(chat_log_format)
@@ -1,31 +1,39 @@
-from typing import Annotated, TypedDict
+from typing import Annotated, Sequence, TypedDict
 
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
-from langgraph.constants import START, END
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langgraph.constants import END
 from langgraph.graph import StateGraph
 from langgraph.graph.message import add_messages
 from langgraph.graph.state import CompiledStateGraph
 
+from src.dto.day_plan import DayPlan
+from src.dto.enums.chat_log_format import ChatLogFormat
 from src.dto.message import Message
-from src.service.ai_processor.ai_processor import AiProcessor
+from src.service.ai_processor.ai_processor import AiProcessor, count_prompt_tokens
 from src.service.logging_service import LoggingService
+from src.service.message_filter.message_filter import MessageFilter
 from src.service.parser.parser import get_chat_log
+from src.service.token_estimator.token_estimator import TokenEstimator
 
 
 # Define the state schema for LangGraph
 class ChatState(TypedDict, total=False):
     ai_chat: Annotated[list, add_messages]
     messages: list[Message]
+    tokens_saved: int
     summary: str
 
 
 class LinearAiProcessor(AiProcessor):
     def __init__(self, logging_service: LoggingService, system_prompt: str, user_prompt: str, model_name: str = "gemma-3-4b-it-qat",
                  temperature: float = 0.4, max_tokens: int = 2000, top_p: float = 0.7, api_key: str = "",
-                 base_url: str = "", timeout: int = 600, concurrency_limit: int = 2):
+                 base_url: str = "", timeout: int = 600, concurrency_limit: int = 2,
+                 message_filter: MessageFilter = None, chat_log_format: ChatLogFormat = ChatLogFormat.FULL):
         self.system_prompt = system_prompt
         self.user_prompt = user_prompt
+        self.chat_log_format = chat_log_format
 
         # Initialize OpenAI client with custom configuration
         self.openai_client = ChatOpenAI(
@@ -46,7 +54,7 @@ class LinearAiProcessor(AiProcessor):
             "summary": ""
         }
 
-        super().__init__(logging_service, concurrency_limit, initial_state)
+        super().__init__(logging_service, concurrency_limit, initial_state, message_filter)
 
     def build_graph(self) -> CompiledStateGraph:
         """Build and compile the LangGraph"""
@@ -57,7 +65,7 @@ class LinearAiProcessor(AiProcessor):
         graph_builder.add_node("summarize", self._summarize_node)
 
         # draw graph
-        graph_builder.add_edge(START, "summarize")
+        self.add_start(graph_builder, "summarize")
         graph_builder.add_edge("summarize", END)
 
         # Compile the graph
@@ -65,24 +73,47 @@ class LinearAiProcessor(AiProcessor):
 
     async def _summarize_node(self, state: ChatState) -> ChatState:
         """Node function that processes chat logs and generates summaries"""
-        # get chat log
         messages = state["messages"]
-        chat_log = get_chat_log(messages)
         self.logger.debug(f'Processing chat log, {len(messages)} messages')
-
-        ai_chat_messages = []
-        if self.system_prompt:
-            ai_chat_messages.append(SystemMessage(content=self.system_prompt))
-
-        # Format the user prompt with the chat log
-        formatted_prompt = self.user_prompt.format(messages=chat_log) if self.user_prompt else chat_log
-        ai_chat_messages.append(HumanMessage(content=formatted_prompt))
+        ai_chat_messages = self.get_prompt(messages)
 
         # Get response from LLM
-        response = await self.openai_client.ainvoke(ai_chat_messages)
+        response = await self.invoke(self.openai_client, ai_chat_messages)
         summary = response.content if response.content else ""
 
         return {
             "ai_chat": ai_chat_messages + [response],
             "summary": summary
         }
+
+    def get_prompt(self, messages: Sequence[Message]) -> list[BaseMessage]:
+        """
+        Builds the messages sent to the LLM for the chat log of the messages.
+        :param messages:
+        :return:
+        """
+        chat_log = get_chat_log(messages, self.chat_log_format)
+
+        ai_chat_messages = []
+        if self.system_prompt:
+            ai_chat_messages.append(SystemMessage(content=self.system_prompt))
+
+        # Format the user prompt with the chat log
+        formatted_prompt = self.user_prompt.format(messages=chat_log) if self.user_prompt else chat_log
+        ai_chat_messages.append(HumanMessage(content=formatted_prompt))
+        return ai_chat_messages
+
+    def plan_day(self, day: str, messages: Sequence[Message], token_estimator: TokenEstimator,
+                 output_tokens: int) -> DayPlan:
+        """
+        Plans the single call of a day, counted as its reduce call as it writes the diary entry.
+        """
+        filtered, tokens_saved = self.filter_messages(messages)
+        prompt_tokens = count_prompt_tokens(self.get_prompt(filtered), token_estimator)
+        return DayPlan(day=day, messages=len(messages), filtered_messages=len(filtered), tokens_saved=tokens_saved,
+                       map_calls=0, map_prompt_tokens=0, reduce_calls=1, reduce_prompt_tokens=prompt_tokens,
+                       output_tokens=output_tokens)
+
+    def get_sample_call(self, messages: Sequence[Message]) -> tuple[BaseChatModel, list[BaseMessage]]:
+        filtered, _ = self.filter_messages(messages)
+        return self.openai_client, self.get_prompt(filtered)
@@ -1,29 +1,44 @@
-from typing import Annotated, TypedDict, Literal
+from datetime import timedelta
+from typing import Annotated, Sequence, TypedDict, Literal
 
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
-from langgraph.constants import START, END
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langgraph.constants import END
 from langgraph.graph import StateGraph
 from operator import add
 from langgraph.graph.message import add_messages
 from langgraph.graph.state import CompiledStateGraph
+from langgraph.types import Send
 
 from src.dto.chunk import Chunk
+from src.dto.day_plan import DayPlan
+from src.dto.enums.chat_log_format import ChatLogFormat
+from src.dto.enums.chunking_policy import ChunkingPolicy
 from src.dto.message import Message
-from src.service.ai_processor.ai_processor import AiProcessor
+from src.service.ai_processor.ai_processor import AiProcessor, count_prompt_tokens
 from src.service.logging_service import LoggingService
-from src.service.parser.parser import get_chat_log_chunked
+from src.service.message_filter.message_filter import MessageFilter
+from src.service.parser.message_store import group_messages_by_thread
+from src.service.parser.parser import get_chat_log_chunked, get_chunk_content
+from src.service.token_estimator.token_estimator import TokenEstimator
 
 
 # Define the state schema for LangGraph
 class ChatState(TypedDict, total=False):
     ai_chat: Annotated[list, add_messages]
     messages: list[Message]
+    tokens_saved: int
     chunks: list[Chunk]
     mini_summaries: Annotated[list, add]
     summary: str
 
 
+# state of a single map call, one per chunk
+class MapState(TypedDict):
+    chunk: Chunk
+
+
 class MapReduceAiProcessor(AiProcessor):
     def __init__(self, logging_service: LoggingService, map_system_prompt: str = "", map_user_prompt: str = "",
                  map_summary_template: str = "", map_model_name: str = "gemma-3-4b-it-qat",
@@ -32,13 +47,23 @@ class MapReduceAiProcessor(AiProcessor):
                  reduce_model_name: str = "gemma-3-4b-it-qat",
                  reduce_temperature: float = 0.4, reduce_max_tokens: int = 2000, reduce_top_p: float = 0.7,
                  token_per_chunk: int = 4000, api_key: str = "", base_url: str = "", timeout: int = 600,
-                 concurrency_limit: int = 2):
+                 concurrency_limit: int = 2, token_estimator: TokenEstimator = None, overlap_tokens: int = 100,
+                 chunking_policy: ChunkingPolicy = ChunkingPolicy.TOKENS, gap_tolerance: float = 0.25,
+                 min_gap: timedelta = timedelta(minutes=30), per_thread: bool = True,
+                 message_filter: MessageFilter = None, chat_log_format: ChatLogFormat = ChatLogFormat.FULL):
         self.map_system_prompt = map_system_prompt
         self.reduce_system_prompt = reduce_system_prompt
         self.map_user_prompt = map_user_prompt
         self.reduce_user_prompt = reduce_user_prompt
         self.token_per_chunk = token_per_chunk
+        self.overlap_tokens = overlap_tokens
+        self.chunking_policy = chunking_policy
+        self.gap_tolerance = gap_tolerance
+        self.min_gap = min_gap
+        self.per_thread = per_thread
+        self.chat_log_format = chat_log_format
         self.map_summary_template = map_summary_template
+        self.token_estimator = token_estimator
 
         # Initialize OpenAI client with custom configuration
         self.map_client = ChatOpenAI(
@@ -71,7 +96,7 @@ class MapReduceAiProcessor(AiProcessor):
             "summary": ""
         }
 
-        super().__init__(logging_service, concurrency_limit, initial_state)
+        super().__init__(logging_service, concurrency_limit, initial_state, message_filter)
 
     def build_graph(self) -> CompiledStateGraph:
         """Build and compile the LangGraph"""
@@ -84,47 +109,66 @@ class MapReduceAiProcessor(AiProcessor):
         graph_builder.add_node("reduce-agent", self._reduce)
 
         # draw graph
-        graph_builder.add_edge(START, "prepare-messages")
-        graph_builder.add_edge("prepare-messages", "map-agent")
-        graph_builder.add_conditional_edges(
-            "map-agent",
-            self._should_keep_mapping,
-            {
-                True: "map-agent",
-                False: "reduce-agent"
-            })
+        self.add_start(graph_builder, "prepare-messages")
+        # every chunk is mapped by its own map-agent, concurrently
+        graph_builder.add_conditional_edges("prepare-messages", self._fan_out_chunks, ["map-agent", "reduce-agent"])
+        graph_builder.add_edge("map-agent", "reduce-agent")
         graph_builder.add_edge("reduce-agent", END)
 
         # Compile the graph
         return graph_builder.compile()
 
     async def _prepare_messages(self, state: ChatState) -> ChatState:
-        """Node function that processes chat logs and generates summaries"""
-        # get chat log
-        messages = state["messages"]
-        chunks = get_chat_log_chunked(messages, self.token_per_chunk)
+        """Node function that splits the messages into chunks, thread by thread"""
+        return {
+            "chunks": self.get_chunks(state["messages"]),
+        }
+
+    def get_chunks(self, messages: Sequence[Message]) -> list[Chunk]:
+        """
+        Splits the messages into chunks, thread by thread when per_thread is set.
+        :param messages:
+        :return:
+        """
+        threads = group_messages_by_thread(messages) if self.per_thread else {"": messages}
+
+        chunks = []
+        for thread, thread_messages in threads.items():
+            for chunk in get_chat_log_chunked(thread_messages, self.token_per_chunk, self.token_estimator,
+                                              self.overlap_tokens, self.chunking_policy, self.gap_tolerance,
+                                              self.min_gap):
+                chunk["thread"] = thread
+                chunks.append(chunk)
+        self.logger.debug(f'Split {len(messages)} messages of {len(threads)} threads into {len(chunks)} chunks')
+        return chunks
+
+    def _fan_out_chunks(self, state: ChatState) -> list[Send] | str:
+        """Sends every chunk to a map-agent, goes straight to the reduce-agent when there is none"""
+        if len(state["chunks"]) == 0:
+            self.logger.debug("No chunks to map!")
+            return "reduce-agent"
+        return [Send("map-agent", MapState(chunk=chunk)) for chunk in state["chunks"]]
+
+    async def _map(self, state: MapState) -> ChatState:
+        """Node function that processes a chat chunk and generates its mini summary"""
+        chunk: Chunk = state["chunk"]
+        self.logger.info(f'Processing chat chunk of {chunk["messages_count"]} messages {chunk.get("thread", "")}')
+
+        # Get response from LLM
+        response = await self.invoke(self.map_client, self.get_map_prompt(chunk))
+        summary_text = response.content if response.content else ""
 
         return {
-            "chunks": chunks,
+            "mini_summaries": [self.format_mini_summary(summary_text, chunk)],
         }
 
-    def _should_keep_mapping(self, state: ChatState) -> bool:
-        # Continue if there are chunks in the queue
-        if len(state["chunks"]) > 0:
-            return True
-        else:
-            self.logger.debug("Mapping recursion hit the stop condition!")
-            return False
-
-    async def _map(self, state: ChatState) -> ChatState:
-        """Node function that processes chat chunks and generates mini summaries"""
-        # get first chat log chronologically
-        self.logger.info(f'Processing chat chunk, {len(state["chunks"])} left')
-        chunk: Chunk = state["chunks"].pop(0)
-
-        chat_log = chunk["content"]
-        start_time_string = f"{chunk['start_timestamp'].hour:02}:{chunk['start_timestamp'].minute:02}"
-        end_time_string = f"{chunk['end_timestamp'].hour:02}:{chunk['end_timestamp'].minute:02}"
+    def get_map_prompt(self, chunk: Chunk) -> list[BaseMessage]:
+        """
+        Builds the messages sent to the map agent for a chunk.
+        :param chunk:
+        :return:
+        """
+        chat_log = get_chunk_content(chunk, self.chat_log_format)
 
         ai_chat_messages = []
         if self.map_system_prompt:
@@ -133,30 +177,46 @@ class MapReduceAiProcessor(AiProcessor):
         # Format the user prompt with the chat log
         formatted_prompt = self.map_user_prompt.format(messages=chat_log) if self.map_user_prompt else chat_log
         ai_chat_messages.append(HumanMessage(content=formatted_prompt))
+        return ai_chat_messages
+
+    def format_mini_summary(self, summary_text: str, chunk: Chunk) -> str:
+        """
+        Formats the mini summary of a chunk with the mini summary template, if any.
+        :param summary_text: answer of the map agent
+        :param chunk:
+        :return:
+        """
+        if not self.map_summary_template:
+            return summary_text
+        start_time_string = f"{chunk['start_timestamp'].hour:02}:{chunk['start_timestamp'].minute:02}"
+        end_time_string = f"{chunk['end_timestamp'].hour:02}:{chunk['end_timestamp'].minute:02}"
+        return self.map_summary_template.format(
+            content=summary_text,
+            start_date=start_time_string,
+            end_date=end_time_string,
+            thread=chunk.get("thread", "")
+        )
 
-        # Get response from LLM
-        response = await self.map_client.ainvoke(ai_chat_messages)
-        summary_text = response.content if response.content else ""
+    async def _reduce(self, state: ChatState) -> ChatState:
+        """Node function that processes mini summaries and generates a final summary"""
+        # get summaries
+        self.logger.info(f'Processing {len(state["mini_summaries"])} mini summaries')
 
-        # format mini summary
-        if self.map_summary_template:
-            mini_summary = self.map_summary_template.format(
-                content=summary_text,
-                start_date=start_time_string,
-                end_date=end_time_string
-            )
-        else:
-            mini_summary = summary_text
+        # Get response from LLM
+        response = await self.invoke(self.reduce_client, self.get_reduce_prompt(state["mini_summaries"]))
+        summary = response.content if response.content else ""
 
         return {
-            "mini_summaries": [mini_summary],
+            "summary": summary,
         }
 
-    async def _reduce(self, state: ChatState) -> ChatState:
-        """Node function that processes mini summaries and generates a final summary"""
-        # get summaries
-        self.logger.info(f'Processing {len(state["mini_summaries"])} mini summaries')
-        summaries = "\n\n".join(state["mini_summaries"])
+    def get_reduce_prompt(self, mini_summaries: list[str]) -> list[BaseMessage]:
+        """
+        Builds the messages sent to the reduce agent.
+        :param mini_summaries:
+        :return:
+        """
+        summaries = "\n\n".join(mini_summaries)
 
         ai_chat_messages = []
         if self.reduce_system_prompt:
@@ -165,11 +225,28 @@ class MapReduceAiProcessor(AiProcessor):
         # Format the user prompt with the chat log
         formatted_prompt = self.reduce_user_prompt.format(summaries=summaries) if self.reduce_user_prompt else summaries
         ai_chat_messages.append(HumanMessage(content=formatted_prompt))
-
-        # Get response from LLM
-        response = await self.reduce_client.ainvoke(ai_chat_messages)
-        summary = response.content if response.content else ""
-
-        return {
-            "summary": summary,
-        }
+        return ai_chat_messages
+
+    def plan_day(self, day: str, messages: Sequence[Message], token_estimator: TokenEstimator,
+                 output_tokens: int) -> DayPlan:
+        """
+        Plans the calls of a day: a map call per chunk, then a reduce call, the mini summaries being output_tokens long.
+        """
+        filtered, tokens_saved = self.filter_messages(messages)
+        chunks = self.get_chunks(filtered)
+        map_prompt_tokens = sum(count_prompt_tokens(self.get_map_prompt(chunk), token_estimator) for chunk in chunks)
+        reduce_prompt = self.get_reduce_prompt([self.format_mini_summary("", chunk) for chunk in chunks])
+        reduce_prompt_tokens = count_prompt_tokens(reduce_prompt, token_estimator) + len(chunks) * output_tokens
+        return DayPlan(day=day, messages=len(messages), filtered_messages=len(filtered), tokens_saved=tokens_saved,
+                       map_calls=len(chunks), map_prompt_tokens=map_prompt_tokens, reduce_calls=1,
+                       reduce_prompt_tokens=reduce_prompt_tokens, output_tokens=(len(chunks) + 1) * output_tokens)
+
+    def get_sample_call(self, messages: Sequence[Message]) -> tuple[BaseChatModel, list[BaseMessage]]:
+        """
+        Returns the first map call of the messages, the reduce call when they make no chunk.
+        """
+        filtered, _ = self.filter_messages(messages)
+        chunks = self.get_chunks(filtered)
+        if chunks:
+            return self.map_client, self.get_map_prompt(chunks[0])
+        return self.reduce_client, self.get_reduce_prompt([])
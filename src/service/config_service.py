@@ -5,9 +5,13 @@ import textwrap
 from yaml.representer import SafeRepresenter
 from yaml import SafeLoader, SafeDumper, dump, load
 
+from src.dto.enums.chat_log_format import ChatLogFormat
+from src.dto.enums.chunking_policy import ChunkingPolicy
+from src.dto.enums.deduplicator_type import DeduplicatorType
 from src.dto.enums.input_file_type import InputFileType
 from src.dto.enums.log_levels import LogLevel
 from src.dto.enums.summarization_strategy import SummarizationStrategy
+from src.dto.enums.token_estimator_type import TokenEstimatorType
 from src.dto.enums.writer_type import WriterType
 
 config = dict()
@@ -68,6 +72,18 @@ def get_configs(filename: str) -> dict:
                 'input': {
                     'type': InputFileType.INSTAGRAM_EXPORT,
                     'path': './input/',
+                    'streaming': False,
+                    'workers': 1,
+                    'split-file-size-mb': 64,
+                    'stream-days': True,
+                },
+                'cache': {
+                    'enabled': False,
+                    'path': './cache/',
+                },
+                'date-window': {
+                    'start': None,
+                    'end': None,
                 },
                 'output': {
                     'type': WriterType.TXT,
@@ -76,11 +92,24 @@ def get_configs(filename: str) -> dict:
                     'export-intermediate-steps': False,
                 }
             },
+            'plan': {
+                'output-path': './plan.json',
+                'tokens-per-second': 100,
+                'measure-tokens-per-second': False,
+                'output-tokens-per-call': 300,
+            },
             'logs': {
                 'level': LogLevel.INFO,
             },
             'parsing': {
                 'chars-per-token': 4.0,
+                'token-estimator': {
+                    'type': TokenEstimatorType.LENGTH,
+                    'cyrillic-chars-per-token': 2.5,
+                    'cjk-chars-per-token': 1.0,
+                    'vocabulary-path': '',
+                    'cache-size': 65536,
+                },
                 'token-per-chunk': 4000,
                 'chat-sessions': {
                     'enabled': True,
@@ -92,6 +121,12 @@ def get_configs(filename: str) -> dict:
                     'ignore-before': '1990-01-01',
                     'ignore-after': '2150-01-01'
                 },
+                'deduplication': {
+                    'enabled': False,
+                    'type': DeduplicatorType.EXACT,
+                    'expected-messages': 10000000,
+                    'false-positive-rate': 0.000001,
+                },
                 'messages': {
                     'user-interactions': {
                         'message-like': 'Liked a message',
@@ -114,11 +149,25 @@ def get_configs(filename: str) -> dict:
             },
             'summarization': {
                 'strategy': SummarizationStrategy.MAP_REDUCE,
+                'message-filter': {
+                    'enabled': False,
+                    'trivial-messages': ['ok', 'okay', 'okk', 'okok', 'k', 'kk', 'lol', 'lmao', 'rofl', 'yep', 'yup',
+                                         'np'],
+                    'drop-laughter': True,
+                    'drop-emoji-only': True,
+                    'placeholders': {
+                        'posts-and-reels': '[Shared {count} internet videos]',
+                        'video-uploads': '[Sent {count} videos of himself]',
+                        'photo-uploads': '[Sent {count} photos of himself]',
+                        'audio-messages': '[Sent {count} audio messages]'
+                    }
+                },
                 'linear-strategy': {
                     'max-tokens': 2000,
                     'model-name': 'gemma-3-4b-it-qat',
                     'temperature': 0.4,
                     'top-p': 0.7,
+                    'chat-log-format': ChatLogFormat.FULL,
                     'system-prompt': """You are a bot that writes simple diary entries.
                         Below are messages from one day of Instagram DMs.
                         Each message starts with the sender’s name, then a colon, then the text.
@@ -130,6 +179,12 @@ def get_configs(filename: str) -> dict:
                     """,
                 },
                 'map-reduce-strategy': {
+                    'overlap-tokens': 100,
+                    'chunking-policy': ChunkingPolicy.TOKENS,
+                    'gap-tolerance': 0.25,
+                    'min-gap-minutes': 30,
+                    'per-thread': True,
+                    'chat-log-format': ChatLogFormat.FULL,
                     'map-agent': {
                         'max-tokens': 2000,
                         'model-name': 'gemma-3-4b-it-qat',
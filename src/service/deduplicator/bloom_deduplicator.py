@@ -0,0 +1,40 @@
+import math
+
+from src.service.deduplicator.deduplicator import Deduplicator
+
+
+class BloomDeduplicator(Deduplicator):
+    """
+    Bloom filter of the fingerprints, its size is fixed by the expected number of messages and does not grow.
+    A false positive drops a message that is not a duplicate, with false_positive_rate probability as long as no more
+    than expected_messages are added.
+    """
+
+    def __init__(self, expected_messages: int = 10_000_000, false_positive_rate: float = 1e-6):
+        """
+        :param expected_messages: how many messages the filter is sized for
+        :param false_positive_rate: probability of a false positive with expected_messages added
+        """
+        expected_messages = max(expected_messages, 1)
+        self.size = max(math.ceil(-expected_messages * math.log(false_positive_rate) / math.log(2) ** 2), 8)
+        self.hash_count = max(round(self.size / expected_messages * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, message_fingerprint: bytes) -> list[int]:
+        # double hashing, the two halves of the fingerprint give every bit position
+        size = self.size
+        first = int.from_bytes(message_fingerprint[:8]) % size
+        second = int.from_bytes(message_fingerprint[8:]) % size or 1
+        return [position % size for position in range(first, first + self.hash_count * second, second)]
+
+    def __contains__(self, message_fingerprint: bytes) -> bool:
+        bits = self.bits
+        for position in self._positions(message_fingerprint):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, message_fingerprint: bytes) -> None:
+        bits = self.bits
+        for position in self._positions(message_fingerprint):
+            bits[position >> 3] |= 1 << (position & 7)
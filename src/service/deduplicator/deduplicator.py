@@ -0,0 +1,51 @@
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from hashlib import blake2b
+
+from src.service.parser.message_store import to_epoch_us
+
+
+def fingerprint(timestamp: datetime, sender: str, content: str, conversation: str = "") -> bytes:
+    """
+    Returns a 128 bits fingerprint of a message, stable across runs (unlike the builtin hash).
+    :param timestamp:
+    :param sender:
+    :param content:
+    :param conversation: the same messages of different conversations are different messages (see get_conversation)
+    :return:
+    """
+    return blake2b(f"{to_epoch_us(timestamp)}\x00{sender}\x00{content}\x00{conversation}".encode("utf-8"),
+                   digest_size=16).digest()
+
+
+def get_conversation(thread: str) -> str:
+    """
+    Names the conversation of a thread for the fingerprints: the last folder of the thread, so the same conversation
+    found under the folders of different exports (inbox/alice_123 in two monthly exports) is still one conversation.
+    :param thread:
+    :return:
+    """
+    return os.path.basename(thread)
+
+
+class Deduplicator(ABC):
+    """
+    Standardized abstract base class for the deduplicator interface: a set of message fingerprints.
+    """
+
+    @abstractmethod
+    def __contains__(self, message_fingerprint: bytes) -> bool:
+        """
+        Tells whether the fingerprint was added before.
+        :param message_fingerprint:
+        :return:
+        """
+
+    @abstractmethod
+    def add(self, message_fingerprint: bytes) -> None:
+        """
+        Adds a fingerprint to the set.
+        :param message_fingerprint:
+        :return:
+        """
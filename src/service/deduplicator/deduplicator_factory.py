@@ -0,0 +1,26 @@
+from src.dto.enums.deduplicator_type import DeduplicatorType
+from src.service.config_service import get_nested
+from src.service.deduplicator.bloom_deduplicator import BloomDeduplicator
+from src.service.deduplicator.deduplicator import Deduplicator
+from src.service.deduplicator.exact_deduplicator import ExactDeduplicator
+
+
+def deduplicator_factory(config: dict) -> Deduplicator | None:
+    """
+    Instantiates the deduplicator configured in the parsing section and returns it.
+    :param config: Dictionary containing the configuration of the application.
+    :return: the deduplicator, or None when deduplication is disabled
+    """
+    if not get_nested(config, 'parsing.deduplication.enabled', False):
+        return None
+    deduplicator_type = get_nested(config, 'parsing.deduplication.type', DeduplicatorType.EXACT)
+
+    if deduplicator_type == DeduplicatorType.EXACT:
+        return ExactDeduplicator()
+    elif deduplicator_type == DeduplicatorType.BLOOM:
+        expected_messages = get_nested(config, 'parsing.deduplication.expected-messages', 10_000_000)
+        false_positive_rate = get_nested(config, 'parsing.deduplication.false-positive-rate', 1e-6)
+        return BloomDeduplicator(expected_messages, false_positive_rate)
+
+    message = f"Deduplicator not supported, please choose one of the following: {[e for e in DeduplicatorType]}"
+    raise ValueError(message)
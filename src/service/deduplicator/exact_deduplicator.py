@@ -0,0 +1,17 @@
+from src.service.deduplicator.deduplicator import Deduplicator
+
+
+class ExactDeduplicator(Deduplicator):
+    """
+    Keeps the first 64 bits of every fingerprint in a set, about 90 bytes per message.
+    Collisions are negligible below billions of messages.
+    """
+
+    def __init__(self):
+        self.fingerprints: set[int] = set()
+
+    def __contains__(self, message_fingerprint: bytes) -> bool:
+        return int.from_bytes(message_fingerprint[:8]) in self.fingerprints
+
+    def add(self, message_fingerprint: bytes) -> None:
+        self.fingerprints.add(int.from_bytes(message_fingerprint[:8]))
@@ -0,0 +1,113 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from typing import Iterator
+
+from src.dto.enums.input_file_type import InputFileType
+from src.dto.message import Message
+from src.service.reader.input_source import get_size
+from src.service.reader.reader import Reader
+from src.service.reader.reader_factory import reader_factory
+
+# reader instantiated once in every worker process
+_worker_reader: Reader = None
+_worker_streaming: bool = False
+
+
+def get_worker_count(workers: int) -> int:
+    """
+    Resolves the configured worker count, 0 or less means one worker for every available core.
+    :param workers:
+    :return:
+    """
+    if workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def _init_worker(input_file_type: InputFileType, config: dict, streaming: bool) -> None:
+    global _worker_reader
+    global _worker_streaming
+    _worker_reader = reader_factory(input_file_type, config)
+    _worker_streaming = streaming
+
+
+def _read_file(path: str, byte_range: tuple[int, int] | None = None) -> tuple[str, list[Message] | None, str | None]:
+    """
+    Reads and standardizes a single file, or a byte range of it, inside a worker process.
+    Errors are returned instead of raised, so a broken file does not abort the whole pool.
+    :param path:
+    :param byte_range: (start, end) byte offsets of the part of the file to read, None to read the whole file
+    :return: the file path, its standardized messages and the error message, if any
+    """
+    try:
+        if byte_range is not None:
+            return path, list(_worker_reader.stream_range(path, *byte_range)), None
+        if _worker_streaming:
+            return path, list(_worker_reader.stream_messages(path)), None
+        return path, _worker_reader.standardize_messages(_worker_reader.read(path)), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def _merge_ranges(path: str, results: Iterator[tuple[str, list[Message] | None, str | None]]) \
+        -> tuple[str, list[Message] | None, str | None]:
+    """
+    Concatenates the messages of the byte ranges of a file, in file order.
+    :param path:
+    :param results: results of the ranges of the file
+    :return:
+    """
+    messages = []
+    for _, range_messages, error in results:
+        if error is not None:
+            return path, None, error
+        messages.extend(range_messages)
+    return path, messages, None
+
+
+def get_work_units(files: list[str], reader: Reader, split_size: int) -> list[tuple[str, tuple[int, int] | None]]:
+    """
+    Builds the units of work of the worker processes, files larger than split_size are split into byte ranges.
+    :param files:
+    :param reader: reader of the input files, used to find the range boundaries
+    :param split_size: files larger than this many bytes are split, 0 or less disables splitting
+    :return: (path, byte range) tuples, the byte range is None for whole files
+    """
+    units = []
+    for path in files:
+        # only files that will actually be split are scanned for the range boundaries
+        splittable = reader.supports_ranges and 0 < split_size < get_size(path)
+        ranges = reader.split_ranges(path, split_size) if splittable else []
+        if len(ranges) > 1:
+            units.extend((path, byte_range) for byte_range in ranges)
+        else:
+            units.append((path, None))
+    return units
+
+
+def read_files_parallel(files: list[str], input_file_type: InputFileType, config: dict, workers: int,
+                        streaming: bool = False, split_size: int = 0) \
+        -> Iterator[tuple[str, list[Message] | None, str | None]]:
+    """
+    Reads and standardizes the files on a pool of worker processes.
+    Files larger than split_size are split into byte ranges aligned to message boundaries, read by different
+    workers and merged back, so a single huge export still uses every worker.
+    Results are yielded in the same order of the provided files, so merging them is deterministic.
+    :param files:
+    :param input_file_type:
+    :param config: Dictionary containing the configuration of the application.
+    :param workers: number of worker processes
+    :param streaming: whether workers should decode the files incrementally
+    :param split_size: files larger than this many bytes are split, 0 or less disables splitting
+    :return:
+    """
+    units = get_work_units(files, reader_factory(input_file_type, config), split_size)
+    if not units:
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(input_file_type, config, streaming)) as executor:
+        results = executor.map(_read_file, *zip(*units))
+        # the ranges of a file are consecutive units
+        for path, file_results in groupby(results, key=lambda result: result[0]):
+            yield _merge_ranges(path, file_results)
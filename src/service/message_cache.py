@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import sys
+from array import array
+from typing import Iterator
+
+from src.dto.enums.input_file_type import InputFileType
+from src.dto.input_file import InputFile
+from src.dto.message import Message
+from src.service.config_service import get_nested
+from src.service.logging_service import LoggingService
+from src.service.parser.message_store import from_epoch_us, to_epoch_us
+
+# bump when the normalized message format or the cache layout changes, old entries become misses
+CACHE_VERSION = 5
+# fixed size columns of an entry, in file order, each holding one item per message
+_COLUMNS = (("sender_ids", "I"), ("day_ids", "I"), ("thread_ids", "I"), ("token_counts", "q"), ("timestamps", "q"),
+            ("content_ends", "q"))
+
+
+def get_parsing_hash(input_file_type: InputFileType, config: dict) -> str:
+    """
+    Hashes every setting affecting the normalized messages: the input type and the whole parsing section
+    (chars-per-token, token estimator, system messages, ignore-chat, ...).
+    :param input_file_type:
+    :param config: Dictionary containing the configuration of the application.
+    :return:
+    """
+    parsing = get_nested(config, 'parsing', {})
+    settings = [str(input_file_type), parsing]
+    # an exact token count depends on the vocabulary file content too
+    vocabulary_path = get_nested(config, 'parsing.token-estimator.vocabulary-path', "")
+    if vocabulary_path and os.path.isfile(vocabulary_path):
+        stat = os.stat(vocabulary_path)
+        settings.append([stat.st_size, stat.st_mtime_ns])
+    encoded = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _encode(messages: list[Message]) -> dict:
+    """
+    Packs normalized messages column by column, timestamps as int64 epoch microseconds, repeated senders, days and
+    threads are stored once. Contents are concatenated in a single utf-8 blob, content_ends holding where each ends.
+    :param messages:
+    :return:
+    """
+    senders: dict[str, int] = {}
+    days: dict[str, int] = {}
+    threads: dict[str, int] = {}
+    sender_ids = array("I")
+    day_ids = array("I")
+    thread_ids = array("I")
+    token_counts = array("q")
+    timestamps = array("q")
+    content_ends = array("q")
+    contents = bytearray()
+    for message in messages:
+        sender_ids.append(senders.setdefault(message["sender_name"], len(senders)))
+        day_ids.append(days.setdefault(message["day"], len(days)))
+        thread_ids.append(threads.setdefault(message.get("thread", ""), len(threads)))
+        token_count = message.get("token_count")
+        token_counts.append(-1 if token_count is None else token_count)
+        timestamps.append(to_epoch_us(message["timestamp"]))
+        contents += message["content"].encode("utf-8")
+        content_ends.append(len(contents))
+    return {
+        'senders': list(senders),
+        'sender_ids': sender_ids,
+        'days': list(days),
+        'day_ids': day_ids,
+        'threads': list(threads),
+        'thread_ids': thread_ids,
+        'token_counts': token_counts,
+        'timestamps': timestamps,
+        'content_ends': content_ends,
+        'contents': bytes(contents),
+    }
+
+
+def _decode(columns: dict) -> Iterator[Message]:
+    """
+    Lazily unpacks the messages packed by _encode, one message at a time.
+    :param columns:
+    :return:
+    """
+    senders = columns['senders']
+    days = columns['days']
+    threads = columns['threads']
+    contents = columns['contents']
+    content_start = 0
+    for sender_id, day_id, thread_id, token_count, timestamp, content_end in zip(
+            columns['sender_ids'], columns['day_ids'], columns['thread_ids'], columns['token_counts'],
+            columns['timestamps'], columns['content_ends']):
+        content = contents[content_start:content_end].decode("utf-8")
+        content_start = content_end
+        yield {
+            'sender_name': senders[sender_id],
+            'timestamp': from_epoch_us(timestamp),
+            'content': content,
+            'token_count': None if token_count < 0 else token_count,
+            'day': days[day_id],
+            'thread': threads[thread_id],
+        }
+
+
+class MessageCache:
+    """
+    On-disk cache of the normalized messages of every input file.
+    An entry is valid only for the same file path, size and modification time, parsed with the same parsing settings;
+    a changed file or setting is a miss, and the entry is overwritten by the next store.
+    Entries hold plain data, never code: a JSON header line with the key and the metadata, followed by the raw
+    columns (array.tofile) and the contents blob, so a tampered cache directory can not run anything.
+    """
+
+    def __init__(self, directory: str, input_file_type: InputFileType, config: dict,
+                 logging_service: LoggingService):
+        self.directory = directory
+        self.logger = logging_service.get_logger(__name__)
+        self.parsing_hash = get_parsing_hash(input_file_type, config)
+        os.makedirs(directory, exist_ok=True)
+
+    def get_key(self, input_file: InputFile) -> str:
+        """
+        Returns the validity key of the cached entry of an input file.
+        :param input_file:
+        :return:
+        """
+        return (f"{CACHE_VERSION}:{os.path.abspath(input_file['path'])}:{input_file['size']}:"
+                f"{input_file['mtime_ns']}:{self.parsing_hash}")
+
+    def get_entry_path(self, input_file: InputFile) -> str:
+        """
+        Returns the path of the cache entry of an input file, there is a single entry per input file.
+        :param input_file:
+        :return:
+        """
+        name = hashlib.sha256(os.path.abspath(input_file['path']).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.cache")
+
+    def contains(self, input_file: InputFile) -> bool:
+        """
+        Tells whether the entry of an input file is valid, only its key is read.
+        :param input_file:
+        :return:
+        """
+        return self.__read(input_file, with_messages=False) is not None
+
+    def load(self, input_file: InputFile) -> Iterator[Message] | None:
+        """
+        Loads the normalized messages of an input file.
+        :param input_file:
+        :return: the cached messages, decoded lazily, or None when the entry is missing, stale or unreadable
+        """
+        columns = self.__read(input_file, with_messages=True)
+        return None if columns is None else _decode(columns)
+
+    def __read(self, input_file: InputFile, with_messages: bool) -> dict | None:
+        """
+        Reads the entry of an input file: the key of the header is checked first, the columns are only read when asked
+        for.
+        :param input_file:
+        :param with_messages: whether to read the columns too
+        :return: the columns (empty when not asked for), None when the entry is missing, stale or unreadable
+        """
+        entry_path = self.get_entry_path(input_file)
+        try:
+            with open(entry_path, "rb") as f:
+                header = json.loads(f.readline())
+                # columns are written in the native byte order
+                if header['key'] != self.get_key(input_file) or header['byteorder'] != sys.byteorder:
+                    self.logger.debug(f'Stale cache entry for {input_file["path"]}')
+                    return None
+                if not with_messages:
+                    return {}
+                columns = {name: header[name] for name in ('senders', 'days', 'threads')}
+                for name, typecode in _COLUMNS:
+                    columns[name] = array(typecode)
+                    columns[name].fromfile(f, header['count'])
+                columns['contents'] = f.read(header['contents-size'])
+                if len(columns['contents']) != header['contents-size']:
+                    raise EOFError("truncated contents")
+                return columns
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning(f'Ignoring unreadable cache entry {entry_path}: {e}')
+            return None
+
+    def store(self, input_file: InputFile, messages: list[Message]) -> None:
+        """
+        Stores the normalized messages of an input file, replacing its previous entry.
+        :param input_file:
+        :param messages:
+        :return:
+        """
+        entry_path = self.get_entry_path(input_file)
+        # write aside and rename, an interrupted run never leaves a truncated entry behind
+        temporary_path = f"{entry_path}.{os.getpid()}.tmp"
+        columns = _encode(messages)
+        header = {
+            'key': self.get_key(input_file),
+            'byteorder': sys.byteorder,
+            'count': len(messages),
+            'senders': columns['senders'],
+            'days': columns['days'],
+            'threads': columns['threads'],
+            'contents-size': len(columns['contents']),
+        }
+        try:
+            with open(temporary_path, "wb") as f:
+                f.write(json.dumps(header).encode("utf-8") + b"\n")
+                for name, _ in _COLUMNS:
+                    columns[name].tofile(f)
+                f.write(columns['contents'])
+            os.replace(temporary_path, entry_path)
+        except OSError as e:
+            self.logger.warning(f'Unable to write cache entry {entry_path}: {e}')
+
+
+def message_cache_factory(input_file_type: InputFileType, config: dict) -> MessageCache | None:
+    """
+    Instantiates the message cache from the configuration.
+    :param input_file_type:
+    :param config: Dictionary containing the configuration of the application.
+    :return: the message cache, or None when it is disabled
+    """
+    if not get_nested(config, 'batch.cache.enabled', False):
+        return None
+    directory = get_nested(config, 'batch.cache.path', './cache/')
+    return MessageCache(directory, input_file_type, config, LoggingService(config))
@@ -0,0 +1,114 @@
+import re
+from array import array
+from functools import lru_cache
+from typing import Iterable, Sequence
+
+from src.dto.message import Message
+from src.service.parser.message_store import MessageView, get_message_threads, iter_message_fields
+from src.service.token_estimator.length_token_estimator import LengthTokenEstimator
+from src.service.token_estimator.token_estimator import TokenEstimator
+
+# the letters and digits of a message, what is left once emojis, punctuation and spaces are dropped
+_WORD_REGEX = re.compile(r"[^\W_]+")
+# "haha", "ahahah", "hehe", "lolol", "lmao", "xd", "jajaja"... once lower cased and stripped, laughter repeats itself:
+# a single "ha", "ah", "he" or "ja" is a genuine short reply
+_LAUGHTER_REGEX = re.compile(r"(?:a?(?:ha){2,}h?|a?(?:ah){2,}|(?:he){2,}h?|(?:lo){2,}l|l+m+a+o+|x+d+|j?(?:ja){2,}j?)")
+# longer messages always carry something
+_TRIVIAL_MAX_LENGTH = 24
+
+
+class MessageFilter:
+    """
+    Shrinks the messages of a day before they are summarized: trivial messages ("ok", "lol", emojis only) are dropped,
+    and runs of the same media placeholder sent by someone in a row are collapsed into a single message,
+    "[Sent 7 photos of himself]". Each message is looked at once, the verdicts on the short texts that keep coming back
+    being memoized in an LRU cache.
+    """
+
+    def __init__(self, trivial_messages: Iterable[str] = (), drop_laughter: bool = True, drop_emoji_only: bool = True,
+                 placeholders: dict[str, str] = None, token_estimator: TokenEstimator = None, cache_size: int = 65536):
+        """
+        :param trivial_messages: messages to drop, compared lower cased without emojis, punctuation and spaces
+        :param drop_laughter: drop the messages only made of laughter
+        :param drop_emoji_only: drop the messages without letters nor digits (emojis, punctuation, empty)
+        :param placeholders: placeholder content -> plural template, {count} being the length of the run
+        :param token_estimator: counts the tokens of the messages missing a count, and of the collapsed ones
+        :param cache_size: how many verdicts are memoized
+        """
+        self.trivial_messages = {self.__normalize(message) for message in trivial_messages}
+        self.drop_laughter = drop_laughter
+        self.drop_emoji_only = drop_emoji_only
+        self.placeholders = placeholders or {}
+        self.token_estimator = token_estimator or LengthTokenEstimator()
+        self._is_trivial = lru_cache(maxsize=cache_size)(self._judge)
+
+    @staticmethod
+    def __normalize(content: str) -> str:
+        return "".join(_WORD_REGEX.findall(content.lower()))
+
+    def is_trivial(self, content: str) -> bool:
+        """
+        Tells whether a message carries nothing worth summarizing.
+        :param content:
+        :return:
+        """
+        if len(content) > _TRIVIAL_MAX_LENGTH:
+            return False
+        return self._is_trivial(content)
+
+    def _judge(self, content: str) -> bool:
+        normalized = self.__normalize(content)
+        if not normalized:
+            return self.drop_emoji_only
+        return (normalized in self.trivial_messages
+                or self.drop_laughter and _LAUGHTER_REGEX.fullmatch(normalized) is not None)
+
+    def filter(self, messages: Sequence[Message]) -> tuple[Sequence[Message], int]:
+        """
+        Drops the trivial messages and collapses the runs of placeholders, in a single pass.
+        A run is made of the same placeholder sent by the same sender in the same thread, the trivial messages in
+        between don't break it.
+        :param messages: messages of a day, sorted by time
+        :return: the remaining messages, a view of the same store when nothing was collapsed, and the tokens saved
+        """
+        threads = get_message_threads(messages)
+        estimate_message = self.token_estimator.estimate_message
+        # index of every kept message, with the length of its run when it is a placeholder
+        kept: list[int] = []
+        run_lengths: list[int] = []
+        saved = 0
+        # the last kept message, as (sender, thread, content), to extend its run
+        last = None
+        for i, (_, sender, content, tokens) in enumerate(iter_message_fields(messages)):
+            if tokens is None:
+                tokens = estimate_message(sender, content)
+            if content in self.placeholders:
+                if last == (sender, threads[i], content):
+                    run_lengths[-1] += 1
+                    saved += tokens
+                    continue
+            elif self.is_trivial(content):
+                saved += tokens
+                continue
+            kept.append(i)
+            run_lengths.append(1)
+            last = (sender, threads[i], content)
+
+        if all(length == 1 for length in run_lengths):
+            if isinstance(messages, MessageView):
+                return MessageView(messages.store, array("q", (messages.rows[i] for i in kept))), saved
+            return [messages[i] for i in kept], saved
+
+        filtered = []
+        for i, length in zip(kept, run_lengths):
+            message = messages[i]
+            if length > 1:
+                # the collapsed message replaces the first one of its run
+                tokens = message.get("token_count")
+                if tokens is None:
+                    tokens = estimate_message(message["sender_name"], message["content"])
+                message = dict(message, content=self.placeholders[message["content"]].format(count=length))
+                message["token_count"] = estimate_message(message["sender_name"], message["content"])
+                saved += tokens - message["token_count"]
+            filtered.append(message)
+        return filtered, saved
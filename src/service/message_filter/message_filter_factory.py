@@ -0,0 +1,37 @@
+from src.service.config_service import get_nested
+from src.service.message_filter.message_filter import MessageFilter
+from src.service.token_estimator.token_estimator_factory import token_estimator_factory
+
+_DEFAULT_TRIVIAL_MESSAGES = ["ok", "okay", "okk", "okok", "k", "kk", "lol", "lmao", "rofl", "yep", "yup", "np"]
+# media placeholders of the readers, by their parsing.messages.user-content key
+_DEFAULT_PLACEHOLDERS = {
+    'posts-and-reels': '[Shared an internet video]',
+    'video-uploads': '[Sent a video of himself]',
+    'photo-uploads': '[Sent a photo of himself]',
+    'audio-messages': '[Sent an audio message]',
+}
+_DEFAULT_PLURALS = {
+    'posts-and-reels': '[Shared {count} internet videos]',
+    'video-uploads': '[Sent {count} videos of himself]',
+    'photo-uploads': '[Sent {count} photos of himself]',
+    'audio-messages': '[Sent {count} audio messages]',
+}
+
+
+def message_filter_factory(config: dict) -> MessageFilter | None:
+    """
+    Instantiates the message filter configured in the summarization section and returns it.
+    Placeholders are the media placeholders of the parsing section, each collapsed into its configured plural.
+    :param config: Dictionary containing the configuration of the application.
+    :return: the message filter, or None when filtering is disabled
+    """
+    if not get_nested(config, 'summarization.message-filter.enabled', False):
+        return None
+    trivial_messages = get_nested(config, 'summarization.message-filter.trivial-messages', _DEFAULT_TRIVIAL_MESSAGES)
+    drop_laughter = get_nested(config, 'summarization.message-filter.drop-laughter', True)
+    drop_emoji_only = get_nested(config, 'summarization.message-filter.drop-emoji-only', True)
+    plurals = get_nested(config, 'summarization.message-filter.placeholders', _DEFAULT_PLURALS)
+    user_content = get_nested(config, 'parsing.messages.user-content', {})
+    placeholders = {user_content.get(key, _DEFAULT_PLACEHOLDERS.get(key)): plural for key, plural in plurals.items()}
+    placeholders.pop(None, None)
+    return MessageFilter(trivial_messages, drop_laughter, drop_emoji_only, placeholders, token_estimator_factory(config))
@@ -0,0 +1,98 @@
+from array import array
+from typing import Sequence
+
+from src.service.parser.message_store import DAY_US
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, splits fall back to a scan of the first messages of every day
+    np = None
+
+# below this many messages the numpy setup costs more than it saves
+_VECTORIZE_THRESHOLD = 4096
+
+
+def find_session_splits(timestamps: array, timeline: array, day_starts: list[int], window_start: int,
+                        window_end: int, gap_threshold: int) -> list[int]:
+    """
+    Finds where the chat session of the previous night ends in every day of a chronological timeline.
+    A day splits at its first message inside the sleep window coming more than gap_threshold after the previous
+    message of the day; a day with a message after the sleep window end before such a gap does not split.
+    :param timestamps: epoch microseconds of every row (int64 array)
+    :param timeline: row ids of every message sorted by time, grouped by day (int64 array)
+    :param day_starts: position in the timeline of the first message of every day
+    :param window_start: sleep window start, in microseconds since midnight
+    :param window_end: sleep window end, in microseconds since midnight
+    :param gap_threshold: minimum gap between two sessions, in microseconds
+    :return: for every day, how many of its first messages belong to the previous day (0 when it does not split)
+    """
+    if np is not None and len(timeline) >= _VECTORIZE_THRESHOLD:
+        return _find_session_splits_vectorized(timestamps, timeline, day_starts, window_start, window_end,
+                                               gap_threshold)
+
+    splits = []
+    day_ends = day_starts[1:] + [len(timeline)]
+    for start, end in zip(day_starts, day_ends):
+        split = 0
+        prev_timestamp = timestamps[timeline[start]]
+        for i in range(start, end):
+            timestamp = timestamps[timeline[i]]
+            time_of_day = timestamp % DAY_US
+            # a message after the sleep window end (09:00) means there is no carry over
+            if time_of_day > window_end:
+                break
+            # a message in the sleep window (02:00 - 09:00) with a significant gap from the previous one
+            if window_start <= time_of_day and timestamp - prev_timestamp > gap_threshold:
+                split = i - start
+                break
+            prev_timestamp = timestamp
+        splits.append(split)
+    return splits
+
+
+def find_widest_gap(timestamps: Sequence[int], lo: int, hi: int) -> tuple[int, int]:
+    """
+    Finds the widest silence before a message of a chronological range, the latest one when several are as wide.
+    :param timestamps: epoch microseconds of the messages, sorted
+    :param lo: first message of the range, it must have a previous message
+    :param hi: end of the range, excluded
+    :return: the (index, gap) of the message coming after the widest silence, gap in microseconds
+    """
+    index, widest = lo, -1
+    prev_timestamp = timestamps[lo - 1]
+    for i in range(lo, hi):
+        timestamp = timestamps[i]
+        if timestamp - prev_timestamp >= widest:
+            index, widest = i, timestamp - prev_timestamp
+        prev_timestamp = timestamp
+    return index, widest
+
+
+def _find_session_splits_vectorized(timestamps: array, timeline: array, day_starts: Sequence[int], window_start: int,
+                                    window_end: int, gap_threshold: int) -> list[int]:
+    """
+    Same as find_session_splits, the whole timeline is scanned at once with numpy.
+    """
+    times = np.frombuffer(timestamps, dtype=np.int64)[np.frombuffer(timeline, dtype=np.int64)]
+    starts = np.asarray(day_starts, dtype=np.int64)
+    time_of_day = times % DAY_US
+
+    # gaps from the previous message of the same day, the first message of a day has none
+    gaps = np.zeros_like(times)
+    gaps[1:] = times[1:] - times[:-1]
+    gaps[starts] = 0
+
+    after_window = time_of_day > window_end
+    sleep_gap = (time_of_day >= window_start) & ~after_window & (gaps > gap_threshold)
+    # the first of these events in a day decides whether it splits
+    events = np.flatnonzero(after_window | sleep_gap)
+    first_events = np.searchsorted(events, starts)
+    ends = np.append(starts[1:], len(times))
+
+    splits = np.zeros(len(starts), dtype=np.int64)
+    found = first_events < len(events)
+    event_positions = events[first_events[found]]
+    splits_found = np.where((event_positions < ends[found]) & sleep_gap[event_positions],
+                            event_positions - starts[found], 0)
+    splits[found] = splits_found
+    return splits.tolist()
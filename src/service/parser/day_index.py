@@ -0,0 +1,57 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Sequence
+
+
+class DayIndex:
+    """
+    Index of the sorted timeline: the rows of every day laid out oldest first, each day being a (start, end) range of
+    it, and the timestamps of the timeline to bisect. Days and time ranges are found in O(log n), without scanning.
+    """
+
+    def __init__(self, timestamps: array, day_rows: dict[str, Sequence[int]]):
+        """
+        :param timestamps: epoch microseconds of every row of the message store
+        :param day_rows: rows of every day sorted by time, the days being chronological once sorted by name
+        """
+        self.days = sorted(day for day, rows in day_rows.items() if len(rows) > 0)
+        self.rows = array("q")
+        self.starts = array("q")
+        for day in self.days:
+            self.starts.append(len(self.rows))
+            self.rows.extend(day_rows[day])
+        self.ends = self.starts[1:] + array("q", [len(self.rows)])
+        self.timestamps = array("q", map(timestamps.__getitem__, self.rows))
+
+    def get_range(self, day: str) -> tuple[int, int]:
+        """
+        Returns the range of a day in the timeline.
+        :param day:
+        :return: the (start, end) offsets of the day, an empty range when the day has no messages
+        """
+        index = bisect_left(self.days, day)
+        if index == len(self.days) or self.days[index] != day:
+            return 0, 0
+        return self.starts[index], self.ends[index]
+
+    def get_days_between(self, first_day: str = None, last_day: str = None) -> list[str]:
+        """
+        Returns the days with messages in a range of days.
+        :param first_day: first day of the range, included, None to start from the oldest day
+        :param last_day: last day of the range, included, None to end at the newest day
+        :return:
+        """
+        start = bisect_left(self.days, first_day) if first_day else 0
+        end = bisect_right(self.days, last_day) if last_day else len(self.days)
+        return self.days[start:end]
+
+    def get_rows_between(self, start_us: int, end_us: int) -> array:
+        """
+        Returns the rows of the messages sent in a time range.
+        :param start_us: start of the range in epoch microseconds, included
+        :param end_us: end of the range in epoch microseconds, excluded
+        :return: the rows, sorted by time
+        """
+        start = bisect_left(self.timestamps, start_us)
+        end = bisect_left(self.timestamps, end_us, lo=start)
+        return self.rows[start:end]
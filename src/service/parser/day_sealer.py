@@ -0,0 +1,75 @@
+from datetime import date, datetime
+from typing import Callable, Sequence
+
+from src.dto.enums.message_order import MessageOrder
+from src.service.parser.message_store import DAY_US, to_epoch_us
+from src.service.parser.parser import Parser
+
+
+class DaySealer:
+    """
+    Watches the messages of a time ordered stream as they are added to a parser, and seals every day as soon as no
+    later message can change it: an ascending stream seals a day once it moved past the end of the sleep window of
+    the next day (the chat session carried back to the day ends there), a descending stream once it reached an older
+    day. Each sealed day is handed over with its final rows, the ones sort_bucket would give it, so it can be
+    summarized while the rest of the input is still being read.
+    A stream that turns out not to be ordered only seals days too early: callers compare the sealed rows with the
+    rows left by sort_bucket at the end.
+    """
+
+    def __init__(self, parser: Parser, order: MessageOrder, on_sealed: Callable[[str, Sequence[int]], None]):
+        """
+        :param parser: parser the stream is added to, its day_sealer is set to this sealer
+        :param order: order of the stream, ASCENDING or DESCENDING
+        :param on_sealed: called with every sealed day and its rows, days left without messages are not sealed
+        """
+        if order not in (MessageOrder.ASCENDING, MessageOrder.DESCENDING):
+            raise ValueError(f"Only ordered streams can be sealed, not {order}")
+        self.store = parser.message_store
+        self.descending = order == MessageOrder.DESCENDING
+        self.get_final_rows = parser.get_final_rows
+        self.on_sealed = on_sealed
+        # how far into the next day messages can be carried back
+        self.carry_over_us = parser.get_carry_over_us()
+        parser.day_sealer = self
+        # days seen and not sealed yet, in stream order
+        self.pending: list[str] = []
+        self.sealed: set[str] = set()
+        # an ascending stream seals the first pending day past this timestamp
+        self.threshold = None
+        self._last_day_id = None
+
+    def observe(self, row: int) -> None:
+        """
+        Takes note of a message just added to the store, sealing the days it completes.
+        :param row:
+        :return:
+        """
+        day_id = self.store.day_ids[row]
+        if day_id != self._last_day_id:
+            self._last_day_id = day_id
+            day = self.store.day_names[day_id]
+            if day not in self.sealed and day not in self.pending:
+                self.pending.append(day)
+            if self.descending:
+                # every newer day is complete, with the chat session it carries back to the older one
+                while self.pending and self.pending[0] > day:
+                    self.__seal(self.pending.pop(0))
+                return
+        if not self.descending:
+            timestamp = self.store.timestamps[row]
+            while self.pending and timestamp > self.__get_threshold():
+                self.__seal(self.pending.pop(0))
+                self.threshold = None
+
+    def __get_threshold(self) -> int:
+        if self.threshold is None:
+            day_start = to_epoch_us(datetime.combine(date.fromisoformat(self.pending[0]), datetime.min.time()))
+            self.threshold = day_start + DAY_US + self.carry_over_us
+        return self.threshold
+
+    def __seal(self, day: str) -> None:
+        self.sealed.add(day)
+        rows = self.get_final_rows(day)
+        if len(rows) > 0:
+            self.on_sealed(day, rows)
@@ -1,5 +1,7 @@
-import re
+from typing import Iterable, Iterator
+
 from src.dto.message import Message
+from src.service.deduplicator.deduplicator import Deduplicator
 from src.service.parser.parser import Parser
 
 
@@ -7,48 +9,24 @@ class InstagramExport(Parser):
 
     def __init__(self, chat_sessions_enabled: bool = False, sleep_window_start: int = 2, sleep_window_end: int = 9,
                  ignore_chat_enabled: bool = False, ignore_chat_before: str = "2150-01-01",
-                 ignore_chat_after: str = "1990-01-01"):
+                 ignore_chat_after: str = "1990-01-01", deduplicator: Deduplicator = None):
         super().__init__(chat_sessions_enabled, sleep_window_start, sleep_window_end,
-                         ignore_chat_enabled, ignore_chat_before, ignore_chat_after)
+                         ignore_chat_enabled, ignore_chat_before, ignore_chat_after, deduplicator)
 
-    def parse(self, messages: list[Message]) -> None:
+    def normalize(self, messages: Iterable[Message]) -> Iterator[Message]:
         for message in messages:
-            day = message.get("timestamp").date()
-            # ignore message if before or after set date
+            # readers compute the day key once, fall back to the timestamp for messages built elsewhere
+            day_string = message.get("day") or message.get("timestamp").date().isoformat()
+            # ignore message if before or after set date, ISO dates compare correctly as strings
             if self.ignore_chat_enabled:
-                if day < self.ignore_chat_before_date or day > self.ignore_chat_after_date:
+                if day_string < self.ignore_chat_before_day or day_string > self.ignore_chat_after_day:
                     continue
 
-            day_string = day.isoformat()
-
-            # fix semantics
-            content = self.__fix_unicodes(message.get("content", ""))
-            content = self.handle_newlines(content)
+            # double encoded unicodes are already fixed by the reader, for the whole file
+            content = self.handle_newlines(message.get("content", ""))
             if len(content) == 0:
                 continue
-            sender = self.__remove_unicodes(message.get("sender_name", "unknown"))
 
-            # save message into bucket
             message["content"] = content
-            message["sender_name"] = sender
-            self.message_bucket[day_string].append(message)
-
-    def __fix_unicodes(self, text: str) -> str:
-        """
-        Fixes double encoded instagram messages
-        :param text:
-        :return:
-        """
-        try:
-            return text.encode('latin1').decode('utf8')
-        except (UnicodeEncodeError, UnicodeDecodeError):
-            return text
-
-    def __remove_unicodes(self, text: str) -> str:
-        """
-        Removes double encoded unicodes from a text
-        :param text:
-        :return:
-        """
-
-        return re.sub(r'[^\x00-\x7F]+', '', text)
+            message["day"] = day_string
+            yield message
@@ -0,0 +1,397 @@
+import heapq
+from array import array
+from datetime import datetime, timedelta
+from operator import gt, le, lt
+from typing import Iterable, Iterator, Sequence
+
+from src.dto.enums.message_order import MessageOrder
+from src.dto.message import Message
+
+_EPOCH = datetime(1970, 1, 1)
+MINUTE_US = 60_000_000
+DAY_US = 86_400_000_000
+# "[HH:mm] " prefix of the chat log lines, for every minute of the day
+_CLOCK = [f"[{minute // 60:02}:{minute % 60:02}] " for minute in range(1440)]
+
+
+def get_clock(timestamp_us: int) -> str:
+    """
+    Returns the "[HH:mm] " prefix of a chat log line.
+    :param timestamp_us: epoch microseconds
+    :return:
+    """
+    return _CLOCK[timestamp_us // MINUTE_US % 1440]
+
+
+def to_epoch_us(timestamp: datetime) -> int:
+    """
+    Converts a naive datetime into microseconds since the naive epoch, no timezone is involved.
+    :param timestamp:
+    :return:
+    """
+    delta = timestamp - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def from_epoch_us(timestamp_us: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=timestamp_us)
+
+
+def format_line(timestamp_us: int, sender: str, content: str) -> str:
+    """
+    Formats a message as a chat log line: [HH:mm] name: message.
+    :param timestamp_us: epoch microseconds
+    :param sender:
+    :param content:
+    :return:
+    """
+    return f"{_CLOCK[timestamp_us // MINUTE_US % 1440]}{sender}: {content}\n"
+
+
+class MessageStore:
+    """
+    Columnar storage of the parsed messages, replacing one dict per message with a few shared arrays:
+    timestamps as int64 microseconds, dictionary encoded senders, days and threads, contents as utf-8 slices of a
+    single buffer, and token counts. Days are lists of row ids, read through MessageView without building dicts.
+    Messages are added in runs (usually one per file) of a known order, every day remembers where its runs start and
+    whether they kept their order, so they can be merged instead of sorted.
+    """
+
+    def __init__(self):
+        self.timestamps = array("q")
+        self.token_counts = array("q")
+        self.sender_ids = array("I")
+        self.senders: list[str] = []
+        self.day_ids = array("I")
+        self.day_names: list[str] = []
+        # conversation of every row, the empty string when unknown
+        self.thread_ids = array("I")
+        self.thread_names: list[str] = []
+        # content of row i is content[content_offsets[i]:content_offsets[i + 1]]
+        self.content = bytearray()
+        self.content_offsets = array("q", [0])
+        # day -> row ids, in insertion order until sorted
+        self.days: dict[str, array] = {}
+        # day -> [run id, first position in the day rows, order, still in order] of every run of the day
+        self.day_runs: dict[str, list[list]] = {}
+        self.run_id = 0
+        self.run_order = MessageOrder.UNORDERED
+        self.run_thread = ""
+        # tells whether a message keeps the order of the run, given the previous message of the same day
+        self._in_order = le
+        # rows and run of the day of the last appended message, consecutive messages mostly share the day
+        self._last_day = None
+        self._last_rows = None
+        self._last_run = None
+        self._sender_index: dict[str, int] = {}
+        self._day_index: dict[str, int] = {}
+        self._thread_index: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def start_run(self, order: MessageOrder, thread: str = "") -> None:
+        """
+        Starts a new run of messages, the next appended messages are expected in the provided order.
+        :param order:
+        :param thread: conversation of the run messages, when empty the thread of every message is used
+        :return:
+        """
+        self.run_id += 1
+        self.run_order = order
+        self.run_thread = thread
+        # unordered runs are often sorted anyway, checking them costs nothing more
+        self._in_order = gt if order == MessageOrder.DESCENDING else le
+        self._last_day = None
+
+    def append(self, message: Message) -> int:
+        """
+        Stores a message and adds it to its day.
+        :param message: normalized message, the day key is derived from the timestamp when missing
+        :return: the row id of the message
+        """
+        row = len(self.timestamps)
+        timestamp_us = to_epoch_us(message["timestamp"])
+        day = message.get("day") or message["timestamp"].date().isoformat()
+        self.timestamps.append(timestamp_us)
+        token_count = message.get("token_count")
+        self.token_counts.append(-1 if token_count is None else token_count)
+        self.sender_ids.append(self.__intern(message["sender_name"], self.senders, self._sender_index))
+        self.day_ids.append(self.__intern(day, self.day_names, self._day_index))
+        self.thread_ids.append(self.__intern(self.run_thread or message.get("thread", ""), self.thread_names,
+                                             self._thread_index))
+        self.content += message["content"].encode("utf-8")
+        self.content_offsets.append(len(self.content))
+
+        if day == self._last_day:
+            rows = self._last_rows
+            run = self._last_run
+            if run[3] and not self._in_order(self.timestamps[rows[-1]], timestamp_us):
+                run[3] = False
+            rows.append(row)
+            return row
+
+        rows = self.days.get(day)
+        if rows is None:
+            rows = self.days[day] = array("q")
+            self.day_runs[day] = []
+        runs = self.day_runs[day]
+        if runs and runs[-1][0] == self.run_id:
+            run = runs[-1]
+            if run[3] and not self._in_order(self.timestamps[rows[-1]], timestamp_us):
+                run[3] = False
+        else:
+            run = [self.run_id, len(rows), self.run_order, True]
+            runs.append(run)
+        rows.append(row)
+        self._last_day = day
+        self._last_rows = rows
+        self._last_run = run
+        return row
+
+    @staticmethod
+    def __intern(value: str, values: list[str], index: dict[str, int]) -> int:
+        value_id = index.get(value)
+        if value_id is None:
+            value_id = index[value] = len(values)
+            values.append(value)
+        return value_id
+
+    def set_rows(self, day: str, rows: Iterable[int]) -> None:
+        """
+        Replaces the rows of a day with rows sorted by time.
+        :param day:
+        :param rows:
+        :return:
+        """
+        self.days[day] = array("q", rows)
+        self.day_runs[day] = [[-1, 0, MessageOrder.ASCENDING, True]]
+        self._last_day = None
+
+    def get_runs(self, day: str) -> list[tuple[int, int, MessageOrder, bool]]:
+        """
+        Returns the runs of a day.
+        :param day:
+        :return: the (start, end) positions in the day rows, the order and whether the order was kept, of every run
+        """
+        runs = self.day_runs.get(day, [])
+        ends = [run[1] for run in runs[1:]] + [len(self.days[day])] if runs else []
+        return [(start, end, order, in_order) for (_, start, order, in_order), end in zip(runs, ends)]
+
+    def get_sorted_rows(self, day: str) -> Sequence[int]:
+        """
+        Returns the rows of a day sorted by time, messages with the same time keep their insertion order.
+        Runs that kept their order are taken as they are, or reversed when strictly descending, only runs actually out
+        of order are sorted. Runs are then concatenated when they don't overlap in time, or merged otherwise.
+        :param day:
+        :return:
+        """
+        rows = self.days.get(day, array("q"))
+        get_timestamp = self.timestamps.__getitem__
+        sorted_runs = []
+        for start, end, order, in_order in self.get_runs(day):
+            if not in_order:
+                sorted_runs.append(sorted(rows[start:end], key=get_timestamp))
+            elif order == MessageOrder.DESCENDING:
+                sorted_runs.append(rows[end - 1:start - 1 if start else None:-1])
+            else:
+                sorted_runs.append(rows[start:end])
+
+        if len(sorted_runs) <= 1:
+            return sorted_runs[0] if sorted_runs else array("q")
+        # files usually cover consecutive periods: their runs don't overlap and only need to be put in order
+        by_start = sorted(range(len(sorted_runs)), key=lambda index: get_timestamp(sorted_runs[index][0]))
+        if all(map(lt, (get_timestamp(sorted_runs[index][-1]) for index in by_start),
+                   (get_timestamp(sorted_runs[index][0]) for index in by_start[1:]))):
+            concatenated = array("q")
+            for index in by_start:
+                concatenated.extend(sorted_runs[index])
+            return concatenated
+        # heapq.merge puts equal items of earlier runs first, like a stable sort
+        return list(heapq.merge(*sorted_runs, key=get_timestamp))
+
+    def get_view(self, day: str) -> "MessageView":
+        return MessageView(self, self.days.get(day, array("q")))
+
+    def get_content(self, row: int) -> str:
+        return self.content[self.content_offsets[row]:self.content_offsets[row + 1]].decode("utf-8")
+
+    def get_lines(self, rows: Sequence[int]) -> list[str]:
+        """
+        Formats the chat log lines of some rows, nothing is kept by the store (see MessageView.get_lines).
+        :param rows:
+        :return:
+        """
+        timestamps = self.timestamps
+        sender_ids = self.sender_ids
+        senders = self.senders
+        content = self.content
+        offsets = self.content_offsets
+        # same as format_line, inlined
+        return [f"{_CLOCK[timestamps[row] // MINUTE_US % 1440]}{senders[sender_ids[row]]}: "
+                f"{content[offsets[row]:offsets[row + 1]].decode('utf-8')}\n" for row in rows]
+
+    def get_message(self, row: int) -> Message:
+        """
+        Builds the dict of a single message, for the callers needing one.
+        :param row:
+        :return:
+        """
+        token_count = self.token_counts[row]
+        return {
+            'sender_name': self.senders[self.sender_ids[row]],
+            'timestamp': from_epoch_us(self.timestamps[row]),
+            'content': self.get_content(row),
+            'token_count': None if token_count < 0 else token_count,
+            'day': self.day_names[self.day_ids[row]],
+            'thread': self.thread_names[self.thread_ids[row]],
+        }
+
+
+class MessageView(Sequence):
+    """
+    Read-only sequence of some rows of a MessageStore, usually the messages of a day.
+    Indexing builds message dicts on demand, bulk readers use iter_fields to skip them entirely.
+    The chat log lines are formatted once per view and released with it, after the day is summarized.
+    """
+
+    def __init__(self, store: MessageStore, rows: Sequence[int]):
+        self.store = store
+        self.rows = rows
+        # chat log line of every row, formatted the first time they are needed
+        self.lines: list[str] | None = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return MessageView(self.store, self.rows[index])
+        return self.store.get_message(self.rows[index])
+
+    def __iter__(self) -> Iterator[Message]:
+        get_message = self.store.get_message
+        for row in self.rows:
+            yield get_message(row)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, MessageView) or isinstance(other, Sequence) and not isinstance(other, str):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"MessageView({len(self)} messages)"
+
+    def get_lines(self) -> list[str]:
+        if self.lines is None:
+            self.lines = self.store.get_lines(self.rows)
+        return self.lines
+
+    def get_timestamps_us(self) -> list[int]:
+        timestamps = self.store.timestamps
+        return [timestamps[row] for row in self.rows]
+
+    def get_token_counts(self) -> list[int | None]:
+        token_counts = self.store.token_counts
+        return [None if token_counts[row] < 0 else token_counts[row] for row in self.rows]
+
+    def get_threads(self) -> list[str]:
+        thread_ids = self.store.thread_ids
+        thread_names = self.store.thread_names
+        return [thread_names[thread_ids[row]] for row in self.rows]
+
+    def group_by_thread(self) -> dict[str, "MessageView"]:
+        """
+        Splits the messages by thread, threads come in the order of their first message.
+        :return:
+        """
+        thread_ids = self.store.thread_ids
+        thread_rows: dict[int, array] = {}
+        for row in self.rows:
+            rows = thread_rows.get(thread_ids[row])
+            if rows is None:
+                rows = thread_rows[thread_ids[row]] = array("q")
+            rows.append(row)
+        thread_names = self.store.thread_names
+        return {thread_names[thread_id]: MessageView(self.store, rows) for thread_id, rows in thread_rows.items()}
+
+    def iter_fields(self) -> Iterator[tuple[int, str, str, int | None]]:
+        """
+        Yields timestamp (epoch microseconds), sender, content and token count of every message, without dicts.
+        :return:
+        """
+        store = self.store
+        timestamps = store.timestamps
+        token_counts = store.token_counts
+        sender_ids = store.sender_ids
+        senders = store.senders
+        content = store.content
+        offsets = store.content_offsets
+        for row in self.rows:
+            token_count = token_counts[row]
+            yield (timestamps[row], senders[sender_ids[row]], content[offsets[row]:offsets[row + 1]].decode("utf-8"),
+                   None if token_count < 0 else token_count)
+
+
+def iter_message_fields(messages: Iterable[Message]) -> Iterator[tuple[int, str, str, int | None]]:
+    """
+    Yields timestamp (epoch microseconds), sender, content and token count of every message.
+    Message views are read column by column, any other iterable is expected to hold message dicts.
+    :param messages:
+    :return:
+    """
+    if isinstance(messages, MessageView):
+        yield from messages.iter_fields()
+        return
+    for message in messages:
+        yield (to_epoch_us(message.get("timestamp")), message.get("sender_name"), message.get("content"),
+               message.get("token_count"))
+
+
+def group_messages_by_thread(messages: Sequence[Message]) -> dict[str, Sequence[Message]]:
+    """
+    Splits the messages by thread, threads come in the order of their first message.
+    :param messages:
+    :return:
+    """
+    if isinstance(messages, MessageView):
+        return messages.group_by_thread()
+    threads: dict[str, list[Message]] = {}
+    for message in messages:
+        threads.setdefault(message.get("thread", ""), []).append(message)
+    return threads
+
+
+def get_message_lines(messages: Iterable[Message]) -> list[str]:
+    """
+    Returns the chat log line of every message, message views reuse the lines they already formatted.
+    :param messages:
+    :return:
+    """
+    if isinstance(messages, MessageView):
+        return messages.get_lines()
+    return [format_line(timestamp_us, sender, content) for timestamp_us, sender, content, _ in
+            iter_message_fields(messages)]
+
+
+def get_message_columns(messages: Iterable[Message]) -> tuple[list[int], list[int | None]]:
+    """
+    Returns the timestamps (epoch microseconds) and the token counts of the messages.
+    :param messages:
+    :return:
+    """
+    if isinstance(messages, MessageView):
+        return messages.get_timestamps_us(), messages.get_token_counts()
+    return ([to_epoch_us(message.get("timestamp")) for message in messages],
+            [message.get("token_count") for message in messages])
+
+
+def get_message_threads(messages: Iterable[Message]) -> list[str]:
+    """
+    Returns the thread of every message, empty when unknown.
+    :param messages:
+    :return:
+    """
+    if isinstance(messages, MessageView):
+        return messages.get_threads()
+    return [message.get("thread", "") for message in messages]
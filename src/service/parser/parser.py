@@ -1,69 +1,180 @@
+import re
 from abc import ABC, abstractmethod
-from collections import defaultdict
-from datetime import timedelta, time, datetime
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta, time, datetime
+from itertools import accumulate
+from typing import Iterable, Iterator, Sequence
 
 from src.dto.chunk import Chunk
+from src.dto.enums.chat_log_format import ChatLogFormat
+from src.dto.enums.chunking_policy import ChunkingPolicy
+from src.dto.enums.message_order import MessageOrder
 from src.dto.message import Message
+from src.service.deduplicator.deduplicator import Deduplicator, fingerprint, get_conversation
+from src.service.parser.chat_sessions import find_session_splits, find_widest_gap
+from src.service.parser.day_index import DayIndex
+from src.service.parser.message_store import MINUTE_US, MessageStore, MessageView, from_epoch_us, get_clock, \
+    get_message_columns, get_message_lines, iter_message_fields, to_epoch_us
+from src.service.token_estimator.length_token_estimator import LengthTokenEstimator
+from src.service.token_estimator.token_estimator import TokenEstimator
 
+# a newline, with the punctuation mark before it if any
+_NEWLINE_REGEX = re.compile(r'([:;,.])?\n')
+# separates the consecutive messages of a sender in the compact chat log
+_COMPACT_SEPARATOR = " / "
 
-def get_chat_log(messages: list[Message]) -> str:
+
+def _replace_newline(match: re.Match) -> str:
+    punctuation = match.group(1)
+    return f"{punctuation} " if punctuation else ". "
+
+
+def get_chat_log(messages: Iterable[Message], chat_log_format: ChatLogFormat = ChatLogFormat.FULL) -> str:
     """
     Returns a chat log for the provided message list, each message is formatted as follows: [HH:mm] name: message.
+    With the COMPACT format, see get_compact_chat_log.
     :return:
     """
-    diary = ""
-    for message in messages:
-        timestamp = message.get("timestamp")
-        time_string = f"{timestamp.hour:02}:{timestamp.minute:02}"
-        diary = diary + f"[{time_string}] {message.get('sender_name')}: {message.get('content')}\n"
-    return diary
+    if chat_log_format == ChatLogFormat.COMPACT:
+        return get_compact_chat_log(messages)
+    return "".join(get_message_lines(messages))
+
+
+def get_sender_aliases(senders: Iterable[str]) -> dict[str, str]:
+    """
+    Gives every sender a short alias, the initials of its name ("Alice Johnson" is "AJ"), numbered when several
+    senders share them. Names no longer than their alias are kept as they are.
+    :param senders: distinct senders, aliases are numbered in this order
+    :return: sender -> alias
+    """
+    aliases = {}
+    taken = set()
+    for sender in senders:
+        initials = "".join(word[0] for word in re.findall(r"[^\W\d_]+", sender)).upper() or "S"
+        alias = initials
+        number = 1
+        while alias in taken:
+            number += 1
+            alias = f"{initials}{number}"
+        if len(sender) <= len(alias) and sender not in taken:
+            alias = sender
+        taken.add(alias)
+        aliases[sender] = alias
+    return aliases
+
+
+def get_compact_chat_log(messages: Iterable[Message]) -> str:
+    """
+    Returns a chat log taking fewer tokens than get_chat_log: the senders are declared once with a short alias, the
+    time is only written when the minute changes, and the consecutive messages of a sender share a single line.
+        Senders: A = Alice, BS = Bob Smith
+        [10:30] A: Hello! / Are you there?
+        BS: Yes
+        [10:32] A: Great / [10:33] See you later
+    :param messages:
+    :return:
+    """
+    fields = list(iter_message_fields(messages))
+    aliases = get_sender_aliases(dict.fromkeys(sender for _, sender, _, _ in fields))
+    if not aliases:
+        return ""
+
+    parts = ["Senders: ", ", ".join(f"{alias} = {sender}" for sender, alias in aliases.items())]
+    last_sender = None
+    last_clock = None
+    for timestamp_us, sender, content, _ in fields:
+        clock = get_clock(timestamp_us)
+        if sender != last_sender:
+            parts.append("\n")
+            if clock != last_clock:
+                parts.append(clock)
+            parts.append(f"{aliases[sender]}: ")
+        else:
+            parts.append(_COMPACT_SEPARATOR)
+            if clock != last_clock:
+                parts.append(clock)
+        parts.append(content)
+        last_sender = sender
+        last_clock = clock
+    parts.append("\n")
+    return "".join(parts)
 
 
-def get_chat_log_chunked(messages: list[Message], token_per_chunk: int) -> list[Chunk]:
+def get_chat_log_chunked(messages: Sequence[Message], token_per_chunk: int, token_estimator: TokenEstimator = None,
+                         overlap_tokens: int = 100, policy: ChunkingPolicy = ChunkingPolicy.TOKENS,
+                         gap_tolerance: float = 0.25, min_gap: timedelta = timedelta(minutes=30)) -> list[Chunk]:
     """
     Returns a chat log for the provided messages list, divided into slightly overlapping chunks.
     Each message is formatted as follows: [HH:mm] name: message.
-    :return:
+    Token counts come from the readers, the estimator is only used for messages missing one.
+    Chunks hold as many messages as fit in token_per_chunk (a single longer message gets a chunk of its own), the
+    boundaries being found by bisecting the prefix sums of the token counts. Each chunk repeats the last messages of
+    the previous one, up to overlap_tokens, for more context.
+    With the GAPS policy a chunk ends instead at the widest silence among its last gap_tolerance share of tokens, if
+    that silence lasts at least min_gap: the conversation is over, so the next chunk repeats nothing.
+    :param messages:
+    :param token_per_chunk: token budget of a chunk, overlap included
+    :param token_estimator:
+    :param overlap_tokens: token budget of the messages repeated from the previous chunk
+    :param policy: where chunks end
+    :param gap_tolerance: share of token_per_chunk a chunk may give up to end at a silence
+    :param min_gap: shortest silence ending a conversation
+    :return: the chunks, ranges of the lines of the messages (see get_chunk_content)
     """
+    token_estimator = token_estimator or LengthTokenEstimator()
+    lines = get_message_lines(messages)
+    timestamps, token_counts = get_message_columns(messages)
+    if None in token_counts:
+        token_counts = [tokens if tokens is not None else
+                        token_estimator.estimate_message(messages[i].get('sender_name'), messages[i].get('content'))
+                        for i, tokens in enumerate(token_counts)]
+    # prefix[i] is the token count of the first i messages
+    prefix = [0]
+    prefix.extend(accumulate(token_counts))
+    count = len(token_counts)
+    min_gap_us = min_gap // timedelta(microseconds=1)
+    tolerance_tokens = token_per_chunk * gap_tolerance
+
     diary: list[Chunk] = []
-    chunk = Chunk(content="", messages_count=0, start_timestamp=None, end_timestamp=None, token_count=0)
-    content = []
-
-    for message in messages:
-        # prepare message
-        timestamp = message.get("timestamp")
-        time_string = f"{timestamp.hour:02}:{timestamp.minute:02}"
-        formatted_message = f"[{time_string}] {message.get('sender_name')}: {message.get('content')}\n"
-        content.append(formatted_message)
-
-        # counts
-        tokens = message.get("token_count")
-        chunk["token_count"] += tokens
-        chunk["messages_count"] += 1
-
-        # start time for the chunk
-        if chunk["start_timestamp"] is None:
-            chunk["start_timestamp"] = timestamp
-
-        # when reaching the soft token limit (with a min of 3 messages, to allow extra-long ones)
-        if chunk["messages_count"] > 6 and chunk["token_count"] > token_per_chunk:
-            # append the chunk and start a new one
-            chunk["content"] = "".join(content)
-            chunk["end_timestamp"] = timestamp
-            diary.append(chunk)
-
-            chunk = Chunk(content="", messages_count=0, start_timestamp=None, end_timestamp=None, token_count=0)
-            content = content[-3:]  # overlapping chunks content, more context for the AI
-
-    # append the last chunk, if any.
-    if chunk["messages_count"] > 0:
-        chunk["content"] = "".join(content)
-        chunk["end_timestamp"] = messages[-1].get("timestamp")
-        diary.append(chunk)
+    start = 0
+    while start < count:
+        # last message fitting in the budget, at least one message
+        end = max(bisect_right(prefix, prefix[start] + token_per_chunk, lo=start + 1) - 1, start + 1)
+        clean_gap = False
+        if policy == ChunkingPolicy.GAPS and end < count:
+            # first end leaving less than the tolerance unused, the chunk may end at any message from there
+            lowest_end = bisect_left(prefix, prefix[start] + token_per_chunk - tolerance_tokens, lo=start + 1, hi=end)
+            gap_end, gap = find_widest_gap(timestamps, lowest_end, end + 1)
+            if gap >= min_gap_us:
+                end, clean_gap = gap_end, True
+
+        diary.append(Chunk(lines=lines, messages=messages, start_index=start, end_index=end, messages_count=end - start,
+                           start_timestamp=from_epoch_us(timestamps[start]),
+                           end_timestamp=from_epoch_us(timestamps[end - 1]),
+                           token_count=prefix[end] - prefix[start]))
+        if end == count or clean_gap:
+            start = end
+            continue
+        # the next chunk starts with the last messages fitting in the overlap, leaving room for the next message
+        lowest = max(prefix[end] - overlap_tokens, prefix[end + 1] - token_per_chunk)
+        start = bisect_left(prefix, lowest, lo=start + 1, hi=end)
 
     return diary
 
 
+def get_chunk_content(chunk: Chunk, chat_log_format: ChatLogFormat = ChatLogFormat.FULL) -> str:
+    """
+    Returns the chat log of a chunk, a compact chat log declares the aliases of the senders of the chunk.
+    :param chunk:
+    :param chat_log_format:
+    :return:
+    """
+    if chat_log_format == ChatLogFormat.COMPACT:
+        return get_compact_chat_log(chunk["messages"][chunk["start_index"]:chunk["end_index"]])
+    return "".join(chunk["lines"][chunk["start_index"]:chunk["end_index"]])
+
+
 class Parser(ABC):
     """
     Standardized abstract base class for the parser interface.
@@ -72,8 +183,14 @@ class Parser(ABC):
     @abstractmethod
     def __init__(self, chat_sessions_enabled: bool = False, sleep_window_start: int = 2, sleep_window_end: int = 9,
                  ignore_chat_enabled: bool = False, ignore_chat_before: str = "2150-01-01",
-                 ignore_chat_after: str = "1990-01-01") -> None:
-        self.message_bucket = defaultdict(list[Message])
+                 ignore_chat_after: str = "1990-01-01", deduplicator: Deduplicator = None) -> None:
+        self.message_store = MessageStore()
+        # told about every added message when days are emitted while parsing, see DaySealer
+        self.day_sealer = None
+        # fingerprints of the messages of the files already added, None when deduplication is disabled
+        self.deduplicator = deduplicator
+        # index of the timeline as of the last sort_bucket
+        self.day_index = DayIndex(self.message_store.timestamps, {})
         self.gap_threshold = timedelta(hours=3)
 
         self.chat_sessions_enabled = chat_sessions_enabled
@@ -85,28 +202,103 @@ class Parser(ABC):
             # parse dates
             self.ignore_chat_before_date = datetime.strptime(ignore_chat_before, '%Y-%m-%d').date()
             self.ignore_chat_after_date = datetime.strptime(ignore_chat_after, '%Y-%m-%d').date()
+            self.ignore_chat_before_day = self.ignore_chat_before_date.isoformat()
+            self.ignore_chat_after_day = self.ignore_chat_after_date.isoformat()
 
     @abstractmethod
-    def parse(self, messages: list[Message]) -> None:
+    def normalize(self, messages: Iterable[Message]) -> Iterator[Message]:
+        """
+            Lazily fixes the semantics of the messages given, dropping the ignored ones.
+            Every normalized message has its day key set.
+        """
+
+    def parse(self, messages: Iterable[Message], order: MessageOrder = MessageOrder.UNORDERED, thread: str = "") -> int:
         """
             Parse the messages given and add them to the message bucket.
+            Messages are consumed one at a time, so a lazy iterator can be streamed straight from a reader.
+            The order is the one reported by the reader, it lets sort_bucket merge the files instead of sorting them.
+            The thread is the conversation of the file (its folder), when empty the thread of each message is kept.
+            :return: how many messages were dropped as duplicates of an already added file
+        """
+        return self.add_messages(self.normalize(messages), order, thread)
+
+    def add_messages(self, messages: Iterable[Message], order: MessageOrder = MessageOrder.UNORDERED,
+                     thread: str = "") -> int:
         """
+            Adds already normalized messages (e.g. loaded from the message cache) to the message store.
+            Each call adds a file: with a deduplicator, messages already added by a previous call (same timestamp,
+            sender, content and conversation) are dropped, so overlapping exports are only counted once. Identical messages of the
+            same file are all kept, they are distinct messages sent in the same minute.
+            :return: how many messages were dropped as duplicates
+        """
+        self.message_store.start_run(order, thread)
+        append = self.message_store.append
+        deduplicator = self.deduplicator
+        day_sealer = self.day_sealer
+        if deduplicator is None and day_sealer is None:
+            for message in messages:
+                append(message)
+            return 0
+
+        duplicates = 0
+        # fingerprints of this file, only added once the whole file is
+        added = []
+        for message in messages:
+            if deduplicator is not None:
+                message_fingerprint = fingerprint(message.get("timestamp"), message.get("sender_name"),
+                                                  message.get("content"),
+                                                  get_conversation(thread or message.get("thread", "")))
+                if message_fingerprint in deduplicator:
+                    duplicates += 1
+                    continue
+                added.append(message_fingerprint)
+            row = append(message)
+            if day_sealer is not None:
+                day_sealer.observe(row)
+        for message_fingerprint in added:
+            deduplicator.add(message_fingerprint)
+        return duplicates
 
     def sort_bucket(self):
         """
-        Sorts the message bucket.
+        Sorts the messages of every day.
         :return:
         """
-        for day in self.get_available_days():
-            messages = self.message_bucket.get(day)
-            sorted_messages = sorted(messages, key=lambda x: x['timestamp'])
+        store = self.message_store
+        day_rows = {day: store.get_sorted_rows(day) for day in self.get_available_days()}
+
+        # usually conversations don't end precisely at midnight, we need to end the day when there is a "sleep" gap.
+        # we will detect that gap in a plausible sleep window, and carry the messages back to the prev day.
+        if self.chat_sessions_enabled:
+            day_rows = self.extract_chat_sessions(day_rows)
 
-            # usually conversations don't end precisely at midnight, we need to end the day when there is a "sleep" gap.
-            # we will detect that gap in a plausible sleep window, and carry the messages back to the prev day.
-            if self.chat_sessions_enabled:
-                sorted_messages = self.extract_chat_sessions(sorted_messages)
+        for day, rows in day_rows.items():
+            store.set_rows(day, rows)
+        self.day_index = DayIndex(store.timestamps, day_rows)
 
-            self.message_bucket[day] = sorted_messages
+    def get_final_rows(self, day: str) -> Sequence[int]:
+        """
+        Returns the rows of a day as sort_bucket will leave them, without sorting the other days.
+        The day must be complete, and so must be the next one up to its sleep window end when chat sessions are enabled.
+        :param day:
+        :return: the rows of the day sorted by time, with the chat session carried back from the next day
+        """
+        store = self.message_store
+        rows = store.get_sorted_rows(day)
+        if not self.chat_sessions_enabled:
+            return rows
+        next_day = (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+        sessions = self.extract_chat_sessions({day: rows, next_day: store.get_sorted_rows(next_day)})
+        return sessions.get(day, rows[:0])
+
+    def get_carry_over_us(self) -> int:
+        """
+        Returns how far into a day its messages can be carried back to the previous day.
+        :return: microseconds since midnight, 0 when chat sessions are disabled
+        """
+        if not self.chat_sessions_enabled:
+            return 0
+        return (self.sleep_window_end.hour * 60 + self.sleep_window_end.minute) * MINUTE_US
 
     def handle_newlines(self, text: str) -> str:
         """
@@ -114,67 +306,89 @@ class Parser(ABC):
         :param text:
         :return:
         """
-        # replace newlines keeping punctuation semantics
-        for p in [":", ";", ",", "."]:
-            text = text.replace(f"{p}\n", f"{p} ")
-        return text.replace("\n", ". ")
+        # most messages are single line
+        if "\n" not in text:
+            return text
+        # replace newlines keeping punctuation semantics, in a single pass
+        return _NEWLINE_REGEX.sub(_replace_newline, text)
 
-    def extract_chat_sessions(self, sorted_messages) -> list[dict[str, str]]:
+    def extract_chat_sessions(self, day_rows: dict[str, Sequence[int]]) -> dict[str, Sequence[int]]:
         """
         Extracts the chat sessions and puts them in the previous day.
-        :param sorted_messages:
-        :return:
+        Days are walked once as a single chronological timeline, the first messages of a day before its sleep gap are
+        appended to the previous day, which is already complete, so no day needs to be sorted again.
+        :param day_rows: rows of every day sorted by time, with the days sorted too
+        :return: the rows of every day after moving the chat sessions
         """
-        if len(sorted_messages) == 0:
-            return []
-        prev_timestamp = sorted_messages[0]['timestamp']
-        previous_day_carry_over = []
-        for i, msg in enumerate(sorted_messages):
-
-            timestamp_time = msg['timestamp'].time()
-
-            # if message is after sleep window end (09:00), there is no carry over
-            if timestamp_time > self.sleep_window_end:
-                break
-
-            # if the message is between sleep window start (02:00) and end (09:00)
-            if self.sleep_window_start <= msg['timestamp'].time():
-                gap = msg['timestamp'] - prev_timestamp
-                # and has a significant gap from the previous message
-                if gap > self.gap_threshold:
-                    # remove messages from today's list, and add them to yesterday's carryover list
-                    previous_day_carry_over = sorted_messages[:i]
-                    sorted_messages = sorted_messages[i:]
-                    break
-            # update last timestamp
-            prev_timestamp = msg['timestamp']
-
-        # add carryover to the previous day
-        if len(previous_day_carry_over) > 0:
-            prev_day = previous_day_carry_over[0]['timestamp'].date() - timedelta(days=1)
-            prev_day_string = prev_day.isoformat()
-            self.message_bucket[prev_day_string].extend(previous_day_carry_over)
-
-        return sorted_messages
-
-    def get_messages_grouped(self) -> dict[str, list[Message]]:
-        """
-        Returns a dictionary where each key is a date and each value is a list of messages.
+        days = [day for day, rows in day_rows.items() if len(rows) > 0]
+        timeline = array("q")
+        day_starts = []
+        for day in days:
+            day_starts.append(len(timeline))
+            timeline.extend(day_rows[day])
+
+        window_start = (self.sleep_window_start.hour * 60 + self.sleep_window_start.minute) * MINUTE_US
+        window_end = (self.sleep_window_end.hour * 60 + self.sleep_window_end.minute) * MINUTE_US
+        gap_threshold = self.gap_threshold // timedelta(microseconds=1)
+        splits = find_session_splits(self.message_store.timestamps, timeline, day_starts, window_start, window_end,
+                                     gap_threshold)
+
+        sessions: dict[str, Sequence[int]] = {}
+        for day, start, split in zip(days, day_starts, splits):
+            rows = day_rows[day]
+            if split == 0:
+                sessions[day] = rows
+                continue
+            # add carryover to the previous day
+            prev_day_string = (date.fromisoformat(day) - timedelta(days=1)).isoformat()
+            prev_rows = sessions.get(prev_day_string)
+            if prev_rows is None:
+                sessions[prev_day_string] = rows[:split]
+            else:
+                sessions[prev_day_string] = array("q", prev_rows)
+                sessions[prev_day_string].extend(rows[:split])
+            sessions[day] = rows[split:]
+        return sessions
+
+    def get_messages_grouped(self) -> dict[str, MessageView]:
+        """
+        Returns a dictionary where each key is a date and each value is a view of its messages.
         :return:
         """
-        return self.message_bucket
+        return {day: self.message_store.get_view(day) for day in self.get_available_days()}
 
-    def get_messages(self, date: str) -> list[Message]:
+    def get_messages(self, date: str) -> MessageView:
         """
-        Returns list of messages sent on the provided date.
+        Returns a view of the messages sent on the provided date.
         :param date:
         :return:
         """
-        return self.message_bucket.get(date, [])
+        return self.message_store.get_view(date)
+
+    def get_days_between(self, first_day: str = None, last_day: str = None) -> list[str]:
+        """
+        Returns the days with messages available in a range of days, both included, from the oldest one.
+        Days are looked up in the index built by sort_bucket.
+        :param first_day: ISO date, None to start from the oldest day
+        :param last_day: ISO date, None to end at the newest day
+        :return:
+        """
+        return self.day_index.get_days_between(first_day, last_day)
+
+    def get_messages_between(self, start: datetime, end: datetime) -> MessageView:
+        """
+        Returns a view of the messages sent from start (included) to end (excluded), whatever their day.
+        Messages are looked up in the index built by sort_bucket.
+        :param start:
+        :param end:
+        :return:
+        """
+        return MessageView(self.message_store,
+                           self.day_index.get_rows_between(to_epoch_us(start), to_epoch_us(end)))
 
     def get_available_days(self) -> list[str]:
         """
-        Returns a list of days with messages available.
+        Returns a list of days with messages available, from the oldest one.
         :return:
         """
-        return list(self.message_bucket.keys())
+        return sorted(self.message_store.days)
@@ -1,4 +1,7 @@
+from typing import Iterable, Iterator
+
 from src.dto.message import Message
+from src.service.deduplicator.deduplicator import Deduplicator
 from src.service.parser.parser import Parser
 
 
@@ -6,25 +9,24 @@ class WhatsappExport(Parser):
 
     def __init__(self, chat_sessions_enabled: bool = False, sleep_window_start: int = 2, sleep_window_end: int = 9,
                  ignore_chat_enabled: bool = False, ignore_chat_before: str = "2150-01-01",
-                 ignore_chat_after: str = "1990-01-01"):
+                 ignore_chat_after: str = "1990-01-01", deduplicator: Deduplicator = None):
         super().__init__(chat_sessions_enabled, sleep_window_start, sleep_window_end,
-                         ignore_chat_enabled, ignore_chat_before, ignore_chat_after)
+                         ignore_chat_enabled, ignore_chat_before, ignore_chat_after, deduplicator)
 
-    def parse(self, messages: list[Message]) -> None:
+    def normalize(self, messages: Iterable[Message]) -> Iterator[Message]:
         for message in messages:
-            day = message.get("timestamp").date()
-            # ignore message if before or after set date
+            # readers compute the day key once, fall back to the timestamp for messages built elsewhere
+            day_string = message.get("day") or message.get("timestamp").date().isoformat()
+            # ignore message if before or after set date, ISO dates compare correctly as strings
             if self.ignore_chat_enabled:
-                if day < self.ignore_chat_before_date or day > self.ignore_chat_after_date:
+                if day_string < self.ignore_chat_before_day or day_string > self.ignore_chat_after_day:
                     continue
 
-            day_string = day.isoformat()
-
             # fix semantics
             content = self.handle_newlines(message.get("content", ""))
             if len(content) == 0:
                 continue
 
-            # save message into bucket
             message["content"] = content
-            self.message_bucket[day_string].append(message)
+            message["day"] = day_string
+            yield message
@@ -0,0 +1,77 @@
+import io
+import os
+import zipfile
+from contextlib import contextmanager
+from typing import Iterator
+
+ARCHIVE_EXTENSION = ".zip"
+# separator between an archive path and the name of one of its members, zip member names always use "/"
+_MEMBER_SEPARATOR = "/"
+
+
+def is_archive(path: str) -> bool:
+    """
+    Tells whether a path points to a zip archive.
+    :param path:
+    :return:
+    """
+    return path.lower().endswith(ARCHIVE_EXTENSION) and os.path.isfile(path)
+
+
+def member_path(archive_path: str, member: str) -> str:
+    """
+    Builds the virtual path of an archive member, e.g. "input/export.zip/messages/inbox/alice/message_1.json".
+    :param archive_path:
+    :param member: name of the member inside the archive
+    :return:
+    """
+    return archive_path + _MEMBER_SEPARATOR + member
+
+
+def split_member_path(path: str) -> tuple[str, str | None]:
+    """
+    Splits a virtual path into the archive path and the member name.
+    :param path:
+    :return: the archive path and the member name, or the path itself and None for regular files
+    """
+    lowered = path.lower()
+    index = lowered.find(ARCHIVE_EXTENSION + _MEMBER_SEPARATOR)
+    while index >= 0:
+        archive_path = path[:index + len(ARCHIVE_EXTENSION)]
+        if os.path.isfile(archive_path):
+            return archive_path, path[index + len(ARCHIVE_EXTENSION) + len(_MEMBER_SEPARATOR):]
+        index = lowered.find(ARCHIVE_EXTENSION + _MEMBER_SEPARATOR, index + 1)
+    return path, None
+
+
+def is_archive_member(path: str) -> bool:
+    return split_member_path(path)[1] is not None
+
+
+def get_size(path: str) -> int:
+    """
+    Returns the (uncompressed) size of a file or archive member.
+    :param path:
+    :return:
+    """
+    archive_path, member = split_member_path(path)
+    if member is None:
+        return os.path.getsize(path)
+    with zipfile.ZipFile(archive_path) as archive:
+        return archive.getinfo(member).file_size
+
+
+@contextmanager
+def open_input(path: str) -> Iterator[io.TextIOBase]:
+    """
+    Opens a file or an archive member as utf-8 text, archive members are decompressed on the fly.
+    :param path: a regular path, or a virtual archive member path
+    :return:
+    """
+    archive_path, member = split_member_path(path)
+    if member is None:
+        with open(path, encoding="utf-8") as f:
+            yield f
+        return
+    with zipfile.ZipFile(archive_path) as archive, archive.open(member) as raw:
+        yield io.TextIOWrapper(raw, encoding="utf-8")
@@ -1,16 +1,53 @@
-from datetime import datetime
+import re
+from itertools import islice
+from typing import Iterator
 
+from src.dto.enums.message_order import MessageOrder
 from src.dto.instagram_export_message import InstagramExportMessage
 from src.dto.message import Message
 from src.service.logging_service import LoggingService
 from src.service.reader.json_reader import JsonReader
-from langchain_core.messages.utils import count_tokens_approximately
+from src.service.reader.timestamp_converter import TimestampConverter
+from src.service.token_estimator.token_estimator import TokenEstimator
+
+# how many raw messages are standardized together while streaming
+_STREAM_BATCH_SIZE = 1024
+_NON_ASCII_REGEX = re.compile(r'[^\x00-\x7F]+')
+# joins the texts of a batch to repair them at once, never part of a json decoded message
+_BATCH_SEPARATOR = "\x00"
+
+
+def fix_double_encoding(texts: list[str]) -> list[str]:
+    """
+    Fixes double encoded instagram texts: the exports write utf-8 bytes as latin1 characters, uniformly for a file.
+    The whole batch is repaired with a single encode and decode, texts are repaired one by one only when the batch
+    is not uniformly double encoded.
+    :param texts:
+    :return:
+    """
+    try:
+        fixed = _BATCH_SEPARATOR.join(texts).encode('latin1').decode('utf8').split(_BATCH_SEPARATOR)
+        if len(fixed) == len(texts):
+            return fixed
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        pass
+
+    fixed = []
+    for text in texts:
+        try:
+            fixed.append(text.encode('latin1').decode('utf8'))
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            fixed.append(text)
+    return fixed
 
 
 class InstagramExportJsonReader(JsonReader):
 
-    def __init__(self, system_messages: dict, logging_service: LoggingService, chars_per_token: float = 4.0):
-        super().__init__(logging_service, chars_per_token=chars_per_token)
+    def __init__(self, system_messages: dict, logging_service: LoggingService, chars_per_token: float = 4.0,
+                 token_estimator: TokenEstimator = None):
+        super().__init__(logging_service, chars_per_token=chars_per_token, token_estimator=token_estimator)
+        # every message_N.json file is written newest message first
+        self.message_order = MessageOrder.DESCENDING
         # get messages from configs
         self.message_like = system_messages.get("user-interactions", {}).get("message-like", "")
         self.message_reaction = system_messages.get("user-interactions", {}).get("message-reaction", "Added reaction")
@@ -21,26 +58,76 @@ class InstagramExportJsonReader(JsonReader):
         self.message_audio = system_messages.get("user-content", {}).get("audio-messages", "[Sent an audio message]")
         self.call_start = system_messages.get("user-content", {}).get("call-start", "[Call started]")
         self.call_end = system_messages.get("user-content", {}).get("call-end", "[Call ended]")
+        self.timestamp_converter = TimestampConverter()
+        # raw sender name -> sanitized sender name, a thread has a handful of distinct senders
+        self.sender_names: dict[str, str] = {}
+
+    def is_chat_file(self, name: str) -> bool:
+        # the export holds plenty of other json files (account info, followers, ...), only keep the conversations
+        return name.startswith("message_") and name.endswith(self.extension)
 
     def standardize_messages(self, lines: dict) -> list[Message]:
-        messages: list[Message] = []
+        return self.__standardize_batch(lines.get("messages", []), self.__get_thread(lines.get("participants", [])))
+
+    def stream_messages(self, path: str) -> Iterator[Message]:
+        """
+        Yields the standardized messages of an export file one at a time, without loading the whole file.
+        Raw messages are standardized in small batches, to convert their timestamps in bulk.
+        :param path:
+        :return:
+        """
+        # the exports list the participants first, they are decoded in the same pass, before the messages
+        header = {"participants": []}
+        raw_messages = self.iter_array(path, "messages", captured=header)
+        thread = None
+        while batch := list(islice(raw_messages, _STREAM_BATCH_SIZE)):
+            if thread is None:
+                thread = self.__get_thread(header["participants"])
+            yield from self.__standardize_batch(batch, thread)
 
-        for raw_message in lines.get("messages", []):
-            # compute timestamp
-            timestamp = datetime.fromtimestamp(raw_message.get("timestamp_ms", 1000) / 1000.0)
+    def __get_thread(self, participants: list[dict]) -> str:
+        """
+        Names the conversation after its participants, for the files outside of a thread folder.
+        :param participants:
+        :return:
+        """
+        return ", ".join(sorted(self.__get_sender_name(participant.get("name", "unknown"))
+                                for participant in participants))
+
+    def __standardize_batch(self, raw_messages: list[InstagramExportMessage], thread: str) -> list[Message]:
+        # compute timestamps and day keys in bulk
+        timestamps, days = self.timestamp_converter.convert_many(
+            [raw_message.get("timestamp_ms", 1000) for raw_message in raw_messages]
+        )
+
+        contents = fix_double_encoding([self.__get_message_content(raw_message) for raw_message in raw_messages])
 
-            content = self.__get_message_content(raw_message)
-            sender = raw_message.get("sender_name", "unknown")
-            token_count = count_tokens_approximately([sender, content], chars_per_token=self.chars_per_token)
+        messages: list[Message] = []
+        for raw_message, timestamp, day, content in zip(raw_messages, timestamps, days, contents):
+            sender = self.__get_sender_name(raw_message.get("sender_name", "unknown"))
+            token_count = self.token_estimator.estimate_message(sender, content)
             messages.append({
                 'sender_name': sender,
                 'timestamp': timestamp,
                 'content': content,
-                'token_count': token_count
+                'token_count': token_count,
+                'day': day,
+                'thread': thread
             })
 
         return messages
 
+    def __get_sender_name(self, raw_sender: str) -> str:
+        """
+        Removes the double encoded unicodes from a sender name, once per distinct name.
+        :param raw_sender:
+        :return:
+        """
+        sender = self.sender_names.get(raw_sender)
+        if sender is None:
+            sender = self.sender_names[raw_sender] = _NON_ASCII_REGEX.sub('', raw_sender)
+        return sender
+
     def __get_message_content(self, raw_message: InstagramExportMessage) -> str:
         """
         Gets a content for
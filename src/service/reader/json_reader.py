@@ -1,14 +1,124 @@
 import json
+import re
+from json.decoder import WHITESPACE
+from typing import Iterator
 
 from abc import ABC
 from src.service.logging_service import LoggingService
+from src.service.reader.input_source import open_input
 from src.service.reader.reader import Reader
+from src.service.token_estimator.token_estimator import TokenEstimator
+
+# the characters changing the nesting of a value, outside of its strings
+_STRUCTURE_REGEX = re.compile(r'["\[\]{}]')
+# the characters ending a string or escaping the next one, inside of a string
+_STRING_END_REGEX = re.compile(r'["\\]')
+
+
+class _JsonStream:
+    """
+    Minimal pull tokenizer over a text file, decoding one JSON value at a time from a sliding buffer.
+    """
+
+    def __init__(self, file, chunk_size: int):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """
+        Drops the consumed part of the buffer and appends the next chunk of the file.
+        :return: False when the end of the file has been reached
+        """
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """
+        Skips whitespaces and returns the next character, or an empty string at the end of the file.
+        :return:
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buffer, self.pos)
+        self.pos += 1
+
+    def value(self):
+        """
+        Decodes the next JSON value, loading more chunks until the value is complete.
+        :return:
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # a number ending exactly at the buffer end may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def skip(self) -> None:
+        """
+        Skips the next JSON value without decoding it: brackets are counted outside of the strings, and the consumed
+        text is dropped at every refill, so skipping a huge value takes linear time and a chunk of memory.
+        :return:
+        """
+        if self.peek() not in '[{"':
+            # numbers, booleans and null are short
+            self.value()
+            return
+        depth = 0
+        in_string = False
+        while True:
+            match = (_STRING_END_REGEX if in_string else _STRUCTURE_REGEX).search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+            elif match.group() == "\\" and match.end() == len(self.buffer):
+                # the escaped character is in the next chunk
+                self.pos = match.start()
+            else:
+                char = match.group()
+                self.pos = match.end()
+                if char == "\\":
+                    self.pos += 1
+                elif char == '"':
+                    in_string = not in_string
+                elif char in "[{":
+                    depth += 1
+                else:
+                    depth -= 1
+                if depth == 0 and not in_string:
+                    return
+                continue
+            if not self._fill():
+                raise json.JSONDecodeError("Unterminated value", self.buffer, self.pos)
 
 
 class JsonReader(Reader, ABC):
 
-    def __init__(self, logging_service: LoggingService, chars_per_token: float = 4.0):
-        super().__init__(logging_service, ".json", chars_per_token=chars_per_token)
+    def __init__(self, logging_service: LoggingService, chars_per_token: float = 4.0,
+                 token_estimator: TokenEstimator = None):
+        super().__init__(logging_service, ".json", chars_per_token=chars_per_token, token_estimator=token_estimator)
 
     def read(self, path: str) -> dict:
         """
@@ -16,5 +126,47 @@ class JsonReader(Reader, ABC):
         :param path:
         :return:
         """
-        with open(path) as f:
+        with open_input(path) as f:
             return json.load(f)
+
+    def iter_array(self, path: str, key: str, chunk_size: int = 65536, captured: dict = None) -> Iterator:
+        """
+        Lazily yields the items of the array stored under a top-level key of a json object file.
+        Only one item (plus a chunk of raw text) is held in memory at a time, the other values are skipped undecoded.
+        :param path:
+        :param key: top-level key of the array to stream
+        :param chunk_size: how many characters to read from the file at a time
+        :param captured: top-level key -> default value, the values of these keys found before the array are decoded
+        into it, so they are read in the same pass
+        :return:
+        """
+        captured = {} if captured is None else captured
+        with open_input(path) as f:
+            stream = _JsonStream(f, chunk_size)
+            stream.expect("{")
+            if stream.peek() == "}":
+                return
+            while True:
+                name = stream.value()
+                stream.expect(":")
+                if name in captured:
+                    captured[name] = stream.value()
+                elif name != key:
+                    stream.skip()
+                else:
+                    stream.expect("[")
+                    if stream.peek() == "]":
+                        return
+                    while True:
+                        yield stream.value()
+                        separator = stream.peek()
+                        stream.pos += 1
+                        if separator == "]":
+                            return
+                        if separator != ",":
+                            raise json.JSONDecodeError("Expecting ',' delimiter", stream.buffer, stream.pos - 1)
+
+                separator = stream.peek()
+                if separator == "}":
+                    return
+                stream.expect(",")
@@ -1,41 +1,152 @@
 import os
+import posixpath
+import re
+import zipfile
 from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Iterator
 
+from src.dto.enums.message_order import MessageOrder
+from src.dto.input_file import InputFile
 from src.dto.message import Message
 from src.service.logging_service import LoggingService
+from src.service.reader.input_source import ARCHIVE_EXTENSION, is_archive, member_path
+from src.service.token_estimator.length_token_estimator import LengthTokenEstimator
+from src.service.token_estimator.token_estimator import TokenEstimator
+
+_DIGITS_REGEX = re.compile(r'(\d+)')
+
+
+def _natural_key(path: str) -> list:
+    """
+    Sorting key that compares the numbers in a file name by value.
+    :param path:
+    :return:
+    """
+    return [int(part) if part.isdigit() else part.lower() for part in _DIGITS_REGEX.split(os.path.basename(path))]
 
 
 class Reader(ABC):
 
-    def __init__(self, logging_service: LoggingService, extension: str, chars_per_token: float = 4.0):
+    def __init__(self, logging_service: LoggingService, extension: str, chars_per_token: float = 4.0,
+                 token_estimator: TokenEstimator = None):
         self.extension = extension
         self.logger = logging_service.get_logger(__name__)
         self.chars_per_token = chars_per_token
+        self.token_estimator = token_estimator or LengthTokenEstimator(chars_per_token)
+        # order of the messages inside a file, lets the parser merge files instead of sorting them
+        self.message_order = MessageOrder.UNORDERED
+        # readers able to split a file into byte ranges provide split_ranges and stream_range, see ingestion_service
+        self.supports_ranges = False
+        # whether every file is a conversation of its own (WhatsApp), rather than a part of its folder conversation
+        self.file_per_conversation = False
 
     def get_extension(self):
         return self.extension
 
-    def get_file_list(self, input_directory: bytes):
+    def get_file_list(self, input_directory: bytes) -> list[str]:
         """
         Get a list of all useful files in the input directory.
         :param input_directory:
         :return:
         """
-        files = []
-        for file in os.listdir(input_directory):
-            filename = os.fsdecode(file)
-            self.logger.debug(f'File or folder found: {filename}')
-            if filename.lower().endswith(self.extension):
-                self.logger.debug(f'Saving it as: {os.path.join(input_directory.decode(), filename)}')
-                files.append(os.path.join(input_directory.decode(), filename))
-
-        if len(files) == 0:
-            raise FileNotFoundError(f"No {self.extension} files found on {input_directory}")
+        return [input_file["path"] for input_file in self.scan_input(input_directory)]
+
+    def scan_input(self, input_directory: bytes) -> list[InputFile]:
+        """
+        Recursively walks the input directory in a single pass, collecting the chat files (see is_chat_file) with their
+        stat results.
+        Zip archives, found in the directory or provided as input path, are listed without extracting them, their
+        members get a virtual path (see input_source) that every reader can open.
+        Files are grouped by conversation thread (their folder, relative to the input directory), and sorted in
+        natural order inside each thread (message_2 before message_10), so each thread can be streamed in sequence.
+        When every file is a conversation of its own, the files at the input root are threads named after the file,
+        and the members at the root of an archive after the archive, so side by side exports are never merged.
+        :param input_directory:
+        :return:
+        """
+        threads: dict[str, list[InputFile]] = defaultdict(list)
+        # directories still to visit, with their thread name
+        pending = []
+        input_path = os.fsdecode(input_directory)
+        if is_archive(input_path):
+            self.__scan_archive(input_path, "", threads)
         else:
-            self.logger.info(f'Found {len(files)} files to process...')
+            pending.append((input_path, ""))
+        while pending:
+            directory, thread = pending.pop()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    self.logger.debug(f'File or folder found: {entry.path}')
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append((entry.path, os.path.join(thread, entry.name)))
+                    elif entry.name.lower().endswith(ARCHIVE_EXTENSION) and entry.is_file():
+                        self.__scan_archive(entry.path, thread, threads)
+                    elif self.is_chat_file(entry.name) and entry.is_file():
+                        self.logger.debug(f'Saving it as: {entry.path}')
+                        stat = entry.stat()
+                        file_thread = thread
+                        if not thread and self.file_per_conversation:
+                            file_thread = os.path.splitext(entry.name)[0]
+                        threads[file_thread].append({
+                            'path': entry.path,
+                            'thread': file_thread,
+                            'size': stat.st_size,
+                            'mtime_ns': stat.st_mtime_ns,
+                        })
+
+        if len(threads) == 0:
+            raise FileNotFoundError(f"No {self.extension} files found on {input_directory}")
+
+        files = []
+        for thread in sorted(threads):
+            files.extend(sorted(threads[thread], key=lambda input_file: _natural_key(input_file["path"])))
+        self.logger.info(f'Found {len(files)} files in {len(threads)} threads to process...')
 
         return files
 
+    def is_chat_file(self, name: str) -> bool:
+        """
+        Tells whether a file, in a folder or in an archive, contains chat messages: exports hold other files too.
+        :param name: file name, without its folder
+        :return:
+        """
+        return name.lower().endswith(self.extension)
+
+    def __scan_archive(self, archive_path: str, thread: str, threads: dict[str, list[InputFile]]) -> None:
+        """
+        Collects the useful members of a zip archive, their folder inside the archive is part of their thread.
+        :param archive_path:
+        :param thread: thread of the folder containing the archive
+        :param threads: thread -> files, updated in place
+        :return:
+        """
+        self.logger.debug(f'Scanning archive: {archive_path}')
+        mtime_ns = os.stat(archive_path).st_mtime_ns
+        try:
+            with zipfile.ZipFile(archive_path) as archive:
+                members = archive.infolist()
+        except zipfile.BadZipFile as e:
+            self.logger.warning(f'Skipping unreadable archive {archive_path}: {e}')
+            return
+
+        for member in members:
+            if member.is_dir() or not self.is_chat_file(posixpath.basename(member.filename)):
+                continue
+            folder = posixpath.dirname(member.filename)
+            if folder:
+                member_thread = os.path.join(thread, *folder.split("/"))
+            elif self.file_per_conversation:
+                member_thread = os.path.join(thread, os.path.splitext(os.path.basename(archive_path))[0])
+            else:
+                member_thread = thread
+            threads[member_thread].append({
+                'path': member_path(archive_path, member.filename),
+                'thread': member_thread,
+                'size': member.file_size,
+                'mtime_ns': mtime_ns,
+            })
+
     @abstractmethod
     def read(self, path: str):
         """
@@ -49,3 +160,12 @@ class Reader(ABC):
         Standardize the messages format.
         :return:
         """
+
+    def stream_messages(self, path: str) -> Iterator[Message]:
+        """
+        Lazily yields the standardized messages of the provided file.
+        Readers able to decode their format incrementally override this to avoid loading the whole file.
+        :param path:
+        :return:
+        """
+        yield from self.standardize_messages(self.read(path))
@@ -4,6 +4,7 @@ from src.service.logging_service import LoggingService
 from src.service.reader.instagram_export_json_reader import InstagramExportJsonReader
 from src.service.reader.reader import Reader
 from src.service.reader.whatsapp_txt_reader import WhatsappTxtReader
+from src.service.token_estimator.token_estimator_factory import token_estimator_factory
 
 
 def reader_factory(fileType: InputFileType, config: dict) -> Reader:
@@ -17,11 +18,13 @@ def reader_factory(fileType: InputFileType, config: dict) -> Reader:
     system_messages = get_nested(config, 'parsing.messages', {})
     chars_per_token = get_nested(config, 'parsing.chars-per-token', 4.0)
     logging_service = LoggingService(config)
+    token_estimator = token_estimator_factory(config)
 
     if fileType == InputFileType.INSTAGRAM_EXPORT:
-        return InstagramExportJsonReader(system_messages, logging_service, chars_per_token=chars_per_token)
+        return InstagramExportJsonReader(system_messages, logging_service, chars_per_token=chars_per_token,
+                                         token_estimator=token_estimator)
     elif fileType == InputFileType.WHATSAPP_EXPORT:
-        return WhatsappTxtReader(logging_service, chars_per_token=chars_per_token)
+        return WhatsappTxtReader(logging_service, chars_per_token=chars_per_token, token_estimator=token_estimator)
 
     message = f"Input file type not supported, please choose one of the following: {[e for e in InputFileType]}"
     raise ValueError(message)
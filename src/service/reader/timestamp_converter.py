@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, conversions fall back to one fromtimestamp call per message
+    np = None
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+_HOUR_MS = 3_600_000
+_DAY_MS = 86_400_000
+# below this size the numpy setup costs more than it saves
+_VECTORIZE_THRESHOLD = 256
+
+
+class TimestampConverter:
+    """
+    Converts epoch milliseconds into naive local datetimes and ISO day keys.
+    Day keys are cached per day ordinal. Batches are vectorized with numpy, where the local UTC offset is computed
+    once per hour of the timeline and cached, turning the per-message localtime() call into an integer addition.
+    """
+
+    def __init__(self):
+        # hour since epoch -> local UTC offset in milliseconds, None when the offset changes within the hour
+        self._offsets: dict[int, int | None] = {}
+        # day ordinal -> ISO date
+        self._day_keys: dict[int, str] = {}
+
+    def _hour_offset(self, hour: int) -> int | None:
+        """
+        Returns the UTC offset of the given hour, or None if a transition happens inside it.
+        :param hour: hours since epoch
+        :return:
+        """
+        if hour in self._offsets:
+            return self._offsets[hour]
+        start = hour * 3600
+        start_offset = self._offset_at(start)
+        offset = start_offset if start_offset == self._offset_at(start + 3599) else None
+        self._offsets[hour] = offset
+        return offset
+
+    @staticmethod
+    def _offset_at(seconds: int) -> int:
+        return (datetime.fromtimestamp(seconds) - _EPOCH) // timedelta(milliseconds=1) - seconds * 1000
+
+    def _day_key(self, ordinal: int) -> str:
+        day_key = self._day_keys.get(ordinal)
+        if day_key is None:
+            day_key = datetime.fromordinal(ordinal).date().isoformat()
+            self._day_keys[ordinal] = day_key
+        return day_key
+
+    def convert(self, timestamp_ms: int) -> tuple[datetime, str]:
+        """
+        Converts a single epoch milliseconds timestamp.
+        :param timestamp_ms:
+        :return: the naive local datetime and its ISO day key
+        """
+        timestamp = datetime.fromtimestamp(timestamp_ms / 1000.0)
+        return timestamp, self._day_key(timestamp.toordinal())
+
+    def convert_many(self, timestamps_ms: list[int]) -> tuple[list[datetime], list[str]]:
+        """
+        Converts a batch of epoch milliseconds timestamps, vectorized with numpy when available.
+        :param timestamps_ms:
+        :return: the naive local datetimes and their ISO day keys, in the same order
+        """
+        if np is None or len(timestamps_ms) < _VECTORIZE_THRESHOLD:
+            converted = [self.convert(timestamp_ms) for timestamp_ms in timestamps_ms]
+            return [timestamp for timestamp, _ in converted], [day for _, day in converted]
+
+        timestamps = np.asarray(timestamps_ms, dtype=np.int64)
+        hours, hour_index = np.unique(timestamps // _HOUR_MS, return_inverse=True)
+        hour_offsets = [self._hour_offset(int(hour)) for hour in hours]
+        offsets = np.array([0 if offset is None else offset for offset in hour_offsets], dtype=np.int64)
+        local = timestamps + offsets[hour_index]
+
+        # hours containing an offset transition are resolved one by one
+        if None in hour_offsets:
+            mixed = np.flatnonzero(np.isin(hour_index, [i for i, offset in enumerate(hour_offsets) if offset is None]))
+            for i in mixed:
+                local[i] += self._offset_at(int(timestamps[i]) // 1000)
+
+        days, day_index = np.unique(local // _DAY_MS + _EPOCH_ORDINAL, return_inverse=True)
+        day_keys = [self._day_key(int(day)) for day in days]
+        return local.astype("datetime64[ms]").tolist(), [day_keys[i] for i in day_index.tolist()]
@@ -1,12 +1,22 @@
+import io
+import mmap
+from typing import Callable, Iterator
+
 from src.service.logging_service import LoggingService
+from src.service.reader.input_source import get_size, is_archive_member, open_input
 from src.service.reader.reader import Reader
+from src.service.token_estimator.token_estimator import TokenEstimator
 from abc import ABC
 
+# how many bytes of a line are decoded to tell whether it starts a record
+_RECORD_PREFIX_BYTES = 256
+
 
 class TxtReader(Reader, ABC):
 
-    def __init__(self, logging_service: LoggingService, chars_per_token: float = 4.0):
-        super().__init__(logging_service, ".txt", chars_per_token=chars_per_token)
+    def __init__(self, logging_service: LoggingService, chars_per_token: float = 4.0,
+                 token_estimator: TokenEstimator = None):
+        super().__init__(logging_service, ".txt", chars_per_token=chars_per_token, token_estimator=token_estimator)
 
     def read(self, path: str) -> list[str]:
         """
@@ -14,5 +24,62 @@ class TxtReader(Reader, ABC):
         :param path:
         :return:
         """
-        with open(path, encoding="utf-8") as f:
+        with open_input(path) as f:
             return f.readlines()
+
+    def iter_lines(self, path: str) -> Iterator[str]:
+        """
+        Lazily yields the lines of a txt file, only one buffered chunk of the file is held in memory.
+        :param path:
+        :return:
+        """
+        with open_input(path) as f:
+            yield from f
+
+    def iter_range_lines(self, path: str, start: int, end: int) -> Iterator[str]:
+        """
+        Yields the lines of a byte range of a txt file, decoded exactly like iter_lines does.
+        :param path:
+        :param start: first byte of the range, must be at the start of a line
+        :param end: byte after the last one of the range
+        :return:
+        """
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            data = mapped[start:end]
+        yield from io.StringIO(data.decode("utf-8"), newline=None)
+
+    def split_lines(self, path: str, range_size: int, is_record_start: Callable[[str], bool]) -> list[tuple[int, int]]:
+        """
+        Splits a memory-mapped txt file into byte ranges of about range_size bytes.
+        Every range but the first starts at a line accepted by is_record_start, so records never span two ranges.
+        :param path:
+        :param range_size: target size of each range, in bytes
+        :param is_record_start: tells whether a line (only its first bytes are decoded) starts a record
+        :return: the (start, end) byte offsets of every range, in file order
+        """
+        size = get_size(path)
+        # compressed archive members can not be memory-mapped
+        if range_size <= 0 or size <= range_size or is_archive_member(path):
+            return [(0, size)]
+
+        boundaries = [0]
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            target = range_size
+            while target < size:
+                # first line starting at or after the target offset
+                line_start = mapped.find(b"\n", target - 1) + 1
+                boundary = None
+                while 0 < line_start < size:
+                    line_end = mapped.find(b"\n", line_start, line_start + _RECORD_PREFIX_BYTES)
+                    prefix_end = line_end + 1 if line_end >= 0 else line_start + _RECORD_PREFIX_BYTES
+                    prefix = mapped[line_start:prefix_end].decode("utf-8", errors="ignore")
+                    if is_record_start(prefix):
+                        boundary = line_start
+                        break
+                    line_start = mapped.find(b"\n", line_start) + 1
+                if boundary is None:
+                    break
+                boundaries.append(boundary)
+                target = boundary + range_size
+
+        return list(zip(boundaries, boundaries[1:] + [size]))
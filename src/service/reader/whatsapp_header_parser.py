@@ -0,0 +1,214 @@
+from datetime import datetime
+from typing import Iterable
+
+# how many lines are inspected to detect the export format
+SNIFF_LINES = 50
+# while no date proves whether the day or the month comes first, sniffing goes on up to this many lines
+MAX_SNIFF_LINES = 10000
+# a message header is never longer than this, it bounds the separator searches
+_MAX_HEADER_LENGTH = 32
+_DATE_SEPARATORS = "/.-"
+# iOS prefixes attachment lines with a left-to-right mark
+_LEFT_TO_RIGHT_MARK = "‎"
+# 12h clocks separate the meridiem with a space, a no-break space or a narrow no-break space
+_MERIDIEM_CHARACTERS = "aApPmM.   "
+
+
+class WhatsappHeaderParser:
+    """
+    Parses the header of WhatsApp export lines without regular expressions or strptime.
+    Supported layouts, with either day/month or month/day dates, 2 or 4 digits years and 12h or 24h clocks:
+        Android: "15/01/2024, 10:30 - Alice: Hello!"
+        iOS:     "[15/01/24, 10:30:15] Alice: Hello!"
+    The layout is sniffed once from the first lines of a file. When every sampled header has the same shape,
+    headers are sliced at fixed positions, falling back to a separator search for the lines that do not fit.
+    A date that is only valid with the other day/month order is read that way, so a header is never taken for
+    the continuation of the previous message.
+    """
+
+    def __init__(self, bracketed: bool = False, day_first: bool = True, fixed_width: tuple[int, int] | None = None):
+        """
+        :param bracketed: whether headers are enclosed in square brackets (iOS)
+        :param day_first: whether dates are day/month/year, month/day/year otherwise
+        :param fixed_width: (header length, date length) when all the headers have the same shape
+        """
+        self.bracketed = bracketed
+        self.day_first = day_first
+        self.fixed_width = fixed_width
+        self.separator = "] " if bracketed else " - "
+        self._offset = 1 if bracketed else 0
+        # messages of the same day (or minute) share their date (or time) string, both are decoded once
+        self._dates: dict[str, tuple[int, int, int, str] | None] = {}
+        self._times: dict[str, tuple[int, int, int] | None] = {}
+
+    @classmethod
+    def sniff(cls, lines: Iterable[str]) -> "WhatsappHeaderParser":
+        """
+        Detects the export layout from a sample of lines.
+        :param lines: the first lines of the export, the first SNIFF_LINES are inspected, more of them (up to
+        MAX_SNIFF_LINES) when none of their dates has a field above 12 telling the day from the month
+        :return:
+        """
+        candidates = []
+        settled = False
+        for i, line in enumerate(lines):
+            if i >= MAX_SNIFF_LINES or i >= SNIFF_LINES and settled:
+                break
+            line = line.lstrip(_LEFT_TO_RIGHT_MARK)
+            bracketed = line.startswith("[")
+            header = _split_header(line, bracketed)
+            if header is not None:
+                candidates.append((bracketed, header))
+                date = header[1]
+                settled = settled or int(date[0]) > 12 or int(date[1]) > 12
+
+        if not candidates:
+            return cls()
+
+        bracketed = sum(1 for candidate in candidates if candidate[0]) * 2 > len(candidates)
+        headers = [header for candidate_bracketed, header in candidates if candidate_bracketed == bracketed]
+
+        # a field above 12 can only be a day, dates are day first unless only the second field proves otherwise
+        day_first = True
+        if not any(int(date[0]) > 12 for _, date, _ in headers) and any(int(date[1]) > 12 for _, date, _ in headers):
+            day_first = False
+
+        fixed_width = None
+        shapes = {(header_length, sum(len(part) for part in date) + 2, len(time))
+                  for header_length, date, time in headers}
+        if len(shapes) == 1:
+            header_length, date_length, _ = shapes.pop()
+            fixed_width = (header_length, date_length)
+
+        return cls(bracketed, day_first, fixed_width)
+
+    def parse(self, line: str) -> tuple[datetime, str, str, str] | None:
+        """
+        Parses a message header line.
+        :param line:
+        :return: the timestamp, its ISO day key, the sender and the content, or None if the line is not a message
+        """
+        if self.bracketed and line.startswith(_LEFT_TO_RIGHT_MARK):
+            line = line.lstrip(_LEFT_TO_RIGHT_MARK)
+        offset = self._offset
+
+        fixed_width = self.fixed_width
+        if fixed_width is not None and line.startswith(self.separator, fixed_width[0]) \
+                and line.startswith(", ", offset + fixed_width[1]):
+            header_length = fixed_width[0]
+            date_end = offset + fixed_width[1]
+        else:
+            if self.bracketed and not line.startswith("["):
+                return None
+            header_length = line.find(self.separator, offset, _MAX_HEADER_LENGTH)
+            if header_length < 0:
+                return None
+            date_end = line.find(", ", offset, header_length)
+            if date_end < 0:
+                return None
+
+        # the sender ends at the first colon, which must be followed by a space
+        body_start = header_length + len(self.separator)
+        colon = line.find(":", body_start)
+        if colon <= body_start or line[colon + 1:colon + 2] != " ":
+            return None
+
+        date = self._parse_date(line[offset:date_end])
+        if date is None:
+            return None
+        time = self._parse_time(line[date_end + 2:header_length])
+        if time is None:
+            return None
+        try:
+            timestamp = datetime(date[0], date[1], date[2], time[0], time[1], time[2])
+        except ValueError:
+            return None
+        return timestamp, date[3], line[body_start:colon], line[colon + 2:].strip()
+
+    def _parse_date(self, date: str) -> tuple[int, int, int, str] | None:
+        cached = self._dates.get(date, False)
+        if cached is not False:
+            return cached
+
+        parsed = None
+        parts = _split_date(date)
+        if parts is not None:
+            first, second, year = (int(part) for part in parts)
+            if len(parts[2]) == 2:
+                year += 2000
+            day, month = (first, second) if self.day_first else (second, first)
+            if month > 12 and day <= 12:
+                # the sampled dates did not tell the order apart, this one is only valid the other way around
+                day, month = month, day
+            if 1 <= month <= 12 and 1 <= day <= 31:
+                parsed = (year, month, day, f"{year:04}-{month:02}-{day:02}")
+        self._dates[date] = parsed
+        return parsed
+
+    def _parse_time(self, time: str) -> tuple[int, int, int] | None:
+        cached = self._times.get(time, False)
+        if cached is False:
+            cached = _parse_time(time)
+            self._times[time] = cached
+        return cached
+
+
+def _split_header(line: str, bracketed: bool) -> tuple[int, tuple[str, str, str], str] | None:
+    """
+    Splits the header of a line into its date parts and time, used while sniffing.
+    :param line:
+    :param bracketed:
+    :return: the header length, the date parts and the time, or None if the line has no valid header
+    """
+    offset = 1 if bracketed else 0
+    header_length = line.find("] " if bracketed else " - ", offset, _MAX_HEADER_LENGTH)
+    if header_length < 0:
+        return None
+    comma = line.find(", ", offset, header_length)
+    if comma < 0:
+        return None
+    date = _split_date(line[offset:comma])
+    time = line[comma + 2:header_length]
+    if date is None or _parse_time(time) is None:
+        return None
+    return header_length, date, time
+
+
+def _split_date(date: str) -> tuple[str, str, str] | None:
+    for separator in _DATE_SEPARATORS:
+        parts = date.split(separator)
+        if len(parts) == 3 and all(part.isdigit() for part in parts):
+            return parts[0], parts[1], parts[2]
+    return None
+
+
+def _parse_time(time: str) -> tuple[int, int, int] | None:
+    """
+    Parses "HH:MM", "HH:MM:SS" and their 12h variants ("10:30 PM", "10:30 p.m.").
+    :param time:
+    :return: hours, minutes and seconds
+    """
+    meridiem = None
+    if not time[-1:].isdigit():
+        suffix = time.lower().replace(".", "")
+        if suffix.endswith("am"):
+            meridiem = 0
+        elif suffix.endswith("pm"):
+            meridiem = 12
+        else:
+            return None
+        time = time.rstrip(_MERIDIEM_CHARACTERS)
+
+    parts = time.split(":")
+    if not 2 <= len(parts) <= 3 or not all(part.isdigit() for part in parts):
+        return None
+    hours = int(parts[0])
+    minutes = int(parts[1])
+    seconds = int(parts[2]) if len(parts) == 3 else 0
+    if meridiem is not None:
+        if not 1 <= hours <= 12:
+            return None
+        hours = hours % 12 + meridiem
+    if hours > 23 or minutes > 59 or seconds > 59:
+        return None
+    return hours, minutes, seconds
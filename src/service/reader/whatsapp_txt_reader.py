@@ -1,57 +1,123 @@
-import re
 from datetime import datetime
+from itertools import chain
+from typing import Iterable, Iterator
 
+from src.dto.enums.message_order import MessageOrder
 from src.dto.message import Message
 from src.service.logging_service import LoggingService
 from src.service.reader.txt_reader import TxtReader
-from langchain_core.messages.utils import count_tokens_approximately
+from src.service.reader.whatsapp_header_parser import WhatsappHeaderParser
+from src.service.token_estimator.token_estimator import TokenEstimator
+
+
+def _recorded(lines: Iterator[str], consumed: list[str]) -> Iterator[str]:
+    """
+    Yields the provided lines, appending each of them to consumed first.
+    :param lines:
+    :param consumed: list receiving every line yielded so far
+    :return:
+    """
+    for line in lines:
+        consumed.append(line)
+        yield line
 
 
 class WhatsappTxtReader(TxtReader):
 
-    def __init__(self, logging_service: LoggingService, chars_per_token: float = 4.0):
-        super().__init__(logging_service, chars_per_token=chars_per_token)
-        self.message_regex = re.compile(
-            r'^(\d{2}/\d{2}/\d{4}), (\d{2}:\d{2}) - ([^:]+): (.*)', re.DOTALL
-        )
+    def __init__(self, logging_service: LoggingService, chars_per_token: float = 4.0,
+                 token_estimator: TokenEstimator = None):
+        super().__init__(logging_service, chars_per_token=chars_per_token, token_estimator=token_estimator)
+        # exports are written oldest message first
+        self.message_order = MessageOrder.ASCENDING
+        self.supports_ranges = True
+        # an export file holds a single chat
+        self.file_per_conversation = True
 
     def standardize_messages(self, lines: list[str]) -> list[Message]:
-        messages: list[Message] = []
+        return list(self.iter_messages(lines))
+
+    def stream_messages(self, path: str) -> Iterator[Message]:
+        """
+        Yields the standardized messages of an export file one at a time, without loading the whole file.
+        :param path:
+        :return:
+        """
+        yield from self.iter_messages(self.iter_lines(path))
+
+    def split_ranges(self, path: str, range_size: int) -> list[tuple[int, int]]:
+        """
+        Splits an export into byte ranges starting at a message header, so no message spans two ranges.
+        Concatenating the messages of every range gives the same messages of stream_messages.
+        :param path:
+        :param range_size: target size of each range, in bytes
+        :return:
+        """
+        header_parser = self.__sniff(path)
+        return self.split_lines(path, range_size, lambda line: header_parser.parse(line) is not None)
+
+    def stream_range(self, path: str, start: int, end: int) -> Iterator[Message]:
+        """
+        Yields the standardized messages of a byte range returned by split_ranges.
+        The header layout is sniffed from the beginning of the file, like the whole file reading does.
+        :param path:
+        :param start:
+        :param end:
+        :return:
+        """
+        yield from self.iter_messages(self.iter_range_lines(path, start, end), self.__sniff(path))
+
+    def iter_messages(self, lines: Iterable[str], header_parser: WhatsappHeaderParser = None) -> Iterator[Message]:
+        """
+        Lazily groups the lines of an export into standardized messages.
+        Lines without a message header are continuations of the previous message.
+        :param lines:
+        :param header_parser: parser of the export header layout, sniffed from the first lines if not provided
+        :return:
+        """
+        lines = iter(lines)
+        head = []
+        if header_parser is None:
+            # the header layout (locale, platform) is detected once per export, the sampled lines are kept in head
+            header_parser = WhatsappHeaderParser.sniff(_recorded(lines, head))
 
         timestamp: datetime = None
+        day: str = None
         sender: str = ""
-        current_content: str = ""
-
-        for line in lines:
-            match = self.message_regex.match(line)
-
-            if match:
-                # when there is a match, push the previous line (if any, the first line won't have a prev line)
-                if current_content:
-                    token_count = count_tokens_approximately(current_content, chars_per_token=self.chars_per_token)
-                    messages.append({
-                        'sender_name': sender,
-                        'timestamp': timestamp,
-                        'content': current_content.strip(),
-                        'token_count': token_count
-                    })
+        # lines of the current message, joined once when the message is complete
+        content_lines: list[str] = [""]
+
+        for line in chain(head, lines):
+            header = header_parser.parse(line)
+
+            if header:
+                # when there is a match, push the previous message (if any, the first line won't have a prev message)
+                if len(content_lines) > 1 or content_lines[0]:
+                    yield self.__build_message(sender, timestamp, day, content_lines)
                 # save sender, timestamp and message for the current line
-                date_str, time_str, sender, content = match.groups()
-                timestamp = datetime.strptime(f"{date_str} {time_str}", "%d/%m/%Y %H:%M")
-                current_content = content.strip()
+                timestamp, day, sender, content = header
+                content_lines = [content]
 
             else:
-                # if no match, we are still on the previous line, add the content
-                current_content += "\n" + line.strip()
-
-        # push the last leftover line
-        if current_content:
-            token_count = count_tokens_approximately(current_content, chars_per_token=self.chars_per_token)
-            messages.append({
-                'sender_name': sender,
-                'timestamp': timestamp,
-                'content': current_content.strip(),
-                'token_count': token_count
-            })
-
-        return messages
+                # if no match, we are still on the previous message, add the content
+                content_lines.append(line.strip())
+
+        # push the last leftover message
+        if len(content_lines) > 1 or content_lines[0]:
+            yield self.__build_message(sender, timestamp, day, content_lines)
+
+    def __sniff(self, path: str) -> WhatsappHeaderParser:
+        lines = self.iter_lines(path)
+        try:
+            return WhatsappHeaderParser.sniff(lines)
+        finally:
+            lines.close()
+
+    def __build_message(self, sender: str, timestamp: datetime, day: str, content_lines: list[str]) -> Message:
+        content = "\n".join(content_lines)
+        return {
+            'sender_name': sender,
+            'timestamp': timestamp,
+            'content': content.strip(),
+            'token_count': self.token_estimator.estimate_message(sender, content),
+            'day': day
+        }
@@ -0,0 +1,18 @@
+import math
+
+from src.service.token_estimator.token_estimator import TokenEstimator, LINE_OVERHEAD_TOKENS
+
+
+class LengthTokenEstimator(TokenEstimator):
+    """
+    Estimates tokens from the text length alone, without allocating anything.
+    """
+
+    def __init__(self, chars_per_token: float = 4.0):
+        self.chars_per_token = chars_per_token
+
+    def estimate(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def estimate_message(self, sender: str, content: str) -> int:
+        return math.ceil((len(sender) + len(content)) / self.chars_per_token) + LINE_OVERHEAD_TOKENS
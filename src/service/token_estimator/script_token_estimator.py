@@ -0,0 +1,31 @@
+import math
+import re
+
+from src.service.token_estimator.token_estimator import TokenEstimator
+
+_CYRILLIC_REGEX = re.compile(r'[\u0400-\u052f]')
+# Hangul, Hiragana, Katakana, CJK ideographs
+_CJK_REGEX = re.compile(r'[\u1100-\u11ff\u3040-\u30ff\u3130-\u318f\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+
+
+class ScriptTokenEstimator(TokenEstimator):
+    """
+    Estimates tokens with a different chars-per-token ratio for Latin, Cyrillic and CJK characters.
+    Pure ASCII text, the common case, takes the length-only path.
+    """
+
+    def __init__(self, chars_per_token: float = 4.0, cyrillic_chars_per_token: float = 2.5,
+                 cjk_chars_per_token: float = 1.0):
+        self.chars_per_token = chars_per_token
+        self.cyrillic_chars_per_token = cyrillic_chars_per_token
+        self.cjk_chars_per_token = cjk_chars_per_token
+
+    def estimate(self, text: str) -> int:
+        if text.isascii():
+            return math.ceil(len(text) / self.chars_per_token)
+
+        cyrillic = len(_CYRILLIC_REGEX.findall(text))
+        cjk = len(_CJK_REGEX.findall(text))
+        latin = len(text) - cyrillic - cjk
+        return math.ceil(latin / self.chars_per_token + cyrillic / self.cyrillic_chars_per_token
+                         + cjk / self.cjk_chars_per_token)
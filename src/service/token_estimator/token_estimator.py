@@ -0,0 +1,27 @@
+from abc import ABC, abstractmethod
+
+# tokens taken by the "[HH:MM] " prefix, the ": " separator and the newline of a chat log line
+LINE_OVERHEAD_TOKENS = 4
+
+
+class TokenEstimator(ABC):
+    """
+    Standardized abstract base class for the token estimator interface.
+    """
+
+    @abstractmethod
+    def estimate(self, text: str) -> int:
+        """
+        Estimates how many tokens the provided text takes.
+        :param text:
+        :return:
+        """
+
+    def estimate_message(self, sender: str, content: str) -> int:
+        """
+        Estimates how many tokens a message takes once formatted as a chat log line.
+        :param sender:
+        :param content:
+        :return:
+        """
+        return self.estimate(sender) + self.estimate(content) + LINE_OVERHEAD_TOKENS
@@ -0,0 +1,31 @@
+from src.dto.enums.token_estimator_type import TokenEstimatorType
+from src.service.config_service import get_nested
+from src.service.token_estimator.length_token_estimator import LengthTokenEstimator
+from src.service.token_estimator.script_token_estimator import ScriptTokenEstimator
+from src.service.token_estimator.token_estimator import TokenEstimator
+from src.service.token_estimator.vocabulary_token_estimator import VocabularyTokenEstimator
+
+
+def token_estimator_factory(config: dict) -> TokenEstimator:
+    """
+    Instantiates the token estimator configured in the parsing section and returns it.
+    :param config: Dictionary containing the configuration of the application.
+    :return:
+    """
+    # get configs
+    chars_per_token = get_nested(config, 'parsing.chars-per-token', 4.0)
+    estimator_type = get_nested(config, 'parsing.token-estimator.type', TokenEstimatorType.LENGTH)
+
+    if estimator_type == TokenEstimatorType.LENGTH:
+        return LengthTokenEstimator(chars_per_token)
+    elif estimator_type == TokenEstimatorType.SCRIPT:
+        cyrillic_chars_per_token = get_nested(config, 'parsing.token-estimator.cyrillic-chars-per-token', 2.5)
+        cjk_chars_per_token = get_nested(config, 'parsing.token-estimator.cjk-chars-per-token', 1.0)
+        return ScriptTokenEstimator(chars_per_token, cyrillic_chars_per_token, cjk_chars_per_token)
+    elif estimator_type == TokenEstimatorType.VOCABULARY:
+        vocabulary_path = get_nested(config, 'parsing.token-estimator.vocabulary-path', '')
+        cache_size = get_nested(config, 'parsing.token-estimator.cache-size', 65536)
+        return VocabularyTokenEstimator(vocabulary_path, cache_size=cache_size)
+
+    message = f"Token estimator not supported, please choose one of the following: {[e for e in TokenEstimatorType]}"
+    raise ValueError(message)
@@ -0,0 +1,37 @@
+from functools import lru_cache
+
+from src.service.token_estimator.token_estimator import TokenEstimator
+
+try:
+    import tiktoken
+    from tiktoken.load import load_tiktoken_bpe
+except ImportError:  # tiktoken is optional, only needed by this estimator
+    tiktoken = None
+
+# pre-tokenization pattern shared by the cl100k/o200k family of vocabularies
+DEFAULT_PATTERN = (r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+"""
+                   r"""|\s++$|\s*[\r\n]|\s+(?!\S)|\s""")
+
+
+class VocabularyTokenEstimator(TokenEstimator):
+    """
+    Counts the exact tokens of a BPE vocabulary loaded from a local .tiktoken file (one "base64-token rank" per line).
+    Chats repeat a lot of short strings, so counts are memoized in an LRU cache.
+    """
+
+    def __init__(self, vocabulary_path: str, pattern: str = DEFAULT_PATTERN, cache_size: int = 65536):
+        if tiktoken is None:
+            raise ImportError("The VOCABULARY token estimator requires the tiktoken package")
+        self.encoding = tiktoken.Encoding(
+            name="local-vocabulary",
+            pat_str=pattern,
+            mergeable_ranks=load_tiktoken_bpe(vocabulary_path),
+            special_tokens={},
+        )
+        self._count = lru_cache(maxsize=cache_size)(self._encode_length)
+
+    def _encode_length(self, text: str) -> int:
+        return len(self.encoding.encode_ordinary(text))
+
+    def estimate(self, text: str) -> int:
+        return self._count(text)
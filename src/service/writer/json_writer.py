@@ -2,13 +2,15 @@ import json
 import os
 from datetime import datetime
 
-from src.service.writer.writer import Writer
+from src.dto.enums.chat_log_format import ChatLogFormat
+from src.service.writer.writer import Writer, get_intermediate_steps, json_default
 
 
 class JsonWriter(Writer):
 
-    def __init__(self, folder: str, single_file: bool = True, export_intermediate_steps: bool = False) -> None:
-        super().__init__(folder, single_file, export_intermediate_steps)
+    def __init__(self, folder: str, single_file: bool = True, export_intermediate_steps: bool = False,
+                 chat_log_format: ChatLogFormat = ChatLogFormat.FULL) -> None:
+        super().__init__(folder, single_file, export_intermediate_steps, chat_log_format)
         self.single_file_name = f"{datetime.now().strftime('%Y-%m-%d_%H-%M')}_full-chronicle.json"
         self.first_line = True
 
@@ -24,8 +26,7 @@ class JsonWriter(Writer):
             "summary": str(summary_state.get('summary', '')),
         }
         if self.export_intermediate_steps:
-            intermediate = {k: v for k, v in summary_state.items() if k not in ("summary", "ai_chat")}
-            entry["intermediate_steps"] = intermediate
+            entry["intermediate_steps"] = get_intermediate_steps(summary_state, self.chat_log_format)
 
         if self.single_file:
             file_path = os.path.join(self.folder, self.single_file_name)
@@ -34,10 +35,10 @@ class JsonWriter(Writer):
 
         with open(file_path, "a", encoding="utf-8") as f:
             if self.first_line:
-                f.write(json.dumps(entry, ensure_ascii=False, default=str))
+                f.write(json.dumps(entry, ensure_ascii=False, default=json_default))
                 self.first_line = False
                 return
-            f.write(",\n" + json.dumps(entry, ensure_ascii=False, default=str))
+            f.write(",\n" + json.dumps(entry, ensure_ascii=False, default=json_default))
 
     def close(self) -> None:
         # write last line: the json array close
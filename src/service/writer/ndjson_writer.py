@@ -2,13 +2,15 @@ import json
 import os
 from datetime import datetime
 
-from src.service.writer.writer import Writer
+from src.dto.enums.chat_log_format import ChatLogFormat
+from src.service.writer.writer import Writer, get_intermediate_steps, json_default
 
 
 class NdJsonWriter(Writer):
 
-    def __init__(self, folder: str, single_file: bool = True, export_intermediate_steps: bool = False) -> None:
-        super().__init__(folder, single_file, export_intermediate_steps)
+    def __init__(self, folder: str, single_file: bool = True, export_intermediate_steps: bool = False,
+                 chat_log_format: ChatLogFormat = ChatLogFormat.FULL) -> None:
+        super().__init__(folder, single_file, export_intermediate_steps, chat_log_format)
         self.single_file_name = f"{datetime.now().strftime('%Y-%m-%d_%H-%M')}_full-chronicle.json"
 
     def write(self, date: str, summary_state: dict) -> None:
@@ -17,8 +19,7 @@ class NdJsonWriter(Writer):
             "summary": str(summary_state.get('summary', '')),
         }
         if self.export_intermediate_steps:
-            intermediate = {k: v for k, v in summary_state.items() if k not in ("summary", "ai_chat")}
-            entry["intermediate_steps"] = intermediate
+            entry["intermediate_steps"] = get_intermediate_steps(summary_state, self.chat_log_format)
 
         if self.single_file:
             file_path = os.path.join(self.folder, self.single_file_name)
@@ -26,7 +27,7 @@ class NdJsonWriter(Writer):
             file_path = os.path.join(self.folder, f"{date}_chronicle.json")
 
         with open(file_path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+            f.write(json.dumps(entry, ensure_ascii=False, default=json_default) + "\n")
 
     def close(self) -> None:
         pass
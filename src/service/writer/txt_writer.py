@@ -1,14 +1,16 @@
 import os
 from datetime import datetime
 
+from src.dto.enums.chat_log_format import ChatLogFormat
 from src.service.parser.parser import get_chat_log
-from src.service.writer.writer import Writer
+from src.service.writer.writer import Writer, get_intermediate_steps
 
 
 class TxtWriter(Writer):
 
-    def __init__(self, folder: str, single_file: bool = True, export_intermediate_steps: bool = False) -> None:
-        super().__init__(folder, single_file, export_intermediate_steps)
+    def __init__(self, folder: str, single_file: bool = True, export_intermediate_steps: bool = False,
+                 chat_log_format: ChatLogFormat = ChatLogFormat.FULL) -> None:
+        super().__init__(folder, single_file, export_intermediate_steps, chat_log_format)
         self.single_file_name = f"{datetime.now().strftime('%Y-%m-%d_%H-%M')}_full-chronicle.txt"
 
     def write(self, date: str, summary_state: dict) -> None:
@@ -26,8 +28,8 @@ class TxtWriter(Writer):
             if self.export_intermediate_steps:
                 chat = get_chat_log(summary_state.get('messages', ''))
                 f.write(f"Chat History: \n{chat}\n\n\n")
-                for key, value in summary_state.items():
-                    if key not in ("summary", "ai_chat", "messages"):
+                for key, value in get_intermediate_steps(summary_state, self.chat_log_format).items():
+                    if key != "messages":
                         f.write(f"{key}: \n{value}\n\n\n")
 
     def close(self) -> None:
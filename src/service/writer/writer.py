@@ -1,5 +1,49 @@
 from abc import ABC, abstractmethod
 
+from src.dto.chunk import Chunk
+from src.dto.enums.chat_log_format import ChatLogFormat
+from src.service.parser.message_store import MessageView
+from src.service.parser.parser import get_chunk_content
+
+
+def json_default(value):
+    """
+    Fallback of json.dumps for the intermediate steps: message views become lists of messages, anything else a string.
+    :param value:
+    :return:
+    """
+    if isinstance(value, MessageView):
+        return list(value)
+    return str(value)
+
+
+def export_chunk(chunk: Chunk, chat_log_format: ChatLogFormat = ChatLogFormat.FULL) -> dict:
+    """
+    Returns a chunk as exported in the intermediate steps: its own chat log, instead of the day lines it points to.
+    :param chunk:
+    :param chat_log_format: format of the chat log sent to the model, a compact one declares the sender aliases
+    :return:
+    """
+    exported = {"content": get_chunk_content(chunk, chat_log_format)}
+    exported |= {key: value for key, value in chunk.items()
+                 if key not in ("lines", "messages", "start_index", "end_index")}
+    return exported
+
+
+def get_intermediate_steps(summary_state: dict, chat_log_format: ChatLogFormat = ChatLogFormat.FULL) -> dict:
+    """
+    Returns the intermediate steps of a summary state, everything but the summary and the AI chat.
+    Message views become lists of messages and chunks their own chat log, so no store view is left to serialize.
+    :param summary_state:
+    :param chat_log_format: format of the chat logs sent to the model, chunks are exported the same way
+    :return:
+    """
+    intermediate = {k: list(v) if isinstance(v, MessageView) else v
+                    for k, v in summary_state.items() if k not in ("summary", "ai_chat")}
+    if "chunks" in intermediate:
+        intermediate["chunks"] = [export_chunk(chunk, chat_log_format) for chunk in intermediate["chunks"]]
+    return intermediate
+
 
 class Writer(ABC):
     """
@@ -7,10 +51,13 @@ class Writer(ABC):
     """
 
     @abstractmethod
-    def __init__(self, folder: str, single_file: bool = True, export_intermediate_steps: bool = False) -> None:
+    def __init__(self, folder: str, single_file: bool = True, export_intermediate_steps: bool = False,
+                 chat_log_format: ChatLogFormat = ChatLogFormat.FULL) -> None:
         self.folder = folder
         self.single_file = single_file
         self.export_intermediate_steps = export_intermediate_steps
+        # format of the chunks sent to the model, the exported chunks show the same chat log
+        self.chat_log_format = chat_log_format
 
     @abstractmethod
     def write(self, date: str, summary_state: dict) -> None:
@@ -1,3 +1,4 @@
+from src.dto.enums.chat_log_format import ChatLogFormat
 from src.dto.enums.writer_type import WriterType
 from src.service.config_service import get_nested
 from src.service.writer.json_writer import JsonWriter
@@ -17,13 +18,16 @@ def writer_factory(config: dict) -> Writer:
     file_type = get_nested(config, 'batch.output.type', WriterType.TXT)
     single_file = get_nested(config, 'batch.output.merge-to-one-file', True)
     export_intermediate_steps = get_nested(config, 'batch.output.export-intermediate-steps', False)
+    # only the map reduce strategy has chunks
+    chat_log_format = ChatLogFormat(get_nested(config, 'summarization.map-reduce-strategy.chat-log-format',
+                                               ChatLogFormat.FULL))
 
     if file_type == WriterType.TXT:
-        return TxtWriter(output_path, single_file, export_intermediate_steps)
+        return TxtWriter(output_path, single_file, export_intermediate_steps, chat_log_format)
     elif file_type == WriterType.NDJSON:
-        return NdJsonWriter(output_path, single_file, export_intermediate_steps)
+        return NdJsonWriter(output_path, single_file, export_intermediate_steps, chat_log_format)
     elif file_type == WriterType.JSON:
-        return JsonWriter(output_path, single_file, export_intermediate_steps)
+        return JsonWriter(output_path, single_file, export_intermediate_steps, chat_log_format)
 
     message = f"Output Writer type not supported, please choose one of the following: {[e for e in WriterType]}"
     raise ValueError(message)
@@ -1,13 +1,18 @@
 import asyncio
 import unittest
-from datetime import datetime
+from datetime import datetime, timedelta
 from unittest.mock import patch, MagicMock, AsyncMock
 
+from src.dto.enums.chat_log_format import ChatLogFormat
+from src.dto.enums.chunking_policy import ChunkingPolicy
 from src.dto.enums.summarization_strategy import SummarizationStrategy
 from src.service.ai_processor.ai_processor_factory import ai_processor_factory
 from src.service.ai_processor.linear_ai_processor import LinearAiProcessor
 from src.service.ai_processor.map_reduce_ai_processor import MapReduceAiProcessor
 from src.service.logging_service import LoggingService
+from src.service.parser.parser import get_chunk_content
+from src.service.message_filter.message_filter import MessageFilter
+from src.service.token_estimator.length_token_estimator import LengthTokenEstimator
 
 
 def _logging_service():
@@ -73,6 +78,47 @@ class TestLinearAiProcessor(unittest.TestCase):
         result = asyncio.run(processor.get_summary_async(messages))
         self.assertIn("summary", result)
 
+    @patch('src.service.ai_processor.linear_ai_processor.ChatOpenAI')
+    def test_message_filter(self, mock_chat):
+        from langchain_core.messages import AIMessage
+        mock_client = MagicMock()
+        mock_client.ainvoke = AsyncMock(return_value=AIMessage(content="Diary entry"))
+
+        processor = LinearAiProcessor(
+            _logging_service(), "", "{messages}", "model", 0.4, 2000, 0.7,
+            "key", "http://localhost", 600, 2, MessageFilter(["ok"])
+        )
+        processor.openai_client = mock_client
+        self.assertIn("filter-messages", processor.graph.get_graph().nodes)
+
+        messages = [
+            _make_message("Alice", "Dinner at 8?", datetime(2024, 1, 15, 10, 30)),
+            _make_message("Bob", "ok", datetime(2024, 1, 15, 10, 31)),
+        ]
+        result = asyncio.run(processor.get_summary_async(messages))
+        self.assertEqual(result["tokens_saved"], 10)
+        prompt = mock_client.ainvoke.call_args[0][0][-1].content
+        self.assertIn("Dinner at 8?", prompt)
+        self.assertNotIn("Bob", prompt)
+
+    @patch('src.service.ai_processor.linear_ai_processor.ChatOpenAI')
+    def test_plan_day(self, mock_chat):
+        processor = LinearAiProcessor(
+            _logging_service(), "System prompt", "{messages}", "model", 0.4, 2000, 0.7,
+            "key", "http://localhost", 600, 2, MessageFilter(["ok"])
+        )
+        messages = [_make_message("Alice", "Dinner at 8?", datetime(2024, 1, 15, 10, 30)),
+                    _make_message("Bob", "ok", datetime(2024, 1, 15, 10, 31))]
+        estimator = LengthTokenEstimator()
+        plan = processor.plan_day("2024-01-15", messages, estimator, 300)
+        self.assertEqual(plan, {
+            "day": "2024-01-15", "messages": 2, "filtered_messages": 1, "tokens_saved": 10, "map_calls": 0,
+            "map_prompt_tokens": 0, "reduce_calls": 1,
+            "reduce_prompt_tokens": estimator.estimate("System prompt") +
+            estimator.estimate("[10:30] Alice: Dinner at 8?\n"),
+            "output_tokens": 300,
+        })
+
     @patch('src.service.ai_processor.linear_ai_processor.ChatOpenAI')
     def test_empty_system_prompt(self, mock_chat):
         mock_response = MagicMock()
@@ -111,6 +157,53 @@ class TestMapReduceAiProcessor(unittest.TestCase):
         )
         self.assertIsNotNone(processor.graph)
 
+    @patch('src.service.ai_processor.map_reduce_ai_processor.ChatOpenAI')
+    def test_message_filter(self, mock_chat):
+        processor = MapReduceAiProcessor(
+            _logging_service(),
+            map_user_prompt="{messages}", reduce_user_prompt="{summaries}",
+            api_key="key", base_url="http://localhost", timeout=600, concurrency_limit=2,
+            message_filter=MessageFilter(["ok"])
+        )
+        self.assertIn("filter-messages", processor.graph.get_graph().nodes)
+        mock_client = MagicMock()
+        mock_client.ainvoke = AsyncMock(return_value=MagicMock(content="summary"))
+        processor.map_client = processor.reduce_client = mock_client
+
+        messages = [_make_message("Bob", "ok", datetime(2024, 1, 15, 10, 0)),
+                    _make_message("Alice", "Dinner at 8?", datetime(2024, 1, 15, 10, 30))]
+        result = asyncio.run(processor.get_summary_async(messages))
+        self.assertEqual(result["tokens_saved"], 10)
+        self.assertEqual([chunk["messages_count"] for chunk in result["chunks"]], [1])
+
+    @patch('src.service.ai_processor.map_reduce_ai_processor.ChatOpenAI')
+    def test_plan_day(self, mock_chat):
+        processor = MapReduceAiProcessor(
+            _logging_service(),
+            map_system_prompt="map", map_user_prompt="{messages}", map_summary_template="{start_date}: {content}",
+            reduce_system_prompt="reduce", reduce_user_prompt="{summaries}", token_per_chunk=100,
+            api_key="key", base_url="http://localhost", timeout=600, concurrency_limit=2
+        )
+        messages = [_make_message("Alice", "Hi " * 50, datetime(2024, 1, 15, 10, i), token_count=50)
+                    for i in range(20)]
+        estimator = LengthTokenEstimator()
+        plan = processor.plan_day("2024-01-15", messages, estimator, 300)
+
+        chunks = processor.get_chunks(messages)
+        self.assertEqual(plan["map_calls"], len(chunks))
+        self.assertEqual(plan["map_prompt_tokens"],
+                         sum(estimator.estimate("map") + estimator.estimate(get_chunk_content(chunk))
+                             for chunk in chunks))
+        summaries = "\n\n".join(f"{chunk['start_timestamp']:%H:%M}: " for chunk in chunks)
+        self.assertEqual(plan["reduce_calls"], 1)
+        self.assertEqual(plan["reduce_prompt_tokens"],
+                         estimator.estimate("reduce") + estimator.estimate(summaries) + 300 * len(chunks))
+        self.assertEqual(plan["output_tokens"], 300 * (len(chunks) + 1))
+
+        client, prompt = processor.get_sample_call(messages)
+        self.assertIs(client, processor.map_client)
+        self.assertEqual(prompt, processor.get_map_prompt(chunks[0]))
+
     @patch('src.service.ai_processor.map_reduce_ai_processor.ChatOpenAI')
     def test_prepare_messages(self, mock_chat):
         processor = MapReduceAiProcessor(
@@ -130,22 +223,66 @@ class TestMapReduceAiProcessor(unittest.TestCase):
         self.assertIsInstance(result["chunks"], list)
 
     @patch('src.service.ai_processor.map_reduce_ai_processor.ChatOpenAI')
-    def test_should_keep_mapping_true(self, mock_chat):
+    def test_fan_out_chunks(self, mock_chat):
         processor = MapReduceAiProcessor(
             _logging_service(),
             api_key="key", base_url="http://localhost", timeout=600, concurrency_limit=2
         )
-        state = {"chunks": [{"content": "test"}]}
-        self.assertTrue(processor._should_keep_mapping(state))
+        sends = processor._fan_out_chunks({"chunks": [{"messages_count": 1}, {"messages_count": 2}]})
+        self.assertEqual([send.node for send in sends], ["map-agent", "map-agent"])
+        self.assertEqual([send.arg["chunk"]["messages_count"] for send in sends], [1, 2])
 
     @patch('src.service.ai_processor.map_reduce_ai_processor.ChatOpenAI')
-    def test_should_keep_mapping_false(self, mock_chat):
+    def test_fan_out_without_chunks_reduces(self, mock_chat):
         processor = MapReduceAiProcessor(
             _logging_service(),
             api_key="key", base_url="http://localhost", timeout=600, concurrency_limit=2
         )
-        state = {"chunks": []}
-        self.assertFalse(processor._should_keep_mapping(state))
+        self.assertEqual(processor._fan_out_chunks({"chunks": []}), "reduce-agent")
+
+    @patch('src.service.ai_processor.map_reduce_ai_processor.ChatOpenAI')
+    def test_prepare_messages_per_thread(self, mock_chat):
+        processor = MapReduceAiProcessor(
+            _logging_service(), token_per_chunk=1000,
+            api_key="key", base_url="http://localhost", timeout=600, concurrency_limit=2
+        )
+        messages = [dict(_make_message("Alice", "Hi", datetime(2024, 1, 15, 10, i)), thread=thread)
+                    for i, thread in enumerate(["group", "alice", "group", "alice", "group"])]
+        chunks = asyncio.run(processor._prepare_messages({"messages": messages}))["chunks"]
+        self.assertEqual([(chunk["thread"], chunk["messages_count"]) for chunk in chunks], [("group", 3), ("alice", 2)])
+
+        processor.per_thread = False
+        chunks = asyncio.run(processor._prepare_messages({"messages": messages}))["chunks"]
+        self.assertEqual([(chunk["thread"], chunk["messages_count"]) for chunk in chunks], [("", 5)])
+
+    @patch('src.service.ai_processor.map_reduce_ai_processor.ChatOpenAI')
+    def test_map_calls_run_concurrently(self, mock_chat):
+        calls = {"running": 0, "max": 0}
+
+        async def _ainvoke(ai_chat_messages):
+            calls["running"] += 1
+            calls["max"] = max(calls["max"], calls["running"])
+            prompt = ai_chat_messages[-1].content
+            # later chunks answer first
+            await asyncio.sleep(0.01 if "first" in prompt else 0)
+            calls["running"] -= 1
+            return MagicMock(content=prompt.strip().split(": ")[-1])
+
+        processor = MapReduceAiProcessor(
+            _logging_service(), map_summary_template="{thread}: {content}", reduce_user_prompt="{summaries}",
+            token_per_chunk=1000, api_key="key", base_url="http://localhost", timeout=600, concurrency_limit=2
+        )
+        processor.map_client = MagicMock(ainvoke=_ainvoke)
+        processor.reduce_client = MagicMock(ainvoke=AsyncMock(return_value=MagicMock(content="Day")))
+        messages = [dict(_make_message("Alice", content, datetime(2024, 1, 15, 10, i)), thread=thread)
+                    for i, (thread, content) in enumerate([("group", "first"), ("alice", "second"),
+                                                           ("bob", "third")])]
+
+        result = asyncio.run(processor.get_summary_async(messages))
+        self.assertEqual(result["summary"], "Day")
+        # map calls overlap up to the concurrency limit, mini summaries keep the chunks order
+        self.assertEqual(calls["max"], 2)
+        self.assertEqual(result["mini_summaries"], ["group: first", "alice: second", "bob: third"])
 
     @patch('src.service.ai_processor.map_reduce_ai_processor.ChatOpenAI')
     def test_map_node(self, mock_chat):
@@ -164,17 +301,18 @@ class TestMapReduceAiProcessor(unittest.TestCase):
         processor.map_client = mock_client
 
         state = {
-            "chunks": [{
-                "content": "chat log text",
+            "chunk": {
+                "lines": ["chat log ", "text"],
+                "start_index": 0,
+                "end_index": 2,
                 "start_timestamp": datetime(2024, 1, 15, 10, 0),
                 "end_timestamp": datetime(2024, 1, 15, 11, 0),
                 "token_count": 100,
                 "messages_count": 5,
-            }],
-            "mini_summaries": [],
-            "ai_chat": [],
+            },
         }
         result = asyncio.run(processor._map(state))
+        self.assertEqual(mock_client.ainvoke.call_args[0][0][-1].content, "chat log text")
         self.assertIn("mini_summaries", result)
         self.assertEqual(len(result["mini_summaries"]), 1)
         self.assertEqual(result["mini_summaries"][0], "From 10:00 to 11:00: Mini summary")
@@ -226,6 +364,39 @@ class TestAiProcessorFactory(unittest.TestCase):
         processor = ai_processor_factory(config)
         self.assertIsInstance(processor, LinearAiProcessor)
 
+    @patch('src.service.ai_processor.linear_ai_processor.ChatOpenAI')
+    def test_message_filter(self, mock_chat):
+        config = {
+            'logs': {'level': 'WARNING'},
+            'summarization': {'strategy': SummarizationStrategy.LINEAR},
+            'inference-service': {'api-key': 'test', 'endpoint': 'http://localhost'},
+        }
+        self.assertIsNone(ai_processor_factory(config).message_filter)
+        config['summarization']['message-filter'] = {'enabled': True}
+        self.assertIsInstance(ai_processor_factory(config).message_filter, MessageFilter)
+        config['summarization']['message-filter'] = {'enabled': False}
+        processor = ai_processor_factory(config)
+        self.assertIsNone(processor.message_filter)
+        self.assertNotIn("filter-messages", processor.graph.get_graph().nodes)
+
+    @patch('src.service.ai_processor.linear_ai_processor.ChatOpenAI')
+    @patch('src.service.ai_processor.map_reduce_ai_processor.ChatOpenAI')
+    def test_chat_log_format(self, mock_map_reduce_chat, mock_linear_chat):
+        config = {
+            'logs': {'level': 'WARNING'},
+            'summarization': {'strategy': SummarizationStrategy.MAP_REDUCE,
+                              'linear-strategy': {'chat-log-format': 'FULL'},
+                              'map-reduce-strategy': {'chat-log-format': 'COMPACT'}},
+            'inference-service': {'api-key': 'test', 'endpoint': 'http://localhost'},
+        }
+        self.assertEqual(ai_processor_factory(config).chat_log_format, ChatLogFormat.COMPACT)
+        config['summarization']['strategy'] = SummarizationStrategy.LINEAR
+        self.assertEqual(ai_processor_factory(config).chat_log_format, ChatLogFormat.FULL)
+
+        config['summarization']['linear-strategy']['chat-log-format'] = 'UNSUPPORTED'
+        with self.assertRaises(ValueError):
+            ai_processor_factory(config)
+
     def test_unsupported_strategy_raises(self):
         config = {
             'logs': {'level': 'WARNING'},
@@ -235,6 +406,22 @@ class TestAiProcessorFactory(unittest.TestCase):
         with self.assertRaises(ValueError):
             ai_processor_factory(config)
 
+    @patch('src.service.ai_processor.map_reduce_ai_processor.ChatOpenAI')
+    def test_chunking_policy(self, mock_chat):
+        config = {
+            'logs': {'level': 'WARNING'},
+            'summarization': {'strategy': SummarizationStrategy.MAP_REDUCE,
+                              'map-reduce-strategy': {'chunking-policy': 'GAPS', 'min-gap-minutes': 45}},
+            'inference-service': {'api-key': 'test', 'endpoint': 'http://localhost'},
+        }
+        processor = ai_processor_factory(config)
+        self.assertEqual(processor.chunking_policy, ChunkingPolicy.GAPS)
+        self.assertEqual(processor.min_gap, timedelta(minutes=45))
+
+        config['summarization']['map-reduce-strategy']['chunking-policy'] = 'UNSUPPORTED'
+        with self.assertRaises(ValueError):
+            ai_processor_factory(config)
+
 
 if __name__ == '__main__':
     unittest.main()
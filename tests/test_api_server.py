@@ -1,8 +1,15 @@
+import io
+import json
+import os
+import tempfile
 import unittest
+import zipfile
+from datetime import date
 from unittest.mock import patch, MagicMock
 
 from src.api_server import app
-from src.controller.summary_controller import set_config, execute_summary_request
+from src.controller.summary_controller import set_config, execute_summary_request, \
+    execute_archive_summary_request
 from src.dto.enums.input_file_type import InputFileType
 
 
@@ -101,6 +108,37 @@ class TestExecuteSummaryRequest(unittest.TestCase):
         self.assertIn("intermediate_steps", entry)
         self.assertEqual(entry["intermediate_steps"]["extra"], "data")
 
+    def test_execute_archive_summary_request(self):
+        import src.controller.summary_controller as sc
+        sc.ai_processor = MagicMock()
+        sc.ai_processor.get_summary_sync.return_value = {'summary': 'A great day.'}
+
+        config = {'logs': {'level': 'WARNING'}}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive_path = os.path.join(tmpdir, "export.zip")
+            with zipfile.ZipFile(archive_path, "w") as archive:
+                archive.writestr("_chat.txt", "15/01/2024, 10:30 - Alice: Hello!\n16/01/2024, 10:30 - Bob: Hi!\n")
+
+            result = execute_archive_summary_request(InputFileType.WHATSAPP_EXPORT, config, archive_path)
+
+        self.assertEqual([entry["date"] for entry in result["entries"]], ["2024-01-15", "2024-01-16"])
+
+    def test_execute_archive_summary_request_date_window(self):
+        import src.controller.summary_controller as sc
+        sc.ai_processor = MagicMock()
+        sc.ai_processor.get_summary_sync.return_value = {'summary': 'A great day.'}
+
+        config = {'logs': {'level': 'WARNING'}}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive_path = os.path.join(tmpdir, "export.zip")
+            with zipfile.ZipFile(archive_path, "w") as archive:
+                archive.writestr("_chat.txt", "15/01/2024, 10:30 - Alice: Hello!\n16/01/2024, 10:30 - Bob: Hi!\n")
+
+            result = execute_archive_summary_request(InputFileType.WHATSAPP_EXPORT, config, archive_path,
+                                                     start_date=date(2024, 1, 16))
+
+        self.assertEqual([entry["date"] for entry in result["entries"]], ["2024-01-16"])
+
 
 class TestFlaskEndpoints(unittest.TestCase):
 
@@ -146,6 +184,20 @@ class TestFlaskEndpoints(unittest.TestCase):
         })
         self.assertEqual(response.status_code, 200)
 
+    @patch('src.controller.summary_controller.execute_summary_request')
+    @patch('src.controller.summary_controller.ai_semaphore')
+    def test_whatsapp_export_date_window(self, mock_semaphore, mock_execute):
+        mock_semaphore.acquire.return_value = True
+        mock_execute.return_value = {"entries": []}
+
+        response = self.client.post('/summarize/whatsapp-export', json={
+            "messages": ["15/01/2024, 10:30 - Alice: Hello!"],
+            "start_date": "2024-01-16",
+            "end_date": "2024-01-31",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_execute.call_args.args[3:], (date(2024, 1, 16), date(2024, 1, 31)))
+
     @patch('src.controller.summary_controller.ai_semaphore')
     def test_whatsapp_export_busy(self, mock_semaphore):
         mock_semaphore.acquire.return_value = False
@@ -174,6 +226,96 @@ class TestFlaskEndpoints(unittest.TestCase):
         })
         self.assertEqual(response.status_code, 422)
 
+    @patch('src.controller.summary_controller.execute_archive_summary_request')
+    @patch('src.controller.summary_controller.ai_semaphore')
+    def test_archive_endpoint(self, mock_semaphore, mock_execute):
+        mock_semaphore.acquire.return_value = True
+        mock_execute.return_value = {
+            "entries": [{"date": "2024-01-15", "summary": "A great day."}]
+        }
+
+        response = self.client.post('/summarize/archive', data={
+            "type": "WHATSAPP_EXPORT",
+            "configs": json.dumps({"parsing": {}}),
+            "archive": (io.BytesIO(b"PK"), "export.zip"),
+        }, content_type="multipart/form-data")
+
+        self.assertEqual(response.status_code, 200)
+        input_type, config, archive_path, start_date, end_date = mock_execute.call_args.args
+        self.assertEqual(input_type, InputFileType.WHATSAPP_EXPORT)
+        self.assertIsNone(start_date)
+        self.assertEqual(config["parsing"], {})
+        self.assertFalse(os.path.exists(archive_path))
+        mock_semaphore.release.assert_called_once()
+
+    @patch('werkzeug.datastructures.FileStorage.save', side_effect=OSError("No space left on device"))
+    @patch('src.controller.summary_controller.ai_semaphore')
+    def test_archive_endpoint_releases_the_semaphore_when_saving_fails(self, mock_semaphore, mock_save):
+        mock_semaphore.acquire.return_value = True
+        app.config['PROPAGATE_EXCEPTIONS'] = False
+        try:
+            response = self.client.post('/summarize/archive', data={
+                "type": "WHATSAPP_EXPORT",
+                "archive": (io.BytesIO(b"PK"), "export.zip"),
+            }, content_type="multipart/form-data")
+        finally:
+            app.config['PROPAGATE_EXCEPTIONS'] = None
+
+        self.assertEqual(response.status_code, 500)
+        mock_semaphore.release.assert_called_once()
+        self.assertFalse(os.path.exists(mock_save.call_args.args[0].name))
+
+    @patch('src.controller.summary_controller.ai_semaphore')
+    def test_archive_endpoint_without_chats(self, mock_semaphore):
+        mock_semaphore.acquire.return_value = True
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            zip_file.writestr("readme.md", "nothing here")
+        archive.seek(0)
+
+        response = self.client.post('/summarize/archive', data={
+            "type": "WHATSAPP_EXPORT",
+            "archive": (archive, "export.zip"),
+        }, content_type="multipart/form-data")
+
+        self.assertEqual(response.status_code, 400)
+
+    @patch('src.controller.summary_controller.ai_semaphore')
+    def test_archive_endpoint_missing_archive(self, mock_semaphore):
+        mock_semaphore.acquire.return_value = True
+
+        response = self.client.post('/summarize/archive', data={"type": "WHATSAPP_EXPORT"},
+                                    content_type="multipart/form-data")
+        self.assertEqual(response.status_code, 422)
+
+
+    @patch('src.service.ai_processor.map_reduce_ai_processor.ChatOpenAI')
+    def test_map_reduce_with_intermediate_steps(self, mock_chat):
+        from langchain_core.language_models.fake_chat_models import FakeListChatModel
+        mock_chat.side_effect = lambda **kwargs: FakeListChatModel(responses=["A summary."])
+        set_config({
+            'logs': {'level': 'WARNING'},
+            'output': {'export-intermediate-steps': True},
+            'summarization': {'strategy': 'MAP_REDUCE',
+                              'map-reduce-strategy': {'token-per-chunk': 20,
+                                                      'map-agent': {'user-prompt': '{messages}'},
+                                                      'reduce-agent': {'user-prompt': '{summaries}'}}},
+        })
+
+        response = self.client.post('/summarize/whatsapp-export', json={
+            "messages": ["15/01/2024, 10:30 - Alice: Are we still meeting for dinner tonight?",
+                         "15/01/2024, 10:31 - Bob: Sure, the usual place at eight",
+                         "15/01/2024, 10:32 - Alice: Perfect, I will book a table"]
+        })
+
+        self.assertEqual(response.status_code, 200)
+        [entry] = response.get_json()["entries"]
+        self.assertEqual(entry["summary"], "A summary.")
+        chunks = entry["intermediate_steps"]["chunks"]
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(chunks[0]["content"], "[10:30] Alice: Are we still meeting for dinner tonight?\n")
+        self.assertNotIn("lines", chunks[0])
+        self.assertEqual(len(entry["intermediate_steps"]["messages"]), 3)
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,11 +1,13 @@
 import asyncio
+import json
 import os
 import tempfile
 import unittest
-from datetime import datetime
+from datetime import date, datetime
 from unittest.mock import patch, MagicMock, AsyncMock
 
-from src.batch_processor import process_all, _batch_process_days, _process_single_day
+from src.batch_processor import plan_all, process_all, _batch_process_days, _get_plan_total, _process_single_day
+from src.service.parser.parser_factory import parser_factory
 
 
 def _make_message(sender, content, timestamp, token_count=10):
@@ -17,6 +19,11 @@ def _make_message(sender, content, timestamp, token_count=10):
     }
 
 
+def _input_file(path, thread=""):
+    stat = os.stat(path)
+    return {'path': path, 'thread': thread, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
 class TestProcessSingleDay(unittest.TestCase):
 
     def test_process_single_day_success(self):
@@ -71,6 +78,27 @@ class TestBatchProcessDays(unittest.TestCase):
         self.assertEqual(len(results), 2)
         mock_writer.close.assert_called_once()
 
+    def test_batch_process_bounds_days_in_flight(self):
+        in_flight = {"now": 0, "max": 0}
+
+        async def _summarize(messages):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0.01)
+            in_flight["now"] -= 1
+            return {"summary": "Summary", "ai_chat": []}
+
+        mock_ai = MagicMock()
+        mock_ai.get_summary_async = _summarize
+        mock_writer = MagicMock()
+
+        days = [f"2024-01-{day:02d}" for day in range(1, 8)]
+        results = asyncio.run(_batch_process_days(days, MagicMock(), mock_ai, mock_writer, MagicMock(), 2))
+
+        self.assertEqual(results, days)
+        self.assertEqual(in_flight["max"], 2)
+        self.assertEqual(mock_writer.write.call_count, 7)
+
     def test_batch_process_handles_exceptions(self):
         mock_parser = MagicMock()
         mock_parser.get_messages.return_value = []
@@ -113,7 +141,7 @@ class TestProcessAll(unittest.TestCase):
             # Setup mocks
             mock_reader = MagicMock()
             mock_reader.get_extension.return_value = ".json"
-            mock_reader.get_file_list.return_value = [os.path.join(input_dir, "chat.json")]
+            mock_reader.scan_input.return_value = [_input_file(os.path.join(input_dir, "chat.json"))]
             mock_reader.read.return_value = {"messages": [{"content": "test"}]}
             mock_reader.standardize_messages.return_value = [{"content": "test"}]
             mock_reader_factory.return_value = mock_reader
@@ -149,5 +177,401 @@ class TestProcessAll(unittest.TestCase):
             mock_writer.close.assert_called_once()
 
 
+    @patch('src.batch_processor.ai_processor_factory')
+    @patch('src.batch_processor.writer_factory')
+    @patch('src.batch_processor.parser_factory')
+    @patch('src.batch_processor.reader_factory')
+    def test_process_all_streaming(self, mock_reader_factory, mock_parser_factory,
+                                   mock_writer_factory, mock_ai_factory):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_file = os.path.join(tmpdir, "chat.json")
+            with open(input_file, 'w') as f:
+                f.write('{"messages": []}')
+
+            config = {
+                'logs': {'level': 'WARNING'},
+                'batch': {
+                    'input': {'type': 'INSTAGRAM_EXPORT', 'path': tmpdir, 'streaming': True},
+                    'output': {'type': 'TXT', 'path': tmpdir}
+                }
+            }
+
+            mock_reader = MagicMock()
+            mock_reader.scan_input.return_value = [_input_file(input_file)]
+            stream = iter([_make_message("Alice", "Hello!", datetime(2024, 1, 15, 10, 30))])
+            mock_reader.stream_messages.return_value = stream
+            mock_reader_factory.return_value = mock_reader
+
+            mock_parser = MagicMock()
+            mock_parser.get_available_days.return_value = []
+            mock_parser_factory.return_value = mock_parser
+
+            mock_writer = MagicMock()
+            mock_writer.single_file = True
+            mock_writer_factory.return_value = mock_writer
+
+            process_all(config)
+
+            mock_reader.read.assert_not_called()
+            mock_reader.stream_messages.assert_called_once_with(input_file)
+            mock_parser.parse.assert_called_once_with(stream, mock_reader.message_order, "")
+
+    @patch('src.batch_processor.read_files_parallel')
+    @patch('src.batch_processor.ai_processor_factory')
+    @patch('src.batch_processor.writer_factory')
+    @patch('src.batch_processor.parser_factory')
+    @patch('src.batch_processor.reader_factory')
+    def test_process_all_parallel_workers(self, mock_reader_factory, mock_parser_factory,
+                                          mock_writer_factory, mock_ai_factory, mock_read_parallel):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            files = []
+            for name in ("message_1.json", "message_2.json", "message_3.json"):
+                files.append(os.path.join(tmpdir, name))
+                with open(files[-1], 'w') as f:
+                    f.write('{"messages": []}')
+
+            config = {
+                'logs': {'level': 'WARNING'},
+                'batch': {
+                    'input': {'type': 'INSTAGRAM_EXPORT', 'path': tmpdir, 'workers': 2},
+                    'output': {'type': 'TXT', 'path': tmpdir}
+                }
+            }
+
+            mock_reader = MagicMock()
+            mock_reader.scan_input.return_value = [_input_file(file) for file in files]
+            mock_reader_factory.return_value = mock_reader
+            first = [_make_message("Alice", "first", datetime(2024, 1, 15, 10, 30))]
+            third = [_make_message("Bob", "third", datetime(2024, 1, 16, 10, 30))]
+            mock_read_parallel.return_value = iter([
+                (files[0], first, None),
+                (files[1], None, "broken"),
+                (files[2], third, None),
+            ])
+
+            mock_parser = MagicMock()
+            mock_parser.get_available_days.return_value = []
+            mock_parser_factory.return_value = mock_parser
+
+            mock_writer = MagicMock()
+            mock_writer.single_file = True
+            mock_writer_factory.return_value = mock_writer
+
+            process_all(config)
+
+            self.assertEqual(mock_read_parallel.call_args[0][0], files)
+            self.assertEqual(mock_read_parallel.call_args[0][3], 2)
+            mock_reader.read.assert_not_called()
+            self.assertEqual([c.args[0] for c in mock_parser.parse.call_args_list], [first, third])
+
+    @patch('src.batch_processor.ai_processor_factory')
+    @patch('src.batch_processor.writer_factory')
+    def test_process_all_warm_run_loads_message_cache(self, mock_writer_factory, mock_ai_factory):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_dir = os.path.join(tmpdir, "input")
+            os.makedirs(input_dir)
+            with open(os.path.join(input_dir, "chat.txt"), 'w', encoding='utf-8') as f:
+                f.write("15/01/2024, 10:30 - Alice: Hello!\nsecond line\n16/01/2024, 11:00 - Bob: Hi\n")
+
+            config = {
+                'logs': {'level': 'WARNING'},
+                'batch': {
+                    'input': {'type': 'WHATSAPP_EXPORT', 'path': input_dir},
+                    'cache': {'enabled': True, 'path': os.path.join(tmpdir, "cache")},
+                    'output': {'type': 'TXT', 'path': tmpdir}
+                }
+            }
+            mock_writer = MagicMock()
+            mock_writer.single_file = True
+            mock_writer_factory.return_value = mock_writer
+            parsers = []
+
+            def _parser_factory(input_file_type, parser_config):
+                parsers.append(parser_factory(input_file_type, parser_config))
+                return parsers[-1]
+
+            with patch('src.batch_processor.parser_factory', side_effect=_parser_factory):
+                process_all(config)
+                with patch('src.service.reader.txt_reader.TxtReader.read') as mock_read:
+                    process_all(config)
+                    mock_read.assert_not_called()
+                # an entry found valid but unreadable once loaded falls back to reading the file
+                with patch('src.service.message_cache.MessageCache.load', return_value=None):
+                    process_all(config)
+
+            cold, warm, fallback = parsers
+            self.assertEqual(warm.get_messages_grouped(), cold.get_messages_grouped())
+            self.assertEqual(fallback.get_messages_grouped(), cold.get_messages_grouped())
+            self.assertEqual(warm.get_messages("2024-01-15")[0]["content"], "Hello!. second line")
+
+    @patch('src.batch_processor.ai_processor_factory')
+    @patch('src.batch_processor.writer_factory')
+    def test_process_all_skips_files_that_are_not_conversations(self, mock_writer_factory, mock_ai_factory):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            thread_dir = os.path.join(tmpdir, "messages", "inbox", "alice_123")
+            os.makedirs(thread_dir)
+            with open(os.path.join(thread_dir, "message_1.json"), 'w', encoding='utf-8') as f:
+                json.dump({"participants": [{"name": "Alice"}],
+                           "messages": [{"sender_name": "Alice", "timestamp_ms": 1705314600000, "content": "Hi"}]}, f)
+            # a conversation file broken by hand, and a json file of the export that is not a conversation
+            with open(os.path.join(thread_dir, "message_2.json"), 'w', encoding='utf-8') as f:
+                f.write('[{"sender_name": "Alice"}]')
+            followers_dir = os.path.join(tmpdir, "connections", "followers_and_following")
+            os.makedirs(followers_dir)
+            with open(os.path.join(followers_dir, "followers_1.json"), 'w', encoding='utf-8') as f:
+                f.write('[{"title": "", "string_list_data": []}]')
+
+            config = {
+                'logs': {'level': 'WARNING'},
+                'batch': {
+                    'input': {'type': 'INSTAGRAM_EXPORT', 'path': tmpdir},
+                    'cache': {'enabled': False},
+                    'output': {'type': 'TXT', 'path': tmpdir}
+                }
+            }
+            mock_writer = MagicMock()
+            mock_writer.single_file = True
+            mock_writer_factory.return_value = mock_writer
+            mock_ai = MagicMock()
+            mock_ai.get_summary_async = AsyncMock(return_value={"summary": "A day.", "ai_chat": []})
+            mock_ai_factory.return_value = mock_ai
+
+            with self.assertLogs('src.batch_processor', level='ERROR') as logs:
+                process_all(config)
+
+            self.assertEqual(len(logs.output), 1)
+            self.assertIn("message_2.json", logs.output[0])
+            self.assertEqual(mock_writer.write.call_count, 1)
+
+    @patch('src.batch_processor.ai_processor_factory')
+    @patch('src.batch_processor.writer_factory')
+    def test_process_all_date_window(self, mock_writer_factory, mock_ai_factory):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_dir = os.path.join(tmpdir, "input")
+            os.makedirs(input_dir)
+            with open(os.path.join(input_dir, "chat.txt"), 'w', encoding='utf-8') as f:
+                f.write("15/01/2024, 10:30 - Alice: Hello!\n16/01/2024, 11:00 - Bob: Hi\n17/01/2024, 12:00 - Bob: Bye\n")
+
+            config = {
+                'logs': {'level': 'WARNING'},
+                'batch': {
+                    'input': {'type': 'WHATSAPP_EXPORT', 'path': input_dir},
+                    'cache': {'enabled': False},
+                    'date-window': {'start': date(2024, 1, 16), 'end': "2024-01-16"},
+                    'output': {'type': 'TXT', 'path': tmpdir}
+                }
+            }
+            mock_writer = MagicMock()
+            mock_writer.single_file = True
+            mock_writer_factory.return_value = mock_writer
+            mock_ai = MagicMock()
+            mock_ai.get_summary_async = AsyncMock(return_value={"summary": "A day.", "ai_chat": []})
+            mock_ai_factory.return_value = mock_ai
+
+            process_all(config)
+
+            self.assertEqual([c.args[0] for c in mock_writer.write.call_args_list], ["2024-01-16"])
+
+    @patch('src.batch_processor.ai_processor_factory')
+    @patch('src.batch_processor.writer_factory')
+    def test_process_all_drops_overlapping_exports(self, mock_writer_factory, mock_ai_factory):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_dir = os.path.join(tmpdir, "input")
+            # exports of the same chat share its folder
+            chat_dir = os.path.join(input_dir, "Alice")
+            os.makedirs(chat_dir)
+            with open(os.path.join(chat_dir, "chat_1.txt"), 'w', encoding='utf-8') as f:
+                f.write("15/01/2024, 10:30 - Alice: Hello!\n16/01/2024, 11:00 - Bob: Hi\n")
+            with open(os.path.join(chat_dir, "chat_2.txt"), 'w', encoding='utf-8') as f:
+                f.write("16/01/2024, 11:00 - Bob: Hi\n17/01/2024, 12:00 - Bob: Bye\n")
+
+            config = {
+                'logs': {'level': 'WARNING'},
+                'batch': {
+                    'input': {'type': 'WHATSAPP_EXPORT', 'path': input_dir},
+                    'output': {'type': 'TXT', 'path': tmpdir}
+                },
+                'parsing': {'deduplication': {'enabled': True}},
+            }
+            mock_writer = MagicMock()
+            mock_writer.single_file = True
+            mock_writer_factory.return_value = mock_writer
+            parsers = []
+
+            def _parser_factory(input_file_type, parser_config):
+                parsers.append(parser_factory(input_file_type, parser_config))
+                return parsers[-1]
+
+            with patch('src.batch_processor.parser_factory', side_effect=_parser_factory), \
+                    self.assertLogs('src.batch_processor', level='INFO') as logs:
+                process_all(config)
+
+            self.assertEqual([len(parsers[0].get_messages(day)) for day in parsers[0].get_available_days()],
+                             [1, 1, 1])
+            self.assertTrue(any("Dropped 1 messages" in line and "chat_2.txt" in line for line in logs.output))
+
+    @patch('src.batch_processor.ai_processor_factory')
+    @patch('src.batch_processor.writer_factory')
+    def test_process_all_summarizes_sealed_days_while_parsing(self, mock_writer_factory, mock_ai_factory):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_dir = os.path.join(tmpdir, "input")
+            chat_dir = os.path.join(input_dir, "Alice")
+            os.makedirs(chat_dir)
+            with open(os.path.join(chat_dir, "chat_1.txt"), 'w', encoding='utf-8') as f:
+                f.write("15/01/2024, 10:30 - Alice: Hello!\n16/01/2024, 11:00 - Bob: Hi\n17/01/2024, 12:00 - Bob: Bye\n")
+            # an export older than the previous one: the first day changes after being sealed
+            with open(os.path.join(chat_dir, "chat_2.txt"), 'w', encoding='utf-8') as f:
+                f.write("15/01/2024, 20:00 - Alice: Forgotten\n")
+
+            config = {
+                'logs': {'level': 'WARNING'},
+                'batch': {
+                    'input': {'type': 'WHATSAPP_EXPORT', 'path': input_dir},
+                    'cache': {'enabled': False},
+                    'output': {'type': 'TXT', 'path': tmpdir}
+                }
+            }
+            mock_writer = MagicMock()
+            mock_writer.single_file = True
+            mock_writer_factory.return_value = mock_writer
+            mock_ai = MagicMock()
+            mock_ai.get_summary_async = AsyncMock(
+                side_effect=lambda messages: {"summary": f"{len(messages)} messages", "ai_chat": []})
+            mock_ai_factory.return_value = mock_ai
+
+            with self.assertLogs('src.batch_processor', level='INFO') as logs:
+                process_all(config)
+
+            self.assertTrue(any("Started summarizing 2 days while parsing" in line for line in logs.output))
+            self.assertTrue(any("1 days changed after being sealed" in line for line in logs.output))
+            # the early summary of the changed day is dropped, every day is written once
+            written = {c.args[0]: c.args[1]["summary"] for c in mock_writer.write.call_args_list}
+            self.assertEqual(mock_writer.write.call_count, 3)
+            self.assertEqual(written, {"2024-01-15": "2 messages", "2024-01-16": "1 messages",
+                                       "2024-01-17": "1 messages"})
+            summarized = {c.args[0][0]["timestamp"].date().isoformat(): [m["content"] for m in c.args[0]]
+                          for c in mock_ai.get_summary_async.call_args_list if len(c.args[0]) > 1}
+            self.assertEqual(summarized, {"2024-01-15": ["Hello!", "Forgotten"]})
+            mock_writer.close.assert_called_once()
+
+    @patch('src.batch_processor.ai_processor_factory')
+    @patch('src.batch_processor.writer_factory')
+    def test_process_all_without_stream_days(self, mock_writer_factory, mock_ai_factory):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_dir = os.path.join(tmpdir, "input")
+            os.makedirs(input_dir)
+            with open(os.path.join(input_dir, "chat.txt"), 'w', encoding='utf-8') as f:
+                f.write("15/01/2024, 10:30 - Alice: Hello!\n16/01/2024, 11:00 - Bob: Hi\n")
+
+            config = {
+                'logs': {'level': 'WARNING'},
+                'batch': {
+                    'input': {'type': 'WHATSAPP_EXPORT', 'path': input_dir, 'stream-days': False},
+                    'cache': {'enabled': False},
+                    'output': {'type': 'TXT', 'path': tmpdir}
+                }
+            }
+            mock_writer = MagicMock()
+            mock_writer.single_file = True
+            mock_writer_factory.return_value = mock_writer
+            mock_ai = MagicMock()
+            mock_ai.get_summary_async = AsyncMock(return_value={"summary": "A day.", "ai_chat": []})
+            mock_ai_factory.return_value = mock_ai
+
+            with patch('src.batch_processor._stream_days') as mock_stream_days:
+                process_all(config)
+
+            mock_stream_days.assert_not_called()
+            self.assertEqual([c.args[0] for c in mock_writer.write.call_args_list], ["2024-01-15", "2024-01-16"])
+
+
+class TestPlanAll(unittest.TestCase):
+
+    def _config(self, tmpdir, output, plan):
+        input_dir = os.path.join(tmpdir, "input")
+        os.makedirs(input_dir)
+        with open(os.path.join(input_dir, "chat.txt"), 'w', encoding='utf-8') as f:
+            f.write("15/01/2024, 10:30 - Alice: Hello!\n15/01/2024, 10:31 - Bob: ok\n"
+                    "16/01/2024, 11:00 - Bob: How was the trip?\n17/01/2024, 12:00 - Alice: Bye\n")
+        return {
+            'logs': {'level': 'WARNING'},
+            'batch': {
+                'input': {'type': 'WHATSAPP_EXPORT', 'path': input_dir},
+                'cache': {'enabled': False},
+                'output': {'path': os.path.join(tmpdir, "output")} | output,
+            },
+            'inference-service': {'api-key': 'test', 'endpoint': 'http://localhost', 'concurrency-limit': 2},
+            'summarization': {'strategy': 'MAP_REDUCE', 'message-filter': {'enabled': True},
+                              'map-reduce-strategy': {'map-agent': {'user-prompt': '{messages}'},
+                                                      'reduce-agent': {'user-prompt': '{summaries}'}}},
+            'plan': {'output-path': os.path.join(tmpdir, "plan.json"), 'output-tokens-per-call': 100} | plan,
+        }
+
+    @patch('src.service.ai_processor.ai_processor.AiProcessor.invoke')
+    def test_plan_all_writes_the_plan(self, mock_invoke):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.makedirs(os.path.join(tmpdir, "output"))
+            config = self._config(tmpdir, {'type': 'JSON', 'merge-to-one-file': True}, {'tokens-per-second': 50})
+            plan = plan_all(config)
+
+            mock_invoke.assert_not_called()
+            # not even the opening of a json writer
+            self.assertEqual(os.listdir(os.path.join(tmpdir, "output")), [])
+            with open(os.path.join(tmpdir, "plan.json"), encoding='utf-8') as f:
+                self.assertEqual(json.load(f), plan)
+
+        self.assertEqual(plan["strategy"], "MAP_REDUCE")
+        self.assertEqual(plan["tokens_per_second_source"], "configured")
+        self.assertEqual([day["day"] for day in plan["days"]], ["2024-01-15", "2024-01-16", "2024-01-17"])
+        first_day = plan["days"][0]
+        self.assertEqual((first_day["messages"], first_day["filtered_messages"]), (2, 1))
+        self.assertGreater(first_day["tokens_saved"], 0)
+        self.assertEqual((first_day["map_calls"], first_day["reduce_calls"]), (1, 1))
+        self.assertEqual(first_day["output_tokens"], 200)
+        self.assertAlmostEqual(first_day["seconds"], (first_day["map_prompt_tokens"] +
+                                                      first_day["reduce_prompt_tokens"] + 200) / 50)
+        total = plan["total"]
+        self.assertEqual((total["days"], total["messages"], total["map_calls"], total["reduce_calls"]), (3, 4, 3, 3))
+        self.assertEqual(total["prompt_tokens"], total["map_prompt_tokens"] + total["reduce_prompt_tokens"])
+        self.assertAlmostEqual(total["projected_wall_seconds"], total["llm_seconds"] / 2)
+
+    @patch('src.service.ai_processor.ai_processor.AiProcessor.invoke')
+    def test_plan_all_measures_the_rate(self, mock_invoke):
+        from langchain_core.messages import AIMessage
+        mock_invoke.return_value = AIMessage(content="A summary")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            plan = plan_all(self._config(tmpdir, {}, {'measure-tokens-per-second': True}))
+
+        mock_invoke.assert_called_once()
+        self.assertEqual(plan["tokens_per_second_source"], "measured")
+        self.assertGreater(plan["tokens_per_second"], 0)
+        self.assertGreater(plan["total"]["projected_wall_seconds"], 0)
+
+    @patch('src.service.ai_processor.ai_processor.AiProcessor.invoke')
+    def test_plan_all_skips_written_days_without_calling_the_llm(self, mock_invoke):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.makedirs(os.path.join(tmpdir, "output"))
+            open(os.path.join(tmpdir, "output", "2024-01-16_chronicle.txt"), 'w').close()
+            plan = plan_all(self._config(tmpdir, {'type': 'TXT', 'merge-to-one-file': False}, {}))
+
+        mock_invoke.assert_not_called()
+        self.assertEqual([day["day"] for day in plan["days"]], ["2024-01-15", "2024-01-17"])
+        self.assertEqual((plan["tokens_per_second"], plan["tokens_per_second_source"]), (100, "configured"))
+
+    def test_wall_time_is_bounded_by_the_longest_day(self):
+        day_plans = [{"day": "2024-01-15", "messages": 100, "filtered_messages": 90, "tokens_saved": 50,
+                      "map_calls": 4, "map_prompt_tokens": 4000, "reduce_calls": 1, "reduce_prompt_tokens": 600,
+                      "output_tokens": 500}]
+        total = _get_plan_total(day_plans, 100, 8, 100)
+        # 44 s of map calls, all at once, then 7 s of reduce call
+        self.assertAlmostEqual(day_plans[0]["seconds"], 51)
+        self.assertAlmostEqual(total["llm_seconds"], 51)
+        self.assertAlmostEqual(total["projected_wall_seconds"], 44 / 4 + 7)
+
+        total = _get_plan_total(day_plans, 0, 8, 100)
+        self.assertIsNone(total["projected_wall_seconds"])
+        self.assertEqual(total["prompt_tokens"], 4600)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,130 @@
+import os
+import unittest
+from datetime import datetime
+
+from src.dto.enums.deduplicator_type import DeduplicatorType
+from src.dto.enums.message_order import MessageOrder
+from src.service.deduplicator.bloom_deduplicator import BloomDeduplicator
+from src.service.deduplicator.deduplicator import fingerprint, get_conversation
+from src.service.deduplicator.deduplicator_factory import deduplicator_factory
+from src.service.deduplicator.exact_deduplicator import ExactDeduplicator
+from src.service.parser.whatsapp_export import WhatsappExport
+
+
+def _make_message(sender, content, timestamp, token_count=10):
+    return {
+        'sender_name': sender,
+        'timestamp': timestamp,
+        'content': content,
+        'token_count': token_count,
+    }
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def test_stable_and_distinct(self):
+        timestamp = datetime(2024, 1, 15, 10, 30)
+        self.assertEqual(fingerprint(timestamp, "Alice", "Hi"), fingerprint(timestamp, "Alice", "Hi"))
+        self.assertEqual(len(fingerprint(timestamp, "Alice", "Hi")), 16)
+        self.assertNotEqual(fingerprint(timestamp, "Alice", "Hi"), fingerprint(timestamp, "Bob", "Hi"))
+        self.assertNotEqual(fingerprint(timestamp, "Alice", "Hi"), fingerprint(timestamp, "Alice", "Hi!"))
+        self.assertNotEqual(fingerprint(timestamp, "Alice", "Hi"),
+                            fingerprint(datetime(2024, 1, 15, 10, 31), "Alice", "Hi"))
+        # the separator keeps fields apart
+        self.assertNotEqual(fingerprint(timestamp, "Al", "ice: Hi"), fingerprint(timestamp, "Alice", ": Hi"))
+        self.assertNotEqual(fingerprint(timestamp, "Alice", "Hi", "alice_123"),
+                            fingerprint(timestamp, "Alice", "Hi", "bob_456"))
+
+    def test_conversation_is_the_thread_folder(self):
+        self.assertEqual(get_conversation(os.path.join("export_2024_01", "inbox", "alice_123")), "alice_123")
+        self.assertEqual(get_conversation("Alice, Bob"), "Alice, Bob")
+        self.assertEqual(get_conversation(""), "")
+
+
+class TestDeduplicators(unittest.TestCase):
+
+    def _check_membership(self, deduplicator):
+        added = [fingerprint(datetime(2024, 1, 15), "Alice", f"message {i}") for i in range(1000)]
+        others = [fingerprint(datetime(2024, 1, 15), "Bob", f"message {i}") for i in range(1000)]
+        for message_fingerprint in added:
+            deduplicator.add(message_fingerprint)
+        self.assertTrue(all(message_fingerprint in deduplicator for message_fingerprint in added))
+        return sum(message_fingerprint in deduplicator for message_fingerprint in others)
+
+    def test_exact(self):
+        self.assertEqual(self._check_membership(ExactDeduplicator()), 0)
+
+    def test_bloom(self):
+        deduplicator = BloomDeduplicator(expected_messages=1000, false_positive_rate=1e-6)
+        self.assertEqual(self._check_membership(deduplicator), 0)
+        # about 29 bits per message at 1e-6
+        self.assertLess(len(deduplicator.bits), 1000 * 4)
+
+    def test_bloom_over_capacity_has_false_positives(self):
+        deduplicator = BloomDeduplicator(expected_messages=10, false_positive_rate=0.01)
+        self.assertGreater(self._check_membership(deduplicator), 0)
+
+
+class TestDeduplicatorFactory(unittest.TestCase):
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(deduplicator_factory({}))
+
+    def test_exact(self):
+        self.assertIsInstance(deduplicator_factory({'parsing': {'deduplication': {'enabled': True}}}),
+                              ExactDeduplicator)
+
+    def test_bloom(self):
+        config = {'parsing': {'deduplication': {'enabled': True, 'type': DeduplicatorType.BLOOM,
+                                                'expected-messages': 1000}}}
+        self.assertIsInstance(deduplicator_factory(config), BloomDeduplicator)
+
+    def test_disabled(self):
+        self.assertIsNone(deduplicator_factory({'parsing': {'deduplication': {'enabled': False}}}))
+
+    def test_unsupported_type_raises(self):
+        with self.assertRaises(ValueError):
+            deduplicator_factory({'parsing': {'deduplication': {'enabled': True, 'type': 'UNSUPPORTED'}}})
+
+
+class TestParserDeduplication(unittest.TestCase):
+
+    def _files(self):
+        first = [_make_message("Alice", "Hi", datetime(2024, 1, 15, 10, 0)),
+                 _make_message("Bob", "Hey", datetime(2024, 1, 15, 10, 1)),
+                 _make_message("Bob", "Hey", datetime(2024, 1, 15, 10, 1))]
+        # the next export overlaps the last minute of the previous one
+        second = [_make_message("Bob", "Hey", datetime(2024, 1, 15, 10, 1)),
+                  _make_message("Bob", "Hey", datetime(2024, 1, 15, 10, 1)),
+                  _make_message("Alice", "Bye", datetime(2024, 1, 15, 10, 2))]
+        return first, second
+
+    def test_overlapping_files_are_counted_once(self):
+        parser = WhatsappExport(deduplicator=ExactDeduplicator())
+        first, second = self._files()
+        self.assertEqual(parser.parse(first, MessageOrder.ASCENDING), 0)
+        self.assertEqual(parser.parse(second, MessageOrder.ASCENDING), 2)
+        parser.sort_bucket()
+        # the identical messages of the same file are both kept
+        self.assertEqual([message["content"] for message in parser.get_messages("2024-01-15")],
+                         ["Hi", "Hey", "Hey", "Bye"])
+
+    def test_without_deduplicator(self):
+        parser = WhatsappExport()
+        first, second = self._files()
+        parser.parse(first)
+        self.assertEqual(parser.parse(second), 0)
+        parser.sort_bucket()
+        self.assertEqual(len(parser.get_messages("2024-01-15")), 6)
+
+    def test_same_messages_of_other_conversations_are_kept(self):
+        parser = WhatsappExport(deduplicator=ExactDeduplicator())
+        first, _ = self._files()
+        parser.parse(first, MessageOrder.ASCENDING, os.path.join("january", "alice"))
+        # the same conversation in another export folder
+        self.assertEqual(parser.parse(first, MessageOrder.ASCENDING, os.path.join("february", "alice")), 3)
+        self.assertEqual(parser.parse(first, MessageOrder.ASCENDING, os.path.join("february", "bob")), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
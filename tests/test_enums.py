@@ -4,6 +4,7 @@ from src.dto.enums.input_file_type import InputFileType
 from src.dto.enums.log_levels import LogLevel
 from src.dto.enums.run_mode import RunMode
 from src.dto.enums.summarization_strategy import SummarizationStrategy
+from src.dto.enums.token_estimator_type import TokenEstimatorType
 from src.dto.enums.writer_type import WriterType
 
 
@@ -48,9 +49,10 @@ class TestRunMode(unittest.TestCase):
     def test_members(self):
         self.assertEqual(RunMode.BATCH, "batch")
         self.assertEqual(RunMode.API, "api")
+        self.assertEqual(RunMode.PLAN, "plan")
 
     def test_member_count(self):
-        self.assertEqual(len(RunMode), 2)
+        self.assertEqual(len(RunMode), 3)
 
     def test_string_comparison(self):
         self.assertEqual(RunMode.BATCH, "batch")
@@ -78,5 +80,16 @@ class TestWriterType(unittest.TestCase):
         self.assertEqual(len(WriterType), 3)
 
 
+class TestTokenEstimatorType(unittest.TestCase):
+
+    def test_members(self):
+        self.assertEqual(TokenEstimatorType.LENGTH, "LENGTH")
+        self.assertEqual(TokenEstimatorType.SCRIPT, "SCRIPT")
+        self.assertEqual(TokenEstimatorType.VOCABULARY, "VOCABULARY")
+
+    def test_member_count(self):
+        self.assertEqual(len(TokenEstimatorType), 3)
+
+
 if __name__ == '__main__':
     unittest.main()
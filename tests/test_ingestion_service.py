@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.dto.enums.input_file_type import InputFileType
+from src.service.ingestion_service import get_work_units, get_worker_count, read_files_parallel
+from src.service.reader.reader_factory import reader_factory
+
+_CONFIG = {'logs': {'level': 'WARNING'}, 'parsing': {'messages': {}, 'chars-per-token': 4.0}}
+
+
+def _write_instagram_file(path, first_timestamp, count):
+    data = {
+        "participants": [{"name": "Alice"}, {"name": "Bob"}],
+        "messages": [
+            {"sender_name": "Alice" if i % 2 else "Bob", "timestamp_ms": first_timestamp - i * 60000,
+             "content": f"message {i}"}
+            for i in range(count)
+        ]
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+class TestGetWorkerCount(unittest.TestCase):
+
+    def test_explicit_count(self):
+        self.assertEqual(get_worker_count(3), 3)
+
+    def test_zero_uses_all_cores(self):
+        self.assertEqual(get_worker_count(0), os.cpu_count() or 1)
+
+
+class TestReadFilesParallel(unittest.TestCase):
+
+    def test_results_match_serial_order(self):
+        reader = reader_factory(InputFileType.INSTAGRAM_EXPORT, _CONFIG)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            files = []
+            for i in range(5):
+                path = os.path.join(tmpdir, f"message_{i + 1}.json")
+                _write_instagram_file(path, 1700000000000 - i * 86400000, 20)
+                files.append(path)
+
+            results = list(read_files_parallel(files, InputFileType.INSTAGRAM_EXPORT, _CONFIG, 2))
+
+            self.assertEqual([file for file, _, _ in results], files)
+            for file, messages, error in results:
+                self.assertIsNone(error)
+                self.assertEqual(messages, reader.standardize_messages(reader.read(file)))
+
+    def test_broken_file_returns_error(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "message_1.json")
+            with open(path, 'w') as f:
+                f.write("{not json")
+
+            results = list(read_files_parallel([path], InputFileType.INSTAGRAM_EXPORT, _CONFIG, 2, streaming=True))
+
+            self.assertEqual(len(results), 1)
+            self.assertIsNone(results[0][1])
+            self.assertIsNotNone(results[0][2])
+
+    def test_split_file_matches_serial_read(self):
+        reader = reader_factory(InputFileType.WHATSAPP_EXPORT, _CONFIG)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "chat.txt")
+            with open(path, 'w', encoding='utf-8') as f:
+                for i in range(500):
+                    f.write(f"15/01/2024, {i // 60 % 24:02}:{i % 60:02} - Alice: message {i}\nsecond line {i}\n")
+
+            self.assertGreater(len(get_work_units([path], reader, 2048)), 1)
+            results = list(read_files_parallel([path], InputFileType.WHATSAPP_EXPORT, _CONFIG, 2, split_size=2048))
+
+            self.assertEqual(len(results), 1)
+            self.assertIsNone(results[0][2])
+            self.assertEqual(results[0][1], reader.standardize_messages(reader.read(path)))
+
+    def test_unsplittable_reader_uses_whole_files(self):
+        reader = reader_factory(InputFileType.INSTAGRAM_EXPORT, _CONFIG)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "message_1.json")
+            _write_instagram_file(path, 1700000000000, 100)
+
+            self.assertEqual(get_work_units([path], reader, 16), [(path, None)])
+
+
+    def test_files_below_split_size_are_not_scanned(self):
+        reader = reader_factory(InputFileType.WHATSAPP_EXPORT, _CONFIG)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "chat.txt")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("15/01/2024, 10:30 - Alice: Hello!\n")
+
+            with patch.object(reader, "split_ranges") as split_ranges:
+                self.assertEqual(get_work_units([path], reader, 2048), [(path, None)])
+
+            split_ranges.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
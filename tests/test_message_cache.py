@@ -0,0 +1,143 @@
+import json
+import os
+import pickle
+import tempfile
+import unittest
+from array import array
+from datetime import datetime
+from unittest.mock import patch
+
+from src.dto.enums.input_file_type import InputFileType
+from src.service.logging_service import LoggingService
+from src.service.message_cache import MessageCache, get_parsing_hash, message_cache_factory
+
+_CONFIG = {'logs': {'level': 'WARNING'}, 'parsing': {'chars-per-token': 4.0}}
+
+
+def _messages():
+    return [
+        {'sender_name': 'Alice', 'timestamp': datetime(2024, 1, 15, 10, 30, 5, 123000), 'content': 'Hello!',
+         'token_count': 7, 'day': '2024-01-15', 'thread': ''},
+        {'sender_name': 'Bob', 'timestamp': datetime(2024, 1, 16, 1, 0), 'content': 'Late reply',
+         'token_count': None, 'day': '2024-01-16', 'thread': 'Alice, Bob'},
+        {'sender_name': 'Alice', 'timestamp': datetime(2024, 1, 16, 9, 0), 'content': 'Morning',
+         'token_count': 5, 'day': '2024-01-16', 'thread': 'Alice, Bob'},
+    ]
+
+
+class TestMessageCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = MessageCache(os.path.join(self.tmpdir.name, "cache"), InputFileType.WHATSAPP_EXPORT, _CONFIG,
+                                  LoggingService(_CONFIG))
+        self.input_file = {'path': os.path.join(self.tmpdir.name, "chat.txt"), 'thread': '', 'size': 100,
+                           'mtime_ns': 1700000000000000000}
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_round_trip(self):
+        self.cache.store(self.input_file, _messages())
+        self.assertEqual(list(self.cache.load(self.input_file)), _messages())
+
+    def test_missing_entry(self):
+        self.assertIsNone(self.cache.load(self.input_file))
+        self.assertFalse(self.cache.contains(self.input_file))
+
+    def test_contains_only_reads_the_key(self):
+        self.cache.store(self.input_file, _messages())
+        entry_path = self.cache.get_entry_path(self.input_file)
+        with open(entry_path, "rb") as f:
+            header = f.readline()
+        with open(entry_path, "wb") as f:
+            f.write(header + b"truncated columns")
+        with patch('src.service.message_cache._decode') as mock_decode:
+            self.assertTrue(self.cache.contains(self.input_file))
+            self.assertFalse(self.cache.contains({**self.input_file, 'size': 101}))
+        mock_decode.assert_not_called()
+        self.assertIsNone(self.cache.load(self.input_file))
+
+    def test_timestamps_are_stored_as_an_int64_column(self):
+        self.cache.store(self.input_file, _messages())
+        with open(self.cache.get_entry_path(self.input_file), "rb") as f:
+            header = json.loads(f.readline())
+            # sender, day and thread ids come first
+            array("I").fromfile(f, 3 * header['count'])
+            array("q").fromfile(f, header['count'])
+            timestamps = array("q")
+            timestamps.fromfile(f, header['count'])
+        self.assertEqual(header['key'], self.cache.get_key(self.input_file))
+        self.assertEqual(timestamps[0], 1705314605123000)
+
+    def test_changed_file_is_a_miss(self):
+        self.cache.store(self.input_file, _messages())
+        self.assertIsNone(self.cache.load({**self.input_file, 'size': 101}))
+        self.assertIsNone(self.cache.load({**self.input_file, 'mtime_ns': 1700000000000000001}))
+
+    def test_changed_parsing_settings_are_a_miss(self):
+        self.cache.store(self.input_file, _messages())
+        config = {'logs': {'level': 'WARNING'}, 'parsing': {'chars-per-token': 2.5}}
+        other = MessageCache(self.cache.directory, InputFileType.WHATSAPP_EXPORT, config, LoggingService(config))
+        self.assertIsNone(other.load(self.input_file))
+
+    def test_store_replaces_stale_entry(self):
+        self.cache.store(self.input_file, _messages())
+        changed = {**self.input_file, 'size': 101}
+        self.cache.store(changed, _messages()[:1])
+        self.assertEqual(list(self.cache.load(changed)), _messages()[:1])
+        self.assertEqual(len(os.listdir(self.cache.directory)), 1)
+
+    def test_corrupted_entry_is_a_miss(self):
+        with open(self.cache.get_entry_path(self.input_file), "wb") as f:
+            f.write(b"not a cache entry")
+        self.assertIsNone(self.cache.load(self.input_file))
+
+    def test_pickled_entry_is_never_unpickled(self):
+        marker = os.path.join(self.tmpdir.name, "marker")
+        open(marker, 'w').close()
+
+        class _Payload:
+            def __reduce__(self):
+                return os.remove, (marker,)
+
+        with open(self.cache.get_entry_path(self.input_file), "wb") as f:
+            pickle.dump(self.cache.get_key(self.input_file), f)
+            pickle.dump(_Payload(), f)
+
+        self.assertIsNone(self.cache.load(self.input_file))
+        self.assertFalse(self.cache.contains(self.input_file))
+        self.assertTrue(os.path.exists(marker))
+
+
+class TestGetParsingHash(unittest.TestCase):
+
+    def test_same_settings_same_hash(self):
+        self.assertEqual(get_parsing_hash(InputFileType.WHATSAPP_EXPORT, {'parsing': {'a': 1, 'b': 2}}),
+                         get_parsing_hash(InputFileType.WHATSAPP_EXPORT, {'parsing': {'b': 2, 'a': 1}}))
+
+    def test_input_type_changes_hash(self):
+        self.assertNotEqual(get_parsing_hash(InputFileType.WHATSAPP_EXPORT, _CONFIG),
+                            get_parsing_hash(InputFileType.INSTAGRAM_EXPORT, _CONFIG))
+
+    def test_unrelated_settings_do_not_change_hash(self):
+        config = {**_CONFIG, 'summarization': {'strategy': 'map_reduce'}}
+        self.assertEqual(get_parsing_hash(InputFileType.WHATSAPP_EXPORT, _CONFIG),
+                         get_parsing_hash(InputFileType.WHATSAPP_EXPORT, config))
+
+
+class TestMessageCacheFactory(unittest.TestCase):
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(message_cache_factory(InputFileType.WHATSAPP_EXPORT, _CONFIG))
+
+    def test_enabled(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config = {**_CONFIG, 'batch': {'cache': {'enabled': True, 'path': tmpdir}}}
+            cache = message_cache_factory(InputFileType.WHATSAPP_EXPORT, config)
+            self.assertIsInstance(cache, MessageCache)
+            self.assertEqual(cache.directory, tmpdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
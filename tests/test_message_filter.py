@@ -0,0 +1,115 @@
+import unittest
+from datetime import datetime, timedelta
+
+from src.dto.enums.message_order import MessageOrder
+from src.service.message_filter.message_filter import MessageFilter
+from src.service.message_filter.message_filter_factory import message_filter_factory
+from src.service.parser.message_store import MessageView
+from src.service.parser.whatsapp_export import WhatsappExport
+
+PHOTO = "[Sent a photo of himself]"
+
+
+def _make_message(sender, content, timestamp, token_count=10, thread=""):
+    return {
+        'sender_name': sender,
+        'timestamp': timestamp,
+        'content': content,
+        'token_count': token_count,
+        'thread': thread,
+    }
+
+
+def _messages(*entries):
+    start = datetime(2024, 1, 15, 10, 0)
+    return [_make_message(sender, content, start + timedelta(minutes=i)) for i, (sender, content) in enumerate(entries)]
+
+
+class TestMessageFilter(unittest.TestCase):
+
+    def setUp(self):
+        self.message_filter = MessageFilter(["ok", "lol"], placeholders={PHOTO: "[Sent {count} photos of himself]"})
+
+    def test_trivial_messages(self):
+        for content in ["ok", "Ok!!", "OK 👍", "lol", "LOL.", "ahahah", "Hahaha", "hehe", "xD", "😂😂", "", "?!",
+                        "jaja", "JAJAJA!", "jajaj"]:
+            self.assertTrue(self.message_filter.is_trivial(content), content)
+        # a single "ja" is a yes in spanish and german, laughter takes at least two repeats
+        for content in ["okay then, see you at 5", "no", "lollipop", "ha ha, funny how that went", "5", "ja", "Ja!",
+                        "jaj", "ha", "Ah.", "he", "aha"]:
+            self.assertFalse(self.message_filter.is_trivial(content), content)
+
+    def test_options(self):
+        message_filter = MessageFilter([], drop_laughter=False, drop_emoji_only=False)
+        self.assertFalse(message_filter.is_trivial("ahahah"))
+        self.assertFalse(message_filter.is_trivial("😂"))
+        self.assertFalse(message_filter.is_trivial("ok"))
+
+    def test_drops_trivial_messages(self):
+        messages = _messages(("Alice", "Dinner at 8?"), ("Bob", "ok"), ("Bob", "😂"), ("Bob", "See you there"))
+        filtered, saved = self.message_filter.filter(messages)
+        self.assertEqual([m["content"] for m in filtered], ["Dinner at 8?", "See you there"])
+        self.assertEqual(saved, 20)
+
+    def test_collapses_placeholder_runs(self):
+        messages = _messages(("Alice", PHOTO), ("Alice", PHOTO), ("Alice", "lol"), ("Alice", PHOTO), ("Bob", PHOTO),
+                             ("Bob", "Nice"), ("Bob", PHOTO))
+        filtered, saved = self.message_filter.filter(messages)
+        self.assertEqual([(m["sender_name"], m["content"]) for m in filtered], [
+            ("Alice", "[Sent 3 photos of himself]"),
+            ("Bob", PHOTO),
+            ("Bob", "Nice"),
+            ("Bob", PHOTO),
+        ])
+        self.assertEqual(filtered[0]["timestamp"], messages[0]["timestamp"])
+        collapsed_tokens = self.message_filter.token_estimator.estimate_message("Alice", "[Sent 3 photos of himself]")
+        self.assertEqual(filtered[0]["token_count"], collapsed_tokens)
+        self.assertEqual(saved, 40 - collapsed_tokens)
+        # the originals are left untouched
+        self.assertEqual(messages[0]["content"], PHOTO)
+
+    def test_runs_stay_in_their_thread(self):
+        messages = _messages(("Alice", PHOTO), ("Alice", PHOTO))
+        messages[1]["thread"] = "other"
+        filtered, _ = self.message_filter.filter(messages)
+        self.assertEqual([m["content"] for m in filtered], [PHOTO, PHOTO])
+
+    def test_views_stay_views(self):
+        parser = WhatsappExport()
+        parser.parse(_messages(("Alice", "Dinner at 8?"), ("Bob", "ok"), ("Bob", "Sure")), MessageOrder.ASCENDING)
+        parser.sort_bucket()
+        messages = parser.get_messages("2024-01-15")
+        filtered, saved = self.message_filter.filter(messages)
+        self.assertIsInstance(filtered, MessageView)
+        self.assertEqual([m["content"] for m in filtered], ["Dinner at 8?", "Sure"])
+        self.assertEqual(saved, 10)
+
+    def test_nothing_to_filter(self):
+        messages = _messages(("Alice", "Dinner at 8?"), ("Bob", "Sure"))
+        filtered, saved = self.message_filter.filter(messages)
+        self.assertEqual(filtered, messages)
+        self.assertEqual(saved, 0)
+
+
+class TestMessageFilterFactory(unittest.TestCase):
+
+    def test_disabled(self):
+        self.assertIsNone(message_filter_factory({'summarization': {'message-filter': {'enabled': False}}}))
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(message_filter_factory({}))
+
+    def test_placeholders_follow_the_parsing_messages(self):
+        message_filter = message_filter_factory({
+            'parsing': {'messages': {'user-content': {'photo-uploads': "[Photo]"}}},
+            'summarization': {'message-filter': {'enabled': True,
+                                                 'placeholders': {'photo-uploads': "[{count} photos]",
+                                                                  'video-uploads': "[{count} videos]"}}},
+        })
+        self.assertEqual(message_filter.placeholders, {"[Photo]": "[{count} photos]",
+                                                       "[Sent a video of himself]": "[{count} videos]"})
+        self.assertTrue(message_filter.is_trivial("ok"))
+
+
+if __name__ == '__main__':
+    unittest.main()
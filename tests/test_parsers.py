@@ -1,11 +1,22 @@
+import random
 import unittest
-from datetime import datetime
+from array import array
+from datetime import datetime, timedelta
+from unittest.mock import patch
 
+from src.dto.enums.chat_log_format import ChatLogFormat
+from src.dto.enums.chunking_policy import ChunkingPolicy
 from src.dto.enums.input_file_type import InputFileType
-from src.service.parser.parser import get_chat_log, get_chat_log_chunked, Parser
+from src.dto.enums.message_order import MessageOrder
+from src.service.parser.parser import get_chat_log, get_chat_log_chunked, get_chunk_content, get_sender_aliases, \
+    Parser
 from src.service.parser.instagram_export import InstagramExport
 from src.service.parser.whatsapp_export import WhatsappExport
 from src.service.parser.parser_factory import parser_factory
+from src.service.parser import chat_sessions
+from src.service.parser.day_sealer import DaySealer
+from src.service.parser.message_store import DAY_US, MINUTE_US, MessageStore, MessageView, from_epoch_us, \
+    group_messages_by_thread, to_epoch_us
 
 
 def _make_message(sender, content, timestamp, token_count=10):
@@ -17,6 +28,12 @@ def _make_message(sender, content, timestamp, token_count=10):
     }
 
 
+class _TokenCounter:
+
+    def estimate_message(self, sender, content):
+        return len(content)
+
+
 class TestGetChatLog(unittest.TestCase):
 
     def test_empty_messages(self):
@@ -43,6 +60,52 @@ class TestGetChatLog(unittest.TestCase):
         self.assertIn("[00:05]", result)
 
 
+class TestGetCompactChatLog(unittest.TestCase):
+
+    def test_empty_messages(self):
+        self.assertEqual(get_chat_log([], ChatLogFormat.COMPACT), "")
+
+    def test_compact_rendering(self):
+        messages = [
+            _make_message("Alice", "Hello!", datetime(2024, 1, 15, 10, 30)),
+            _make_message("Alice", "Are you there?", datetime(2024, 1, 15, 10, 30, 40)),
+            _make_message("Bob Smith", "Yes", datetime(2024, 1, 15, 10, 30, 50)),
+            _make_message("Alice", "Great", datetime(2024, 1, 15, 10, 32)),
+            _make_message("Alice", "See you later", datetime(2024, 1, 15, 10, 33)),
+        ]
+        self.assertEqual(get_chat_log(messages, ChatLogFormat.COMPACT),
+                         "Senders: A = Alice, BS = Bob Smith\n"
+                         "[10:30] A: Hello! / Are you there?\n"
+                         "BS: Yes\n"
+                         "[10:32] A: Great / [10:33] See you later\n")
+
+    def test_sender_aliases(self):
+        self.assertEqual(get_sender_aliases(["Alice Johnson", "Andrew Jones", "Amy", "Al", "A", "🙂"]), {
+            "Alice Johnson": "AJ",
+            "Andrew Jones": "AJ2",
+            "Amy": "A",
+            "Al": "Al",
+            "A": "A2",
+            "🙂": "🙂",
+        })
+
+    def test_views_render_like_dicts(self):
+        messages = [_make_message(f"Sender {i % 3}", f"m{i}", datetime(2024, 1, 15, 10, i // 2)) for i in range(20)]
+        parser = WhatsappExport()
+        parser.parse([dict(message) for message in messages], MessageOrder.ASCENDING)
+        parser.sort_bucket()
+        self.assertEqual(get_chat_log(parser.get_messages("2024-01-15"), ChatLogFormat.COMPACT),
+                         get_chat_log(messages, ChatLogFormat.COMPACT))
+
+    def test_chunks_declare_their_own_senders(self):
+        messages = [_make_message("Alice" if i < 6 else "Bob", f"m{i}", datetime(2024, 1, 15, 10, i), token_count=10)
+                    for i in range(12)]
+        chunks = get_chat_log_chunked(messages, 50, overlap_tokens=0)
+        self.assertEqual(get_chunk_content(chunks[0], ChatLogFormat.COMPACT),
+                         "Senders: A = Alice\n[10:00] A: m0 / [10:01] m1 / [10:02] m2 / [10:03] m3 / [10:04] m4\n")
+        self.assertTrue(get_chunk_content(chunks[-1], ChatLogFormat.COMPACT).startswith("Senders: B = Bob\n"))
+
+
 class TestGetChatLogChunked(unittest.TestCase):
 
     def test_empty_messages(self):
@@ -79,7 +142,69 @@ class TestGetChatLogChunked(unittest.TestCase):
             self.assertIsNotNone(chunk["start_timestamp"])
             self.assertIsNotNone(chunk["end_timestamp"])
             self.assertGreater(chunk["messages_count"], 0)
-            self.assertGreater(len(chunk["content"]), 0)
+            self.assertGreater(len(get_chunk_content(chunk)), 0)
+
+    def test_chunks_fit_the_budget(self):
+        messages = [
+            _make_message("Alice", "Message", datetime(2024, 1, 15, 10, i % 60), token_count=10 + i % 7 * 15)
+            for i in range(100)
+        ]
+        result = get_chat_log_chunked(messages, 300, overlap_tokens=50)
+        for prev, chunk in zip(result, result[1:]):
+            self.assertLessEqual(chunk["token_count"], 300)
+            # the chunks overlap by at most 50 tokens, and always move forward
+            overlap = messages[chunk["start_index"]:prev["end_index"]]
+            self.assertLessEqual(sum(message["token_count"] for message in overlap), 50)
+            self.assertGreater(chunk["start_index"], prev["start_index"])
+            self.assertGreater(chunk["end_index"], prev["end_index"])
+            # no room was left for the next message
+            self.assertGreater(prev["token_count"] + messages[prev["end_index"]]["token_count"], 300)
+        self.assertEqual(result[0]["start_index"], 0)
+        self.assertEqual(result[-1]["end_index"], 100)
+
+    def test_long_message_single_chunk(self):
+        messages = [
+            _make_message("Alice", "Hi", datetime(2024, 1, 15, 10, 0), token_count=10),
+            _make_message("Bob", "Long", datetime(2024, 1, 15, 10, 1), token_count=500),
+            _make_message("Alice", "Hi", datetime(2024, 1, 15, 10, 2), token_count=10),
+        ]
+        result = get_chat_log_chunked(messages, 100, overlap_tokens=50)
+        self.assertEqual([(chunk["start_index"], chunk["end_index"]) for chunk in result], [(0, 1), (1, 2), (2, 3)])
+        self.assertEqual(result[1]["token_count"], 500)
+
+    def test_missing_token_counts_are_estimated(self):
+        messages = [
+            _make_message("Alice", "Hi", datetime(2024, 1, 15, 10, i), token_count=None)
+            for i in range(10)
+        ]
+        result = get_chat_log_chunked(messages, 10000)
+        self.assertEqual(len(result), 1)
+        self.assertGreater(result[0]["token_count"], 0)
+
+    def test_gaps_policy_ends_chunks_at_silences(self):
+        # a message per minute, with a 45 minutes silence before the 9th one
+        messages = [
+            _make_message("Alice", "Hi", datetime(2024, 1, 15, 10, 0) + timedelta(minutes=i + (45 if i >= 8 else 0)))
+            for i in range(20)
+        ]
+        by_tokens = get_chat_log_chunked(messages, 100, overlap_tokens=30)
+        self.assertEqual([(chunk["start_index"], chunk["end_index"]) for chunk in by_tokens],
+                         [(0, 10), (7, 17), (14, 20)])
+        by_gaps = get_chat_log_chunked(messages, 100, overlap_tokens=30, policy=ChunkingPolicy.GAPS)
+        # the chunk gives up 2 messages to end at the silence, the next one repeats nothing
+        self.assertEqual([(chunk["start_index"], chunk["end_index"]) for chunk in by_gaps],
+                         [(0, 8), (8, 18), (15, 20)])
+        self.assertLess(sum(chunk["token_count"] for chunk in by_gaps),
+                        sum(chunk["token_count"] for chunk in by_tokens))
+
+    def test_gaps_policy_ignores_short_silences(self):
+        messages = [
+            _make_message("Alice", "Hi", datetime(2024, 1, 15, 10, 0) + timedelta(minutes=i * (i % 3)))
+            for i in range(30)
+        ]
+        messages.sort(key=lambda message: message["timestamp"])
+        self.assertEqual(get_chat_log_chunked(messages, 100, policy=ChunkingPolicy.GAPS, min_gap=timedelta(hours=3)),
+                         get_chat_log_chunked(messages, 100))
 
     def test_few_messages_included(self):
         messages = [
@@ -120,6 +245,10 @@ class TestParserHandleNewlines(unittest.TestCase):
         result = self.parser.handle_newlines("hello world")
         self.assertEqual(result, "hello world")
 
+    def test_consecutive_newlines(self):
+        result = self.parser.handle_newlines("hello.\n\n,\nworld\n")
+        self.assertEqual(result, "hello. . , world. ")
+
 
 class TestInstagramExportParser(unittest.TestCase):
 
@@ -149,22 +278,6 @@ class TestInstagramExportParser(unittest.TestCase):
         days = self.parser.get_available_days()
         self.assertEqual(len(days), 0)
 
-    def test_parse_fixes_unicode(self):
-        # Instagram double-encodes UTF-8 as latin1
-        original = "Ciao à tutti"
-        double_encoded = original.encode('utf8').decode('latin1')
-        messages = [_make_message("Alice", double_encoded, datetime(2024, 1, 15, 10, 30))]
-        self.parser.parse(messages)
-        day_messages = self.parser.get_messages("2024-01-15")
-        self.assertEqual(day_messages[0]["content"], "Ciao à tutti")
-
-    def test_parse_removes_unicode_from_sender(self):
-        messages = [_make_message("Alicé 🎉", "Hello!", datetime(2024, 1, 15, 10, 30))]
-        self.parser.parse(messages)
-        day_messages = self.parser.get_messages("2024-01-15")
-        # Non-ASCII chars removed
-        self.assertNotIn("🎉", day_messages[0]["sender_name"])
-
     def test_get_messages_returns_empty_for_unknown_date(self):
         self.assertEqual(self.parser.get_messages("1999-01-01"), [])
 
@@ -178,6 +291,12 @@ class TestInstagramExportParser(unittest.TestCase):
         self.assertIn("2024-01-15", grouped)
         self.assertIn("2024-01-16", grouped)
 
+    def test_parse_uses_precomputed_day_key(self):
+        message = _make_message("Alice", "Hello!", datetime(2024, 1, 15, 10, 30))
+        message["day"] = "2024-01-14"
+        self.parser.parse([message])
+        self.assertEqual(self.parser.get_available_days(), ["2024-01-14"])
+
     def test_ignore_chat_before(self):
         parser = InstagramExport(ignore_chat_enabled=True, ignore_chat_before="2024-01-15",
                                  ignore_chat_after="2024-12-31")
@@ -261,34 +380,340 @@ class TestParserSortBucket(unittest.TestCase):
         self.assertEqual(day_messages[1]["content"], "Second")
 
 
+    def test_descending_runs_are_reversed(self):
+        parser = InstagramExport()
+        start = datetime(2024, 1, 15, 10, 0)
+        parser.parse([_make_message("Alice", f"m{i}", start + timedelta(minutes=i)) for i in (5, 4, 3)],
+                     MessageOrder.DESCENDING)
+        parser.parse([_make_message("Alice", f"m{i}", start + timedelta(minutes=i)) for i in (2, 1, 0)],
+                     MessageOrder.DESCENDING)
+        parser.sort_bucket()
+        self.assertEqual([m["content"] for m in parser.get_messages("2024-01-15")],
+                         ["m0", "m1", "m2", "m3", "m4", "m5"])
+
+    def test_runs_out_of_their_order_are_sorted(self):
+        parser = InstagramExport()
+        start = datetime(2024, 1, 15, 10, 0)
+        # reported as descending, but it is not
+        parser.parse([_make_message("Alice", f"m{i}", start + timedelta(minutes=i)) for i in (1, 2, 0)],
+                     MessageOrder.DESCENDING)
+        parser.sort_bucket()
+        self.assertEqual([m["content"] for m in parser.get_messages("2024-01-15")], ["m0", "m1", "m2"])
+
+    def test_merge_matches_stable_sort(self):
+        rng = random.Random(0)
+        start = datetime(2024, 1, 15, 0, 0)
+        parser = InstagramExport()
+        expected = []
+        for run in range(6):
+            order = rng.choice(list(MessageOrder))
+            minutes = sorted(rng.randint(0, 3000) for _ in range(50))
+            if order == MessageOrder.DESCENDING:
+                minutes.reverse()
+            elif order == MessageOrder.UNORDERED:
+                rng.shuffle(minutes)
+            messages = [_make_message("Alice", f"{run}-{i}", start + timedelta(minutes=minute))
+                        for i, minute in enumerate(minutes)]
+            expected.extend(messages)
+            parser.parse([dict(message) for message in messages], order)
+        parser.sort_bucket()
+
+        expected.sort(key=lambda message: message["timestamp"])
+        days = {}
+        for message in expected:
+            days.setdefault(message["timestamp"].date().isoformat(), []).append(message["content"])
+        for day, contents in days.items():
+            self.assertEqual([m["content"] for m in parser.get_messages(day)], contents)
+
+    def test_available_days_are_sorted(self):
+        parser = InstagramExport()
+        parser.parse([
+            _make_message("Alice", "Newer", datetime(2024, 1, 16, 10, 0)),
+            _make_message("Alice", "Older", datetime(2024, 1, 15, 10, 0)),
+        ], MessageOrder.DESCENDING)
+        self.assertEqual(parser.get_available_days(), ["2024-01-15", "2024-01-16"])
+        self.assertEqual(list(parser.get_messages_grouped()), ["2024-01-15", "2024-01-16"])
+
+
 class TestParserExtractChatSessions(unittest.TestCase):
 
-    def test_no_carryover_when_messages_after_sleep_window(self):
+    def _sessions(self, messages):
         parser = InstagramExport(chat_sessions_enabled=True, sleep_window_start=2, sleep_window_end=9)
-        messages = [
+        parser.parse(messages)
+        parser.sort_bucket()
+        return {day: [m["content"] for m in day_messages] for day, day_messages in parser.get_messages_grouped().items()}
+
+    def test_no_carryover_when_messages_after_sleep_window(self):
+        sessions = self._sessions([
             _make_message("Alice", "Morning", datetime(2024, 1, 15, 10, 0)),
             _make_message("Bob", "Hello", datetime(2024, 1, 15, 11, 0)),
-        ]
-        result = parser.extract_chat_sessions(messages)
-        self.assertEqual(len(result), 2)
+        ])
+        self.assertEqual(sessions, {"2024-01-15": ["Morning", "Hello"]})
 
     def test_empty_messages(self):
         parser = InstagramExport(chat_sessions_enabled=True)
-        result = parser.extract_chat_sessions([])
-        self.assertEqual(result, [])
+        self.assertEqual(parser.extract_chat_sessions({}), {})
 
     def test_carryover_with_gap_in_sleep_window(self):
-        parser = InstagramExport(chat_sessions_enabled=True, sleep_window_start=2, sleep_window_end=9)
-        messages = [
+        sessions = self._sessions([
             _make_message("Alice", "Late night", datetime(2024, 1, 15, 1, 0)),
             # 5-hour gap in sleep window
             _make_message("Bob", "Morning", datetime(2024, 1, 15, 6, 0)),
             _make_message("Alice", "Afternoon", datetime(2024, 1, 15, 14, 0)),
-        ]
-        result = parser.extract_chat_sessions(messages)
-        # First message should be carried over, remaining should be returned
-        self.assertEqual(len(result), 2)
-        self.assertEqual(result[0]["content"], "Morning")
+        ])
+        # First message should be carried over to the previous day, created if missing
+        self.assertEqual(sessions, {"2024-01-14": ["Late night"], "2024-01-15": ["Morning", "Afternoon"]})
+
+    def test_carryover_is_appended_to_a_complete_day(self):
+        sessions = self._sessions([
+            _make_message("Alice", "Late night", datetime(2024, 1, 16, 1, 0)),
+            _make_message("Alice", "Evening", datetime(2024, 1, 15, 22, 0)),
+            _make_message("Bob", "Morning", datetime(2024, 1, 16, 7, 0)),
+            _make_message("Alice", "Early", datetime(2024, 1, 15, 1, 0)),
+            _make_message("Bob", "Dawn", datetime(2024, 1, 15, 5, 0)),
+        ])
+        self.assertEqual(sessions, {
+            "2024-01-14": ["Early"],
+            "2024-01-15": ["Dawn", "Evening", "Late night"],
+            "2024-01-16": ["Morning"],
+        })
+
+    def test_vectorized_splits_match_scan(self):
+        rng = random.Random(0)
+        timestamps = array("q")
+        timeline = array("q")
+        day_starts = []
+        for day in range(400):
+            day_starts.append(len(timeline))
+            times = sorted(rng.randint(0, DAY_US - 1) for _ in range(rng.randint(1, 30)))
+            for time_of_day in times:
+                timeline.append(len(timestamps))
+                timestamps.append(day * DAY_US + time_of_day)
+        arguments = (timestamps, timeline, day_starts, 2 * 60 * MINUTE_US, 9 * 60 * MINUTE_US, 3 * 60 * MINUTE_US)
+
+        with patch.object(chat_sessions, "np", None):
+            scanned = chat_sessions.find_session_splits(*arguments)
+        self.assertGreater(sum(1 for split in scanned if split > 0), 0)
+        if chat_sessions.np is not None:
+            self.assertEqual(chat_sessions._find_session_splits_vectorized(*arguments), scanned)
+
+
+    def test_find_widest_gap(self):
+        timestamps = [0, 5, 6, 20, 21, 35, 36]
+        self.assertEqual(chat_sessions.find_widest_gap(timestamps, 1, 7), (5, 14))
+        self.assertEqual(chat_sessions.find_widest_gap(timestamps, 1, 3), (1, 5))
+        self.assertEqual(chat_sessions.find_widest_gap(timestamps, 6, 7), (6, 1))
+
+
+class TestParserDayIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = WhatsappExport(chat_sessions_enabled=True, sleep_window_start=2, sleep_window_end=9)
+        self.parser.parse([
+            _make_message("Alice", "Monday", datetime(2024, 1, 15, 12, 0)),
+            _make_message("Bob", "Late night", datetime(2024, 1, 16, 1, 0)),
+            # 6-hour gap in sleep window, the late night message belongs to monday
+            _make_message("Alice", "Tuesday", datetime(2024, 1, 16, 7, 0)),
+            _make_message("Bob", "Thursday", datetime(2024, 1, 18, 20, 0)),
+        ], MessageOrder.ASCENDING)
+        self.parser.sort_bucket()
+
+    def test_days_between(self):
+        self.assertEqual(self.parser.get_days_between("2024-01-16", "2024-01-18"), ["2024-01-16", "2024-01-18"])
+        self.assertEqual(self.parser.get_days_between("2024-01-17"), ["2024-01-18"])
+        self.assertEqual(self.parser.get_days_between(last_day="2024-01-15"), ["2024-01-15"])
+        self.assertEqual(self.parser.get_days_between("2024-02-01", "2024-02-28"), [])
+
+    def test_messages_between_cross_days(self):
+        messages = self.parser.get_messages_between(datetime(2024, 1, 15, 12, 0), datetime(2024, 1, 18, 20, 0))
+        self.assertEqual([m["content"] for m in messages], ["Monday", "Late night", "Tuesday"])
+        messages = self.parser.get_messages_between(datetime(2024, 1, 16, 0, 0), datetime(2024, 1, 16, 7, 0))
+        self.assertEqual([m["content"] for m in messages], ["Late night"])
+
+    def test_day_ranges_follow_the_sessions(self):
+        index = self.parser.day_index
+        self.assertEqual(index.get_range("2024-01-15"), (0, 2))
+        self.assertEqual([m["content"] for m in self.parser.get_messages("2024-01-15")], ["Monday", "Late night"])
+        self.assertEqual(index.get_range("2024-01-17"), (0, 0))
+        start, end = index.get_range("2024-01-16")
+        self.assertEqual(list(index.rows[start:end]), list(self.parser.get_messages("2024-01-16").rows))
+
+    def test_index_is_empty_before_sorting(self):
+        parser = WhatsappExport()
+        parser.parse([_make_message("Alice", "Monday", datetime(2024, 1, 15, 12, 0))])
+        self.assertEqual(parser.get_days_between(), [])
+
+
+class TestDaySealer(unittest.TestCase):
+
+    def _seal(self, parser, batches, order):
+        sealed = {}
+        DaySealer(parser, order, lambda day, rows: sealed.setdefault(day, list(rows)))
+        for batch in batches:
+            parser.parse(batch, order)
+        parser.sort_bucket()
+        return sealed
+
+    def _random_messages(self, rng, days=60):
+        start = datetime(2024, 1, 1)
+        minutes = sorted(rng.randint(0, days * 24 * 60) for _ in range(days * 20))
+        return [_make_message("Alice", f"m{i}", start + timedelta(minutes=minute)) for i, minute in enumerate(minutes)]
+
+    def test_sealed_days_match_sort_bucket(self):
+        rng = random.Random(0)
+        for chat_sessions_enabled in (False, True):
+            for order in (MessageOrder.ASCENDING, MessageOrder.DESCENDING):
+                messages = self._random_messages(rng)
+                if order == MessageOrder.DESCENDING:
+                    messages.reverse()
+                # files of the same thread, read one after the other
+                batches = [messages[i:i + 97] for i in range(0, len(messages), 97)]
+                parser = InstagramExport(chat_sessions_enabled=chat_sessions_enabled)
+                sealed = self._seal(parser, batches, order)
+
+                # only the days still open when the stream ended are left
+                self.assertGreater(len(sealed), len(parser.get_available_days()) - 3)
+                for day, rows in sealed.items():
+                    self.assertEqual(rows, list(parser.get_messages(day).rows), (chat_sessions_enabled, order, day))
+
+    def test_ascending_day_waits_for_the_sleep_window(self):
+        parser = WhatsappExport(chat_sessions_enabled=True, sleep_window_start=2, sleep_window_end=9)
+        sealed = []
+        DaySealer(parser, MessageOrder.ASCENDING, lambda day, rows: sealed.append(day))
+        parser.parse([
+            _make_message("Alice", "Monday", datetime(2024, 1, 15, 12, 0)),
+            _make_message("Bob", "Late night", datetime(2024, 1, 16, 1, 0)),
+            _make_message("Alice", "Tuesday", datetime(2024, 1, 16, 7, 0)),
+        ], MessageOrder.ASCENDING)
+        self.assertEqual(sealed, [])
+        parser.parse([_make_message("Alice", "Tuesday noon", datetime(2024, 1, 16, 12, 0))], MessageOrder.ASCENDING)
+        self.assertEqual(sealed, ["2024-01-15"])
+
+    def test_descending_day_is_sealed_by_an_older_day(self):
+        parser = InstagramExport(chat_sessions_enabled=True, sleep_window_start=2, sleep_window_end=9)
+        sealed = {}
+        DaySealer(parser, MessageOrder.DESCENDING,
+                  lambda day, rows: sealed.setdefault(day, [parser.message_store.get_content(row) for row in rows]))
+        parser.parse([
+            _make_message("Alice", "Tuesday", datetime(2024, 1, 16, 7, 0)),
+            _make_message("Bob", "Late night", datetime(2024, 1, 16, 1, 0)),
+            _make_message("Alice", "Monday", datetime(2024, 1, 15, 12, 0)),
+        ], MessageOrder.DESCENDING)
+        self.assertEqual(sealed, {"2024-01-16": ["Tuesday"]})
+        parser.parse([_make_message("Alice", "Sunday", datetime(2024, 1, 14, 12, 0))], MessageOrder.DESCENDING)
+        self.assertEqual(sealed["2024-01-15"], ["Monday", "Late night"])
+
+    def test_unordered_stream_is_rejected(self):
+        with self.assertRaises(ValueError):
+            DaySealer(InstagramExport(), MessageOrder.UNORDERED, lambda day, rows: None)
+
+
+class TestMessageStore(unittest.TestCase):
+
+    def _make_store(self):
+        store = MessageStore()
+        store.append({**_make_message("Alice", "Ciao città ✓", datetime(2024, 1, 15, 10, 5)), 'day': "2024-01-15"})
+        store.append({**_make_message("Bob", "", datetime(2024, 1, 15, 10, 7), token_count=None),
+                      'day': "2024-01-15"})
+        store.append(_make_message("Alice", "Next day", datetime(2024, 1, 16, 8, 0, 0, 123)))
+        return store
+
+    def test_epoch_round_trip(self):
+        timestamp = datetime(1969, 12, 31, 23, 59, 59, 999999)
+        self.assertEqual(from_epoch_us(to_epoch_us(timestamp)), timestamp)
+
+    def test_view_round_trip(self):
+        store = self._make_store()
+        view = store.get_view("2024-01-15")
+        self.assertEqual(len(view), 2)
+        self.assertEqual(view[0]["content"], "Ciao città ✓")
+        self.assertEqual(view[0]["day"], "2024-01-15")
+        self.assertIsNone(view[1]["token_count"])
+        self.assertEqual(view[1]["content"], "")
+        self.assertEqual(store.senders, ["Alice", "Bob"])
+
+    def test_day_derived_from_timestamp(self):
+        store = self._make_store()
+        message = store.get_view("2024-01-16")[0]
+        self.assertEqual(message["day"], "2024-01-16")
+        self.assertEqual(message["timestamp"], datetime(2024, 1, 16, 8, 0, 0, 123))
+
+    def test_slice_returns_view(self):
+        view = self._make_store().get_view("2024-01-15")
+        self.assertIsInstance(view[1:], MessageView)
+        self.assertEqual(view[1:][0]["sender_name"], "Bob")
+
+    def test_view_equals_list(self):
+        view = self._make_store().get_view("2024-01-15")
+        self.assertEqual(view, list(view))
+        self.assertEqual(MessageStore().get_view("2024-01-15"), [])
+
+    def test_iter_fields(self):
+        view = self._make_store().get_view("2024-01-15")
+        fields = list(view.iter_fields())
+        self.assertEqual(fields[0], (to_epoch_us(datetime(2024, 1, 15, 10, 5)), "Alice", "Ciao città ✓", 10))
+        self.assertIsNone(fields[1][3])
+
+    def test_chat_log_same_for_view_and_dicts(self):
+        view = self._make_store().get_view("2024-01-15")
+        self.assertEqual(get_chat_log(view), get_chat_log(list(view)))
+        self.assertEqual(get_chat_log_chunked(view, 100, _TokenCounter()),
+                         get_chat_log_chunked(list(view), 100, _TokenCounter()))
+
+    def test_threads(self):
+        parser = WhatsappExport()
+        messages = [dict(_make_message("Alice", "Hi", datetime(2024, 1, 15, 10, i)), thread=thread)
+                    for i, thread in enumerate(["Alice, Bob", "Alice, Carl", "Alice, Bob"])]
+        parser.parse(messages[:2])
+        # the thread of the file (its folder) comes before the thread of the messages
+        parser.parse(messages[2:], MessageOrder.UNORDERED, "inbox/bob")
+        parser.sort_bucket()
+        view = parser.get_messages("2024-01-15")
+        self.assertEqual([message["thread"] for message in view], ["Alice, Bob", "Alice, Carl", "inbox/bob"])
+
+        threads = group_messages_by_thread(view)
+        self.assertEqual(list(threads), ["Alice, Bob", "Alice, Carl", "inbox/bob"])
+        self.assertIsInstance(threads["Alice, Bob"], MessageView)
+        self.assertEqual(group_messages_by_thread(list(view)), {thread: list(messages)
+                                                                for thread, messages in threads.items()})
+
+    def test_lines_are_formatted_once(self):
+        store = self._make_store()
+        view = store.get_view("2024-01-15")
+        self.assertIsNone(view.lines)
+        lines = view.get_lines()
+        self.assertEqual(lines, ["[10:05] Alice: Ciao città ✓\n", "[10:07] Bob: \n"])
+        self.assertIs(view.get_lines(), lines)
+        self.assertEqual(get_chat_log(view), "".join(lines))
+        # the store keeps no line, another view of the day formats its own
+        self.assertFalse(hasattr(store, "lines"))
+        self.assertIsNone(store.get_view("2024-01-15").lines)
+
+    def test_chunks_join_cached_lines(self):
+        store = MessageStore()
+        for minute in range(40):
+            store.append(_make_message("Alice", f"message {minute}", datetime(2024, 1, 15, 10, minute), token_count=30))
+        view = store.get_view("2024-01-15")
+        chunks = get_chat_log_chunked(view, 200, overlap_tokens=60)
+        self.assertGreater(len(chunks), 1)
+        lines = view.get_lines()
+        # chunks share the cached lines, the next chunk repeats the last 60 tokens of the previous one
+        self.assertIs(chunks[0]["lines"][0], lines[0])
+        self.assertEqual(get_chunk_content(chunks[0]), "".join(lines[:6]))
+        self.assertEqual(get_chunk_content(chunks[1]), "".join(lines[4:10]))
+        self.assertEqual(chunks[-1]["end_timestamp"], datetime(2024, 1, 15, 10, 39))
+
+    def test_sort_bucket_carries_over_through_store(self):
+        parser = InstagramExport(chat_sessions_enabled=True, sleep_window_start=2, sleep_window_end=9)
+        parser.parse([
+            _make_message("Alice", "Afternoon", datetime(2024, 1, 15, 14, 0)),
+            _make_message("Bob", "Morning", datetime(2024, 1, 15, 6, 0)),
+            _make_message("Alice", "Late night", datetime(2024, 1, 15, 1, 0)),
+            _make_message("Alice", "Evening", datetime(2024, 1, 14, 22, 0)),
+        ])
+        parser.sort_bucket()
+        self.assertEqual([m["content"] for m in parser.get_messages("2024-01-14")], ["Evening", "Late night"])
+        self.assertEqual([m["content"] for m in parser.get_messages("2024-01-15")], ["Morning", "Afternoon"])
 
 
 class TestParserFactory(unittest.TestCase):
@@ -2,12 +2,18 @@ import json
 import os
 import tempfile
 import unittest
+import zipfile
 from datetime import datetime
 from unittest.mock import patch
 
 from src.dto.enums.input_file_type import InputFileType
+from src.dto.enums.message_order import MessageOrder
 from src.service.logging_service import LoggingService
-from src.service.reader.instagram_export_json_reader import InstagramExportJsonReader
+from src.service.reader import timestamp_converter
+from src.service.reader.instagram_export_json_reader import InstagramExportJsonReader, fix_double_encoding
+from src.service.reader.json_reader import _JsonStream
+from src.service.reader.timestamp_converter import TimestampConverter
+from src.service.reader.whatsapp_header_parser import WhatsappHeaderParser
 from src.service.reader.whatsapp_txt_reader import WhatsappTxtReader
 from src.service.reader.reader_factory import reader_factory
 
@@ -49,6 +55,35 @@ class TestInstagramExportJsonReader(unittest.TestCase):
         self.assertIsInstance(messages[0]["timestamp"], datetime)
         self.assertIsInstance(messages[0]["token_count"], int)
 
+    def test_standardize_thread_from_participants(self):
+        data = {
+            "participants": [{"name": "Zoe"}, {"name": "Alice"}],
+            "messages": [{"sender_name": "Alice", "timestamp_ms": 1700000000000, "content": "Hello!"}]
+        }
+        self.assertEqual(self.reader.standardize_messages(data)[0]["thread"], "Alice, Zoe")
+        self.assertEqual(self.reader.standardize_messages({"messages": data["messages"]})[0]["thread"], "")
+
+    def test_standardize_fixes_unicode(self):
+        # Instagram double-encodes UTF-8 as latin1
+        double_encoded = "Ciao à tutti".encode('utf8').decode('latin1')
+        data = {"messages": [{"sender_name": "Alice", "timestamp_ms": 1700000000000, "content": double_encoded}]}
+        messages = self.reader.standardize_messages(data)
+        self.assertEqual(messages[0]["content"], "Ciao à tutti")
+
+    def test_standardize_removes_unicode_from_sender(self):
+        data = {"messages": [{"sender_name": "Alicé 🎉", "timestamp_ms": 1700000000000, "content": "Hello!"}]}
+        messages = self.reader.standardize_messages(data)
+        # Non-ASCII chars removed
+        self.assertEqual(messages[0]["sender_name"], "Alic ")
+        self.assertEqual(self.reader.sender_names, {"Alicé 🎉": "Alic "})
+
+    def test_fix_double_encoding_falls_back_per_text(self):
+        double_encoded = "città".encode('utf8').decode('latin1')
+        # neither latin1 encodable nor double encoded, kept as they are
+        self.assertEqual(fix_double_encoding([double_encoded, "🎉", "café"]), ["città", "🎉", "café"])
+        self.assertEqual(fix_double_encoding([double_encoded, "a\x00b"]), ["città", "a\x00b"])
+        self.assertEqual(fix_double_encoding([]), [])
+
     def test_standardize_shared_reel(self):
         data = {
             "messages": [
@@ -144,6 +179,85 @@ class TestInstagramExportJsonReader(unittest.TestCase):
         finally:
             os.unlink(path)
 
+    def test_stream_messages_matches_standardize(self):
+        data = {
+            "participants": [{"name": "Alice"}, {"name": "Bob"}],
+            "messages": [
+                {"sender_name": "Alice", "timestamp_ms": 1700000000000, "content": "Hello, {world}! \"quoted\""},
+                {"sender_name": "Bob", "timestamp_ms": 1700000001000, "photos": [{"uri": "photo.jpg"}]},
+                {"sender_name": "Bob", "timestamp_ms": 1700000002000, "content": "Ciao \u00c3\u00a0 tutti"},
+            ],
+            "title": "Alice",
+            "thread_path": "inbox/alice_123"
+        }
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+            path = f.name
+        try:
+            expected = self.reader.standardize_messages(self.reader.read(path))
+            # a tiny chunk size forces values to be split across buffer refills
+            with patch.object(self.reader, 'iter_array', side_effect=lambda p, k, **kwargs:
+                              InstagramExportJsonReader.iter_array(self.reader, p, k, 7, **kwargs)) as mock_iter:
+                streamed = list(self.reader.stream_messages(path))
+            self.assertEqual(streamed, expected)
+            # participants are read in the same pass of the messages
+            mock_iter.assert_called_once()
+            self.assertEqual(list(self.reader.stream_messages(path)), expected)
+            self.assertEqual(expected[0]["thread"], "Alice, Bob")
+        finally:
+            os.unlink(path)
+
+    def test_iter_array_missing_key(self):
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8') as f:
+            json.dump({"participants": [], "title": 12345}, f)
+            path = f.name
+        try:
+            self.assertEqual(list(self.reader.iter_array(path, "messages")), [])
+        finally:
+            os.unlink(path)
+
+    def test_iter_array_skips_other_values_undecoded(self):
+        data = {
+            "participants": [{"name": "Al]ice \" {"}, {"name": "Bob"}],
+            "magic_words": {"nested": [[1, 2], {"a": "b}\\"}], "text": "à ]] \" ["},
+            "title": "x" * 300,
+            "count": 12345,
+            "messages": [{"content": "a"}, {"content": "b"}],
+        }
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8') as f:
+            json.dump(data, f)
+            path = f.name
+        decoded = []
+
+        def _value(stream):
+            value = original_value(stream)
+            decoded.append(value)
+            return value
+
+        original_value = _JsonStream.value
+        try:
+            with patch.object(_JsonStream, 'value', _value):
+                # every chunk size splits the escapes and brackets across refills somewhere
+                for chunk_size in range(1, 12):
+                    captured = {"participants": []}
+                    self.assertEqual(list(self.reader.iter_array(path, "messages", chunk_size, captured)),
+                                     data["messages"])
+                    self.assertEqual(captured["participants"], data["participants"])
+            self.assertNotIn(data["magic_words"], decoded)
+            self.assertNotIn(data["title"], decoded)
+        finally:
+            os.unlink(path)
+
+    def test_iter_array_malformed_raises(self):
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8') as f:
+            f.write('{"messages": [{"content": "a"} {"content": "b"}]}')
+            path = f.name
+        try:
+            with self.assertRaises(json.JSONDecodeError):
+                list(self.reader.iter_array(path, "messages"))
+        finally:
+            os.unlink(path)
+
     def test_call_start_message(self):
         data = {
             "messages": [
@@ -154,6 +268,43 @@ class TestInstagramExportJsonReader(unittest.TestCase):
         self.assertEqual(messages[0]["content"], "[Call started]")
 
 
+class TestTimestampConverter(unittest.TestCase):
+
+    def setUp(self):
+        # dense timeline, plus sparse values across decades
+        self.timestamps = [1600000000000 + i * 97001 for i in range(2000)]
+        self.timestamps += [-86400000 * 400 + i * 7919000003 for i in range(300)]
+
+    def _expected(self):
+        timestamps = [datetime.fromtimestamp(t / 1000.0) for t in self.timestamps]
+        return timestamps, [t.date().isoformat() for t in timestamps]
+
+    def test_convert(self):
+        converter = TimestampConverter()
+        timestamp, day = converter.convert(1700000000123)
+        self.assertEqual(timestamp, datetime.fromtimestamp(1700000000.123))
+        self.assertEqual(day, timestamp.date().isoformat())
+
+    def test_convert_many_without_numpy(self):
+        with patch.object(timestamp_converter, 'np', None):
+            self.assertEqual(TimestampConverter().convert_many(self.timestamps), self._expected())
+
+    @unittest.skipIf(timestamp_converter.np is None, "numpy not installed")
+    def test_convert_many_vectorized(self):
+        self.assertEqual(TimestampConverter().convert_many(self.timestamps), self._expected())
+
+    @unittest.skipIf(timestamp_converter.np is None, "numpy not installed")
+    def test_convert_many_hour_with_offset_transition(self):
+        converter = TimestampConverter()
+        # pretend the offset changes inside every hour, forcing the per-message fallback
+        with patch.object(TimestampConverter, '_hour_offset', return_value=None):
+            self.assertEqual(converter.convert_many(self.timestamps), self._expected())
+
+    def test_reader_sets_day_key(self):
+        reader = InstagramExportJsonReader({}, _logging_service())
+        messages = reader.standardize_messages({"messages": [{"sender_name": "A", "timestamp_ms": 1700000000000}]})
+        self.assertEqual(messages[0]["day"], messages[0]["timestamp"].date().isoformat())
+
 class TestWhatsappTxtReader(unittest.TestCase):
 
     def setUp(self):
@@ -166,6 +317,7 @@ class TestWhatsappTxtReader(unittest.TestCase):
         self.assertEqual(messages[0]["sender_name"], "Alice")
         self.assertEqual(messages[0]["content"], "Hello!")
         self.assertEqual(messages[0]["timestamp"], datetime(2024, 1, 15, 10, 30))
+        self.assertEqual(messages[0]["day"], "2024-01-15")
 
     def test_standardize_multiple_messages(self):
         lines = [
@@ -219,6 +371,140 @@ class TestWhatsappTxtReader(unittest.TestCase):
         self.assertIsInstance(messages[0]["token_count"], int)
         self.assertGreater(messages[0]["token_count"], 0)
 
+    def test_standardize_ios_export(self):
+        lines = [
+            "[15/01/24, 10:30:15] Alice: Hello!\n",
+            "\u200e[15/01/24, 10:31:00] Bob: \u200eimage omitted\n",
+        ]
+        messages = self.reader.standardize_messages(lines)
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(messages[0]["timestamp"], datetime(2024, 1, 15, 10, 30, 15))
+        self.assertEqual(messages[1]["sender_name"], "Bob")
+
+    def test_standardize_system_line_is_continuation(self):
+        lines = [
+            "15/01/2024, 10:30 - Alice: Hello!\n",
+            "15/01/2024, 10:31 - Bob left\n",
+        ]
+        messages = self.reader.standardize_messages(lines)
+        self.assertEqual(len(messages), 1)
+        self.assertIn("Bob left", messages[0]["content"])
+
+    def test_multiline_content_is_joined_once(self):
+        lines = ["15/01/2024, 10:30 - Alice: def main():\n"] + [f"    print({i})\n" for i in range(1000)]
+        messages = self.reader.standardize_messages(lines)
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0]["content"],
+                         "def main():\n" + "\n".join(f"print({i})" for i in range(1000)))
+
+    def test_stream_messages_matches_standardize(self):
+        lines = [
+            "15/01/2024, 10:30 - Alice: Hello!\n",
+            "second line\n",
+            "15/01/2024, 10:31 - Bob: Hi there!\n",
+        ] * 40
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
+            f.writelines(lines)
+            path = f.name
+        try:
+            streamed = self.reader.stream_messages(path)
+            self.assertNotIsInstance(streamed, list)
+            self.assertEqual(list(streamed), self.reader.standardize_messages(self.reader.read(path)))
+        finally:
+            os.unlink(path)
+
+
+    def test_split_ranges_match_serial_read(self):
+        lines = []
+        for i in range(300):
+            lines.append(f"15/01/2024, {i // 60 % 24:02}:{i % 60:02} - Alice: messaggio {i} città\r\n")
+            if i % 7 == 0:
+                lines.append("15/01/2024, 10:30 - system notice without sender\r\n")
+                lines.append(f"continuation {i}\r\n")
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8', newline='') as f:
+            f.writelines(lines)
+            path = f.name
+        try:
+            ranges = self.reader.split_ranges(path, 1024)
+            self.assertGreater(len(ranges), 5)
+            self.assertEqual(ranges[0][0], 0)
+            self.assertEqual(ranges[-1][1], os.path.getsize(path))
+            for (_, end), (start, _) in zip(ranges, ranges[1:]):
+                self.assertEqual(end, start)
+
+            messages = [message for start, end in ranges for message in self.reader.stream_range(path, start, end)]
+            self.assertEqual(messages, self.reader.standardize_messages(self.reader.read(path)))
+        finally:
+            os.unlink(path)
+
+    def test_split_ranges_small_file_is_one_range(self):
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
+            f.write("15/01/2024, 10:30 - Alice: Hello!\n")
+            path = f.name
+        try:
+            self.assertEqual(self.reader.split_ranges(path, 1024), [(0, os.path.getsize(path))])
+        finally:
+            os.unlink(path)
+
+
+class TestWhatsappHeaderParser(unittest.TestCase):
+
+    def test_android_24h(self):
+        parser = WhatsappHeaderParser.sniff(["15/01/2024, 10:30 - Alice: Hello!\n"])
+        self.assertEqual(parser.parse("15/01/2024, 10:30 - Alice: Hello!\n"),
+                         (datetime(2024, 1, 15, 10, 30), "2024-01-15", "Alice", "Hello!"))
+
+    def test_month_first_12h(self):
+        lines = ["1/5/24, 9:05 AM - Alice: Hi\n", "1/25/24, 10:41 PM - Bob: Hey\n"]
+        parser = WhatsappHeaderParser.sniff(lines)
+        self.assertFalse(parser.day_first)
+        self.assertEqual(parser.parse(lines[0])[0], datetime(2024, 1, 5, 9, 5))
+        self.assertEqual(parser.parse(lines[1])[:2], (datetime(2024, 1, 25, 22, 41), "2024-01-25"))
+
+    def test_12h_midnight_and_narrow_space(self):
+        parser = WhatsappHeaderParser.sniff(["15/01/2024, 12:10\u202fa.m. - Alice: Hi\n"])
+        self.assertEqual(parser.parse("15/01/2024, 12:10\u202fa.m. - Alice: Hi\n")[0], datetime(2024, 1, 15, 0, 10))
+
+    def test_dotted_dates(self):
+        parser = WhatsappHeaderParser.sniff(["15.01.24, 10:30 - Alice: Hi\n"])
+        self.assertEqual(parser.parse("15.01.24, 10:30 - Alice: Hi\n")[1], "2024-01-15")
+
+    def test_variable_width_falls_back_to_search(self):
+        parser = WhatsappHeaderParser.sniff(["15/01/2024, 10:30 - Alice: Hi\n"])
+        self.assertIsNotNone(parser.fixed_width)
+        self.assertEqual(parser.parse("5/1/2024, 9:30 - Alice: Hi\n")[0], datetime(2024, 1, 5, 9, 30))
+
+    def test_rejects_non_headers(self):
+        parser = WhatsappHeaderParser.sniff(["15/01/2024, 10:30 - Alice: Hi\n"])
+        self.assertIsNone(parser.parse("just some text\n"))
+        self.assertIsNone(parser.parse("15/01/2024, 10:30 - Messages are end-to-end encrypted\n"))
+        self.assertIsNone(parser.parse("15/01/2024, 10:30 - Alice:no space\n"))
+        self.assertIsNone(parser.parse("32/01/2024, 10:30 - Alice: Hi\n"))
+        self.assertIsNone(parser.parse("15/01/2024, 25:30 - Alice: Hi\n"))
+
+    def test_ambiguous_month_first_export_is_settled_past_the_first_lines(self):
+        lines = [f"1/5/24, 10:{i:02} PM - Alice: message {i}\n" for i in range(55)]
+        lines += ["1/13/24, 9:00 AM - Bob: later\n", "2/1/24, 9:00 AM - Bob: next month\n"]
+        reader = WhatsappTxtReader(_logging_service())
+
+        messages = list(reader.iter_messages(lines))
+
+        self.assertEqual(len(messages), 57)
+        self.assertEqual(messages[0]["timestamp"], datetime(2024, 1, 5, 22, 0))
+        self.assertEqual((messages[55]["sender_name"], messages[55]["day"]), ("Bob", "2024-01-13"))
+        self.assertEqual(messages[56]["day"], "2024-02-01")
+
+    def test_date_valid_only_in_the_other_order_is_still_a_header(self):
+        parser = WhatsappHeaderParser.sniff(["1/5/24, 10:00 PM - Alice: Hi\n"])
+        self.assertTrue(parser.day_first)
+        self.assertEqual(parser.parse("1/13/24, 9:00 AM - Bob: later\n"),
+                         (datetime(2024, 1, 13, 9, 0), "2024-01-13", "Bob", "later"))
+
+    def test_sniff_without_headers_defaults_to_android(self):
+        parser = WhatsappHeaderParser.sniff(["not a header\n"])
+        self.assertFalse(parser.bracketed)
+        self.assertTrue(parser.day_first)
+
 
 class TestReaderGetFileList(unittest.TestCase):
 
@@ -226,8 +512,8 @@ class TestReaderGetFileList(unittest.TestCase):
         reader = InstagramExportJsonReader({}, _logging_service())
         with tempfile.TemporaryDirectory() as tmpdir:
             # Create some files
-            open(os.path.join(tmpdir, "chat1.json"), 'w').close()
-            open(os.path.join(tmpdir, "chat2.json"), 'w').close()
+            open(os.path.join(tmpdir, "message_1.json"), 'w').close()
+            open(os.path.join(tmpdir, "message_2.json"), 'w').close()
             open(os.path.join(tmpdir, "readme.txt"), 'w').close()
 
             files = reader.get_file_list(os.fsencode(tmpdir))
@@ -251,6 +537,136 @@ class TestReaderGetFileList(unittest.TestCase):
                 reader.get_file_list(os.fsencode(tmpdir))
 
 
+    def test_scan_input_walks_instagram_inbox(self):
+        reader = InstagramExportJsonReader({}, _logging_service())
+        with tempfile.TemporaryDirectory() as tmpdir:
+            inbox = os.path.join(tmpdir, "your_instagram_activity", "messages", "inbox")
+            for thread, count in (("bob_456", 2), ("alice_123", 11)):
+                os.makedirs(os.path.join(inbox, thread, "photos"))
+                open(os.path.join(inbox, thread, "photos", "image.jpg"), 'w').close()
+                for i in range(count):
+                    with open(os.path.join(inbox, thread, f"message_{i + 1}.json"), 'w') as f:
+                        f.write("{}")
+            # the other json files of the export are not conversations
+            followers = os.path.join(tmpdir, "connections", "followers_and_following")
+            os.makedirs(followers)
+            with open(os.path.join(followers, "followers_1.json"), 'w') as f:
+                f.write("[]")
+
+            files = reader.scan_input(os.fsencode(tmpdir))
+
+            self.assertEqual(len(files), 13)
+            alice_thread = os.path.join("your_instagram_activity", "messages", "inbox", "alice_123")
+            bob_thread = os.path.join("your_instagram_activity", "messages", "inbox", "bob_456")
+            self.assertEqual([f["thread"] for f in files], [alice_thread] * 11 + [bob_thread] * 2)
+            # natural order inside the thread
+            self.assertEqual([os.path.basename(f["path"]) for f in files[:11]],
+                             [f"message_{i + 1}.json" for i in range(11)])
+            self.assertTrue(all(f["size"] == 2 for f in files))
+            self.assertTrue(all(f["mtime_ns"] > 0 for f in files))
+
+    def test_scan_input_root_exports_are_threads_of_their_own(self):
+        reader = WhatsappTxtReader(_logging_service())
+        with tempfile.TemporaryDirectory() as tmpdir:
+            open(os.path.join(tmpdir, "WhatsApp Chat with Alice.txt"), 'w').close()
+            open(os.path.join(tmpdir, "WhatsApp Chat with Bob.txt"), 'w').close()
+            os.makedirs(os.path.join(tmpdir, "Carol"))
+            open(os.path.join(tmpdir, "Carol", "chat.txt"), 'w').close()
+
+            files = reader.scan_input(os.fsencode(tmpdir))
+
+            self.assertEqual([f["thread"] for f in files],
+                             ["Carol", "WhatsApp Chat with Alice", "WhatsApp Chat with Bob"])
+            self.assertEqual(files[0]["size"], 0)
+
+    def test_scan_input_root_files_of_a_folder_conversation_have_empty_thread(self):
+        reader = InstagramExportJsonReader({}, _logging_service())
+        with tempfile.TemporaryDirectory() as tmpdir:
+            open(os.path.join(tmpdir, "message_1.json"), 'w').close()
+            open(os.path.join(tmpdir, "message_2.json"), 'w').close()
+
+            files = reader.scan_input(os.fsencode(tmpdir))
+
+            self.assertEqual([f["thread"] for f in files], ["", ""])
+
+
+class TestReaderArchives(unittest.TestCase):
+
+    def test_scan_input_lists_archive_members(self):
+        reader = InstagramExportJsonReader({}, _logging_service())
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive_path = os.path.join(tmpdir, "instagram-export.zip")
+            with zipfile.ZipFile(archive_path, "w") as archive:
+                archive.writestr("your_instagram_activity/messages/inbox/alice_123/message_2.json", "{}")
+                archive.writestr("your_instagram_activity/messages/inbox/alice_123/message_10.json", "{}")
+                archive.writestr("personal_information/account_information.json", "{}")
+                archive.writestr("your_instagram_activity/messages/inbox/alice_123/photos/image.jpg", "")
+
+            files = reader.scan_input(os.fsencode(tmpdir))
+
+            thread = os.path.join("your_instagram_activity", "messages", "inbox", "alice_123")
+            self.assertEqual([f["thread"] for f in files], [thread, thread])
+            self.assertEqual([f["path"] for f in files], [
+                archive_path + "/your_instagram_activity/messages/inbox/alice_123/message_2.json",
+                archive_path + "/your_instagram_activity/messages/inbox/alice_123/message_10.json",
+            ])
+            self.assertEqual(files[0]["size"], 2)
+
+    def test_read_archive_member(self):
+        reader = InstagramExportJsonReader({}, _logging_service())
+        data = {"messages": [{"sender_name": "Alice", "timestamp_ms": 1700000000000 - i, "content": f"m{i}"}
+                             for i in range(50)]}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive_path = os.path.join(tmpdir, "export.zip")
+            with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr("inbox/alice/message_1.json", json.dumps(data))
+
+            [input_file] = reader.scan_input(os.fsencode(archive_path))
+
+            self.assertEqual(reader.read(input_file["path"]), data)
+            self.assertEqual(list(reader.stream_messages(input_file["path"])),
+                             reader.standardize_messages(data))
+
+    def test_whatsapp_archive_as_input_path(self):
+        reader = WhatsappTxtReader(_logging_service())
+        lines = "15/01/2024, 10:30 - Alice: Hello!\n" * 100
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive_path = os.path.join(tmpdir, "WhatsApp Chat with Alice.zip")
+            with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr("_chat.txt", lines)
+                archive.writestr("IMG-0001.jpg", "")
+
+            [input_file] = reader.scan_input(os.fsencode(archive_path))
+
+            self.assertEqual(input_file["thread"], "WhatsApp Chat with Alice")
+            self.assertEqual(len(reader.standardize_messages(reader.read(input_file["path"]))), 100)
+            self.assertEqual(len(list(reader.stream_messages(input_file["path"]))), 100)
+            # compressed members are read as a whole
+            self.assertEqual(reader.split_ranges(input_file["path"], 64), [(0, len(lines))])
+
+    def test_whatsapp_archives_side_by_side_are_different_threads(self):
+        reader = WhatsappTxtReader(_logging_service())
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name in ("WhatsApp Chat with Alice.zip", "WhatsApp Chat with Bob.zip"):
+                with zipfile.ZipFile(os.path.join(tmpdir, name), "w") as archive:
+                    archive.writestr("_chat.txt", "15/01/2024, 10:30 - Alice: Hello!\n")
+
+            files = reader.scan_input(os.fsencode(tmpdir))
+
+            self.assertEqual([f["thread"] for f in files], ["WhatsApp Chat with Alice", "WhatsApp Chat with Bob"])
+
+    def test_broken_archive_is_skipped(self):
+        reader = WhatsappTxtReader(_logging_service())
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "broken.zip"), "w") as f:
+                f.write("not a zip")
+            open(os.path.join(tmpdir, "chat.txt"), 'w').close()
+
+            files = reader.scan_input(os.fsencode(tmpdir))
+
+            self.assertEqual([os.path.basename(f["path"]) for f in files], ["chat.txt"])
+
+
 class TestReaderFactory(unittest.TestCase):
 
     def test_instagram_export_returns_correct_reader(self):
@@ -263,6 +679,12 @@ class TestReaderFactory(unittest.TestCase):
         reader = reader_factory(InputFileType.WHATSAPP_EXPORT, config)
         self.assertIsInstance(reader, WhatsappTxtReader)
 
+    def test_readers_report_message_order(self):
+        config = {'logs': {'level': 'WARNING'}}
+        self.assertEqual(reader_factory(InputFileType.INSTAGRAM_EXPORT, config).message_order,
+                         MessageOrder.DESCENDING)
+        self.assertEqual(reader_factory(InputFileType.WHATSAPP_EXPORT, config).message_order, MessageOrder.ASCENDING)
+
     def test_reader_extension(self):
         config = {'parsing': {'messages': {}, 'chars-per-token': 4.0}, 'logs': {'level': 'WARNING'}}
         ig_reader = reader_factory(InputFileType.INSTAGRAM_EXPORT, config)
@@ -1,5 +1,5 @@
 import unittest
-from datetime import datetime
+from datetime import date, datetime
 
 from marshmallow import ValidationError
 
@@ -140,6 +140,13 @@ class TestWhatsappExportRequestSchema(unittest.TestCase):
             self.schema.load(data)
         self.assertIn("messages", ctx.exception.messages)
 
+    def test_date_window(self):
+        result = self.schema.load({"messages": [], "start_date": "2024-01-15", "end_date": "2024-01-31"})
+        self.assertEqual(result["start_date"], date(2024, 1, 15))
+        self.assertEqual(result["end_date"], date(2024, 1, 31))
+        with self.assertRaises(ValidationError):
+            self.schema.load({"messages": [], "start_date": "yesterday"})
+
 
 class TestChatChronicleRequestSchema(unittest.TestCase):
 
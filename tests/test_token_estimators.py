@@ -0,0 +1,103 @@
+import base64
+import os
+import tempfile
+import unittest
+
+from src.dto.enums.token_estimator_type import TokenEstimatorType
+from src.service.token_estimator import vocabulary_token_estimator
+from src.service.token_estimator.length_token_estimator import LengthTokenEstimator
+from src.service.token_estimator.script_token_estimator import ScriptTokenEstimator
+from src.service.token_estimator.token_estimator import LINE_OVERHEAD_TOKENS
+from src.service.token_estimator.token_estimator_factory import token_estimator_factory
+from src.service.token_estimator.vocabulary_token_estimator import VocabularyTokenEstimator
+
+
+def _write_vocabulary(path):
+    tokens = [bytes([i]) for i in range(256)] + [b"he", b"ll", b"hell", b"hello", b" w", b" wo", b"rld", b" world"]
+    with open(path, 'w') as f:
+        for rank, token in enumerate(tokens):
+            f.write(f"{base64.b64encode(token).decode()} {rank}\n")
+
+
+class TestLengthTokenEstimator(unittest.TestCase):
+
+    def test_estimate_rounds_up(self):
+        estimator = LengthTokenEstimator(4.0)
+        self.assertEqual(estimator.estimate(""), 0)
+        self.assertEqual(estimator.estimate("abcd"), 1)
+        self.assertEqual(estimator.estimate("abcde"), 2)
+
+    def test_estimate_message_adds_line_overhead(self):
+        estimator = LengthTokenEstimator(2.0)
+        self.assertEqual(estimator.estimate_message("Bob", "hello"), 4 + LINE_OVERHEAD_TOKENS)
+
+
+class TestScriptTokenEstimator(unittest.TestCase):
+
+    def setUp(self):
+        self.estimator = ScriptTokenEstimator(4.0, 2.0, 1.0)
+
+    def test_ascii_uses_latin_ratio(self):
+        self.assertEqual(self.estimator.estimate("hello world!"), 3)
+
+    def test_cyrillic(self):
+        self.assertEqual(self.estimator.estimate("привет"), 3)
+
+    def test_cjk(self):
+        self.assertEqual(self.estimator.estimate("你好世界"), 4)
+
+    def test_mixed_scripts(self):
+        # 4 latin chars, 2 cyrillic chars, 2 cjk chars
+        self.assertEqual(self.estimator.estimate("cittпр你好"), 1 + 1 + 2)
+
+
+@unittest.skipIf(vocabulary_token_estimator.tiktoken is None, "tiktoken not installed")
+class TestVocabularyTokenEstimator(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "vocabulary.tiktoken")
+        _write_vocabulary(self.path)
+        self.estimator = VocabularyTokenEstimator(self.path, cache_size=16)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_exact_count(self):
+        self.assertEqual(self.estimator.estimate("hello world"), 2)
+        self.assertEqual(self.estimator.estimate("help"), 3)
+
+    def test_repeated_strings_are_cached(self):
+        self.estimator.estimate("hello")
+        self.estimator.estimate("hello")
+        self.assertEqual(self.estimator._count.cache_info().hits, 1)
+
+
+class TestTokenEstimatorFactory(unittest.TestCase):
+
+    def test_default_is_length(self):
+        estimator = token_estimator_factory({'parsing': {'chars-per-token': 2.5}})
+        self.assertIsInstance(estimator, LengthTokenEstimator)
+        self.assertEqual(estimator.chars_per_token, 2.5)
+
+    def test_script(self):
+        config = {'parsing': {'token-estimator': {'type': TokenEstimatorType.SCRIPT, 'cjk-chars-per-token': 0.8}}}
+        estimator = token_estimator_factory(config)
+        self.assertIsInstance(estimator, ScriptTokenEstimator)
+        self.assertEqual(estimator.cjk_chars_per_token, 0.8)
+
+    @unittest.skipIf(vocabulary_token_estimator.tiktoken is None, "tiktoken not installed")
+    def test_vocabulary(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "vocabulary.tiktoken")
+            _write_vocabulary(path)
+            config = {'parsing': {'token-estimator': {'type': TokenEstimatorType.VOCABULARY, 'vocabulary-path': path}}}
+            self.assertIsInstance(token_estimator_factory(config), VocabularyTokenEstimator)
+
+    def test_unsupported_type_raises(self):
+        with self.assertRaises(ValueError):
+            token_estimator_factory({'parsing': {'token-estimator': {'type': 'UNSUPPORTED'}}})
+
+
+if __name__ == '__main__':
+    unittest.main()
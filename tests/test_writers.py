@@ -2,14 +2,27 @@ import json
 import os
 import tempfile
 import unittest
+from datetime import datetime
 
+from src.dto.enums.chat_log_format import ChatLogFormat
 from src.dto.enums.writer_type import WriterType
+from src.service.parser.message_store import MessageStore
 from src.service.writer.txt_writer import TxtWriter
 from src.service.writer.json_writer import JsonWriter
 from src.service.writer.ndjson_writer import NdJsonWriter
 from src.service.writer.writer_factory import writer_factory
 
 
+def _day_chunks():
+    lines = ["[10:00] Alice: Hi\n", "[10:01] Bob: Hello\n", "[18:00] Alice: Dinner?\n"]
+    return [
+        {"lines": lines, "messages": [], "start_index": start, "end_index": end, "messages_count": end - start,
+         "start_timestamp": datetime(2024, 1, 15, 10, 0), "end_timestamp": datetime(2024, 1, 15, 18, 0),
+         "token_count": 10}
+        for start, end in ((0, 2), (2, 3))
+    ]
+
+
 class TestTxtWriter(unittest.TestCase):
 
     def test_write_single_file(self):
@@ -76,6 +89,17 @@ class TestTxtWriter(unittest.TestCase):
             self.assertIn("Chat History:", content)
             self.assertIn("extra_step:", content)
 
+    def test_write_chunks_with_their_own_content(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            writer = TxtWriter(tmpdir, single_file=False, export_intermediate_steps=True)
+            writer.write("2024-01-15", {"summary": "A great day.", "messages": [], "chunks": _day_chunks()})
+
+            with open(os.path.join(tmpdir, "2024-01-15_chronicle.txt"), encoding='utf-8') as f:
+                content = f.read()
+            # every line of the day is written once, by the chunk it belongs to
+            self.assertEqual(content.count("Dinner?"), 1)
+            self.assertNotIn("'lines'", content)
+
 
 class TestJsonWriter(unittest.TestCase):
 
@@ -119,9 +143,54 @@ class TestJsonWriter(unittest.TestCase):
             found = [f for f in files if "2024-01-15" in f]
             self.assertGreater(len(found), 0)
 
+    def test_write_message_view(self):
+        store = MessageStore()
+        store.append({'sender_name': "Alice", 'timestamp': datetime(2024, 1, 15, 10, 0), 'content': "Hi",
+                      'token_count': 3, 'day': "2024-01-15"})
+        with tempfile.TemporaryDirectory() as tmpdir:
+            writer = JsonWriter(tmpdir, single_file=True, export_intermediate_steps=True)
+            writer.write("2024-01-15", {"summary": "Day one.", "messages": store.get_view("2024-01-15")})
+            writer.close()
+
+            with open(os.path.join(tmpdir, os.listdir(tmpdir)[0]), encoding='utf-8') as f:
+                data = json.loads(f.read())
+            self.assertEqual(data[0]["intermediate_steps"]["messages"][0]["content"], "Hi")
+            self.assertEqual(data[0]["intermediate_steps"]["messages"][0]["timestamp"], "2024-01-15 10:00:00")
+
+
+    def test_write_chunks_with_their_own_content(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            writer = JsonWriter(tmpdir, single_file=True, export_intermediate_steps=True)
+            writer.write("2024-01-15", {"summary": "Day one.", "chunks": _day_chunks()})
+            writer.close()
+
+            with open(os.path.join(tmpdir, os.listdir(tmpdir)[0]), encoding='utf-8') as f:
+                chunks = json.loads(f.read())[0]["intermediate_steps"]["chunks"]
+            self.assertEqual([chunk["content"] for chunk in chunks],
+                             ["[10:00] Alice: Hi\n[10:01] Bob: Hello\n", "[18:00] Alice: Dinner?\n"])
+            self.assertEqual(set(chunks[0]), {"content", "messages_count", "start_timestamp", "end_timestamp",
+                                              "token_count"})
 
 class TestNdJsonWriter(unittest.TestCase):
 
+    def test_write_chunks_in_the_chat_log_format_of_the_model(self):
+        messages = [
+            {"sender_name": "Alice", "timestamp": datetime(2024, 1, 15, 10, 0), "content": "Hi", "token_count": 5},
+            {"sender_name": "Bob", "timestamp": datetime(2024, 1, 15, 10, 0), "content": "Hello", "token_count": 5},
+        ]
+        chunk = {"lines": [], "messages": messages, "start_index": 0, "end_index": 2, "messages_count": 2,
+                 "start_timestamp": messages[0]["timestamp"], "end_timestamp": messages[1]["timestamp"],
+                 "token_count": 10}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            writer = NdJsonWriter(tmpdir, single_file=True, export_intermediate_steps=True,
+                                  chat_log_format=ChatLogFormat.COMPACT)
+            writer.write("2024-01-15", {"summary": "Day one.", "chunks": [chunk]})
+            writer.close()
+
+            with open(os.path.join(tmpdir, os.listdir(tmpdir)[0]), encoding='utf-8') as f:
+                [exported] = json.loads(f.readline())["intermediate_steps"]["chunks"]
+            self.assertEqual(exported["content"], "Senders: A = Alice, B = Bob\n[10:00] A: Hi\nB: Hello\n")
+
     def test_write_single_entry(self):
         with tempfile.TemporaryDirectory() as tmpdir:
             writer = NdJsonWriter(tmpdir, single_file=True)
@@ -218,6 +287,11 @@ class TestWriterFactory(unittest.TestCase):
         config = {}
         writer = writer_factory(config)
         self.assertIsInstance(writer, TxtWriter)
+        self.assertEqual(writer.chat_log_format, ChatLogFormat.FULL)
+
+    def test_chunks_follow_the_map_reduce_chat_log_format(self):
+        config = {'summarization': {'map-reduce-strategy': {'chat-log-format': 'COMPACT'}}}
+        self.assertEqual(writer_factory(config).chat_log_format, ChatLogFormat.COMPACT)
 
 
 if __name__ == '__main__':